@@ -47,6 +47,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'sgp.middleware.PermisosProyectoMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -64,6 +65,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'sgp.context_processors.permisos',
             ],
         },
     },
@@ -122,6 +124,12 @@ USE_TZ = True
 STATIC_URL = '/static/'
 
 
+# Uploaded and generated files (PDF reports)
+# https://docs.djangoproject.com/en/3.2/topics/files/
+
+MEDIA_ROOT = BASE_DIR / 'media'
+
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -133,9 +141,30 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'sgp.User'
 AUTHENTICATION_BACKENDS = (
     'sgp.backends.OAuth2Backend',
-    'guardian.backends.ObjectPermissionBackend',
+    'sgp.backends.RolPermissionBackend',
 )
 
+# RolPermissionBackend replaces guardian's backend and also reads the
+# permissions assigned through guardian, so its check does not apply.
+SILENCED_SYSTEM_CHECKS = ['guardian.W001']
+
+# Certificates used to verify Google ID tokens. They are cached according to
+# the Cache-Control header of the response. A local JSON file with the same
+# format may be used instead of the URL to verify tokens offline.
+GOOGLE_OAUTH2_CERTS = 'https://www.googleapis.com/oauth2/v1/certs'
+
+# Authenticated users may be cached so that requests do not query them. The
+# cache is disabled while the TTL (in seconds) is zero. The backend is the
+# alias of a Django cache shared between processes, or None for a local LRU.
+USUARIOS_CACHE_TTL = 0
+USUARIOS_CACHE_MAXIMO = 1000
+USUARIOS_CACHE_BACKEND = None
+
+# The sprint backlog and team pages submit one formset row per user story or
+# member, with several fields each. Django's default limit of 1000 fields
+# rejects backlogs of a few hundred user stories.
+DATA_UPLOAD_MAX_NUMBER_FIELDS = 10000
+
 # Migration modules
 # These need to be inside the project folder, otherwise django-guardian places
 # them in the virtual environment and causes dependency issues.
@@ -1,6 +1,7 @@
 
 # import datetime
 # from django.utils import timezone
+from guardian.shortcuts import assign_perm
 from sgp.models import *
 
 # Usuarios de prueba
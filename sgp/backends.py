@@ -1,21 +1,205 @@
 """
 Los backends de autorización manejan el proceso de autenticación. En esta
 aplicación se utilizacan dos de ellos: un backend personalizado que autentica
-a los usuarios utilizando el servicio de identidad de google, y el backend de
-la librería ``django-guardian`` que permite asignar permisos a instancias
-individuales de modelos.
+a los usuarios utilizando el servicio de identidad de google, y un backend
+que obtiene los permisos de los usuarios sobre cada proyecto a partir de su
+rol, además de los permisos asignados con la librería ``django-guardian``.
 """
 
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
 from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
-from google.oauth2 import id_token
+from google.auth import exceptions, jwt
 from google.auth.transport import requests
 
-from .models import User
+from .models import User, Proyecto
+from .utils import permisos_proyecto
 
 
 CLIENT_ID = "995502643398-16c9uqsedvqktsolf042evsqqij1m9ks.apps.googleusercontent.com"
 
+GOOGLE_ISSUERS = ['accounts.google.com', 'https://accounts.google.com']
+
+
+class CertificadosGoogle:
+    """
+    Mantiene en memoria los certificados públicos con los que Google firma
+    los tokens de ID, de modo que los tokens se verifican localmente sin
+    descargar los certificados en cada inicio de sesión. Los certificados se
+    vuelven a descargar cuando expira el tiempo indicado por el encabezado
+    Cache-Control, o cuando un token está firmado con una clave desconocida.
+
+    La fuente puede ser una URL o la ruta de un archivo JSON local con el
+    mismo formato, lo cual permite verificar tokens sin acceso a la red.
+
+    :param fuente: URL o ruta de los certificados.
+    :param transporte: Objeto utilizado para realizar las solicitudes HTTP.
+    :type fuente: string
+    :type transporte: google.auth.transport.Request
+
+    Fecha: 18/10/26
+
+    Artefacto: módulo de seguridad
+    """
+
+    RENOVACION_MINIMA = 60
+    """Segundos que deben pasar entre dos descargas causadas por claves
+    desconocidas, para que tokens falsos no provoquen descargas continuas."""
+
+    def __init__(self, fuente=None, transporte=None):
+        self.fuente = fuente
+        self.transporte = transporte
+        self.certificados = None
+        self.expiracion = 0
+        self.descarga = None
+        self.lock = threading.Lock()
+
+    def descargar(self):
+        """
+        Obtiene los certificados de la fuente y retorna un par con los
+        certificados y la cantidad de segundos durante los que son válidos.
+        """
+        fuente = self.fuente or settings.GOOGLE_OAUTH2_CERTS
+        if not fuente.startswith(('http://', 'https://')):
+            with open(fuente) as archivo:
+                return json.load(archivo), float('inf')
+
+        if self.transporte is None:
+            self.transporte = requests.Request()
+        response = self.transporte(fuente, method='GET')
+        if response.status != 200:
+            raise exceptions.TransportError('No se pudieron obtener los certificados de ' + fuente)
+        max_age = re.search(r'max-age=(\d+)', response.headers.get('cache-control', ''))
+        return json.loads(response.data.decode('utf-8')), int(max_age.group(1)) if max_age else 0
+
+    def obtener(self, renovar=False):
+        """Retorna los certificados en memoria, descargándolos si expiraron."""
+        with self.lock:
+            ahora = time.monotonic()
+            if renovar and self.descarga is not None and ahora - self.descarga < self.RENOVACION_MINIMA:
+                renovar = False
+            if renovar or self.certificados is None or ahora >= self.expiracion:
+                self.certificados, duracion = self.descargar()
+                self.descarga = ahora
+                self.expiracion = ahora + duracion
+            return self.certificados
+
+    def verificar(self, token, audience=CLIENT_ID):
+        """
+        Verifica la firma, la audiencia, la expiración y el emisor del token
+        y retorna su contenido. Si la verificación falla, lanza ValueError.
+        """
+        certificados = self.obtener()
+        if jwt.decode_header(token).get('kid') not in certificados:
+            certificados = self.obtener(renovar=True)
+        idinfo = jwt.decode(token, certs=certificados, audience=audience)
+        if idinfo['iss'] not in GOOGLE_ISSUERS:
+            raise ValueError('El emisor del token no es válido.')
+        return idinfo
+
+
+certificados_google = CertificadosGoogle()
+"""Certificados compartidos por todas las instancias de OAuth2Backend."""
+
+
+class CacheUsuarios:
+    """
+    Guarda los datos de los usuarios autenticados para que get_user no
+    consulte la base de datos en cada solicitud. Los datos se mantienen en un
+    LRU local al proceso y, opcionalmente, en un backend de cache de Django
+    compartido entre procesos. Cada entrada expira luego de un tiempo, por lo
+    que los cambios hechos sin pasar por User.save (por ejemplo con update)
+    se reflejan a lo sumo tras ese tiempo.
+
+    La cache está desactivada a menos que USUARIOS_CACHE_TTL sea mayor a
+    cero. USUARIOS_CACHE_MAXIMO limita la cantidad de usuarios en el LRU y
+    USUARIOS_CACHE_BACKEND indica el alias del backend de cache de Django.
+
+    Fecha: 18/10/26
+
+    Artefacto: módulo de seguridad
+    """
+
+    def __init__(self):
+        self.usuarios = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def clave(user_id):
+        return 'sgp:usuario:%s' % user_id
+
+    @staticmethod
+    def backend():
+        alias = getattr(settings, 'USUARIOS_CACHE_BACKEND', None)
+        return caches[alias] if alias else None
+
+    def obtener(self, user_id):
+        """Retorna el usuario con esa ID, consultando la base de datos
+        solamente si no se encuentra en la cache."""
+        ttl = getattr(settings, 'USUARIOS_CACHE_TTL', 0)
+        if not ttl:
+            return User.objects.get(pk=user_id)
+
+        user_id = str(user_id)
+        with self.lock:
+            entrada = self.usuarios.get(user_id)
+            if entrada and entrada[0] > time.monotonic():
+                self.usuarios.move_to_end(user_id)
+                return self.construir(*entrada[1])
+
+        backend = self.backend()
+        datos = backend.get(self.clave(user_id)) if backend else None
+        if datos is None:
+            user = User.objects.get(pk=user_id)
+            datos = (user._state.db, [getattr(user, f.attname) for f in User._meta.concrete_fields])
+            if backend:
+                backend.set(self.clave(user_id), datos, ttl)
+        else:
+            user = self.construir(*datos)
+
+        with self.lock:
+            self.usuarios[user_id] = (time.monotonic() + ttl, datos)
+            self.usuarios.move_to_end(user_id)
+            while len(self.usuarios) > getattr(settings, 'USUARIOS_CACHE_MAXIMO', 1000):
+                self.usuarios.popitem(last=False)
+        return user
+
+    @staticmethod
+    def construir(alias, valores):
+        """Crea una instancia nueva de User a partir de los valores guardados y
+        del alias de la base de datos de la que se leyeron, de modo que cada
+        solicitud reciba su propio objeto."""
+        return User.from_db(alias, [f.attname for f in User._meta.concrete_fields], valores)
+
+    def invalidar(self, user_id):
+        """Elimina al usuario de la cache local y de la compartida."""
+        user_id = str(user_id)
+        with self.lock:
+            self.usuarios.pop(user_id, None)
+        backend = self.backend()
+        if backend:
+            backend.delete(self.clave(user_id))
+
+
+cache_usuarios = CacheUsuarios()
+"""Cache compartida por todas las instancias de OAuth2Backend."""
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidar_usuario(sender, instance, **kwargs):
+    """Descarta los datos guardados de un usuario cuando este cambia."""
+    cache_usuarios.invalidar(instance.pk)
+
 
 class OAuth2Backend(ModelBackend):
     """
@@ -50,9 +234,9 @@ class OAuth2Backend(ModelBackend):
         if test:
             return User.objects.get(user_id=token)
         try:
-            idinfo = id_token.verify_oauth2_token(token, requests.Request(), CLIENT_ID)
+            idinfo = certificados_google.verificar(token)
             userid = idinfo['sub']
-        except ValueError:
+        except (ValueError, exceptions.GoogleAuthError):
             print("Could not verify token")
             return None
         try:
@@ -69,7 +253,8 @@ class OAuth2Backend(ModelBackend):
         """
         Comprueba si existe un usuario con esa ID en la base de datos.
 
-        Si existe, lo retorna. Si no, retorna None.
+        Si existe, lo retorna. Si no, retorna None. Si la cache de usuarios
+        está activada, los usuarios frecuentes se obtienen sin consultas.
 
         :param user_id: ID del usuario que se desea comprobar.
         :type user_id: string
@@ -81,6 +266,49 @@ class OAuth2Backend(ModelBackend):
         |
         """
         try:
-            return User.objects.get(pk=user_id)
+            user = cache_usuarios.obtener(user_id)
         except User.DoesNotExist:
             return None
+        return user if self.user_can_authenticate(user) else None
+
+
+class RolPermissionBackend:
+    """
+    Resuelve los permisos de un usuario sobre un proyecto a partir del rol
+    que tiene en él, mediante la relación Participa, y de los permisos
+    asignados directamente con django-guardian. Reemplaza al backend de
+    django-guardian, por lo que los permisos de los roles no necesitan
+    copiarse a cada usuario.
+
+    **Fecha:** 18/10/26
+
+    **Artefacto:** módulo de seguridad
+
+    |
+    """
+
+    def authenticate(self, request, **kwargs):
+        return None
+
+    def get_all_permissions(self, user_obj, obj=None):
+        """Retorna los permisos del usuario sobre el proyecto. Se guardan en la
+        instancia del usuario junto con los que obtiene el middleware, por lo
+        que se consultan una sola vez por solicitud."""
+        if not isinstance(obj, Proyecto):
+            return set()
+        return permisos_proyecto(user_obj, obj)
+
+    def has_perm(self, user_obj, perm, obj=None):
+        """
+        Verifica si el usuario tiene el permiso sobre el proyecto. El permiso
+        puede incluir el nombre de la aplicación, como en ``sgp.vista``.
+
+        |
+        """
+        if not isinstance(obj, Proyecto):
+            return False
+        if '.' in perm:
+            app_label, perm = perm.split('.', 1)
+            if app_label != Proyecto._meta.app_label:
+                return False
+        return perm in self.get_all_permissions(user_obj, obj)
@@ -0,0 +1,19 @@
+"""
+Los procesadores de contexto agregan variables al contexto de todas las
+plantillas renderizadas con una solicitud.
+"""
+
+
+def permisos(request):
+    """
+    Agrega a las plantillas la variable proyecto_perms con los permisos que
+    el usuario tiene sobre el proyecto actual, cargados por
+    PermisosProyectoMiddleware.
+
+    **Fecha:** 18/10/26
+
+    **Artefacto:** módulo de seguridad
+
+    |
+    """
+    return {'proyecto_perms': getattr(request, 'proyecto_perms', set())}
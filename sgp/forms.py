@@ -8,14 +8,23 @@ Para todos los formularios, los argumentos de los constructores son los mismos
 que para su clase base.
 """
 
+import csv
 import datetime
+import io
+from collections import defaultdict
 
 from django import forms
-from django.forms import ModelForm
+from django.contrib.auth.models import Permission
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.forms import BaseModelFormSet, ModelForm
 from django.utils import timezone
-from guardian.shortcuts import assign_perm, remove_perm, get_perms_for_model
+from django.utils.functional import cached_property
 
 from .models import User, Proyecto, Role, Sprint, UserStory, Comentario, ParticipaSprint
+from .utils import permisos_proyecto
 
 
 class UserForm(ModelForm):
@@ -32,6 +41,11 @@ class UserForm(ModelForm):
 
     **Artefacto:** módulo de seguridad
 
+    :param permisos: Los permisos globales de cada usuario, indexados por su
+        id, obtenidos mediante UserFormSet. Los permisos se guardan desde
+        UserFormSet.
+    :type permisos: dict
+
     |
     """
     email = forms.CharField(disabled=True)
@@ -39,24 +53,132 @@ class UserForm(ModelForm):
     administrar = forms.BooleanField(required=False)
     auditar = forms.BooleanField(required=False)
 
-    def __init__(self, *args, **kwargs):
+    PERMISOS = ['crear_proyecto', 'administrar', 'auditar']
+    """Permisos globales que se pueden asignar desde la página de administración."""
+
+    def __init__(self, *args, permisos, **kwargs):
         super(UserForm, self).__init__(*args, **kwargs)
-        for permiso in self.Meta.fields:
-            self.fields[permiso].initial = self.instance.has_perm('sgp.' + permiso)
+        actuales = permisos.get(self.instance.pk, set())
+        for permiso in self.PERMISOS:
+            self.fields[permiso].initial = permiso in actuales
+
+    def validate_unique(self):
+        # el único campo único es el correo, el cual no se puede editar
+        pass
 
     def save(self, commit=True):
-        for permiso in ['crear_proyecto', 'administrar', 'auditar']:
-            if self.cleaned_data[permiso]:
-                assign_perm('sgp.' + permiso, self.instance)
-            else:
-                remove_perm('sgp.' + permiso, self.instance)
-        super(UserForm, self).save(commit)
+        # los permisos se guardan en bloque desde UserFormSet
+        if {'nombre', 'apellido'} & set(self.changed_data):
+            return super(UserForm, self).save(commit)
+        return self.instance
 
     class Meta:
         model = User
         fields = ['nombre', 'apellido', 'email', 'crear_proyecto', 'administrar', 'auditar']
 
 
+class InstanciaListadaField(forms.ModelChoiceField):
+    """Campo de la clave primaria de un ListadoFormSet, que obtiene cada
+    instancia de las ya consultadas por el conjunto de formularios en lugar
+    de consultarlas una por una."""
+
+    def __init__(self, formset, *args, **kwargs):
+        self.formset = formset
+        super().__init__(*args, **kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        instancia = self.formset.instancias.get(str(value))
+        if instancia is None:
+            raise forms.ValidationError(self.error_messages['invalid_choice'], code='invalid_choice',
+                                        params={'value': value})
+        return instancia
+
+
+class ListadoFormSet(BaseModelFormSet):
+    """
+    Conjunto de formularios que consulta sus instancias una sola vez. Al
+    validar un formulario enviado, busca su instancia entre las ya
+    consultadas en lugar de realizar una consulta por formulario.
+
+    **Fecha:** 18/10/26
+
+    |
+    """
+
+    @cached_property
+    def instancias(self):
+        """Diccionario con las instancias del conjunto indexadas por su clave primaria."""
+        return {str(instancia.pk): instancia for instancia in self.get_queryset()}
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        campo = form.fields[self.model._meta.pk.name]
+        form.fields[self.model._meta.pk.name] = InstanciaListadaField(
+            self, campo.queryset, initial=campo.initial, required=False, widget=campo.widget)
+
+
+class UserFormSet(ListadoFormSet):
+    """
+    Conjunto de formularios de la página de administración. Obtiene los
+    permisos globales de todos los usuarios listados con una sola consulta y
+    los comparte con cada formulario. Al guardar, solo agrega o quita los
+    permisos que cambiaron, utilizando una consulta por operación en lugar de
+    una por usuario.
+
+    **Fecha:** 18/10/26
+
+    **Artefacto:** módulo de seguridad
+
+    |
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.is_bound:
+            # solo se consultan los usuarios cuyos formularios fueron enviados
+            self.queryset = self.model.objects.filter(pk__in=[
+                self.data.get('%s-%s' % (self.add_prefix(i), self.model._meta.pk.name))
+                for i in range(self.initial_form_count())])
+        self.permisos = self.consultar_permisos(self.instancias.values())
+        self.form_kwargs['permisos'] = self.permisos
+
+    @staticmethod
+    def consultar_permisos(usuarios):
+        """Retorna un diccionario con los permisos globales de cada usuario,
+        incluyendo los que obtiene de sus grupos. Los superusuarios cuentan
+        con todos los permisos."""
+        permisos = {usuario.pk: set(UserForm.PERMISOS) if usuario.is_superuser else set() for usuario in usuarios}
+        for codename, usuario, miembro in Permission.objects.filter(
+                Q(user__in=list(permisos)) | Q(group__user__in=list(permisos)),
+                content_type=ContentType.objects.get_for_model(User),
+                codename__in=UserForm.PERMISOS).values_list('codename', 'user', 'group__user'):
+            for pk in (usuario, miembro):
+                if pk in permisos:
+                    permisos[pk].add(codename)
+        return permisos
+
+    def save(self, commit=True):
+        instancias = super().save(commit)
+        agregar, quitar = defaultdict(list), defaultdict(list)
+        for form in self.initial_forms:
+            if form in self.deleted_forms or not form.has_changed():
+                continue
+            for permiso in set(UserForm.PERMISOS) & set(form.changed_data):
+                (agregar if form.cleaned_data[permiso] else quitar)[permiso].append(form.instance.pk)
+        if agregar or quitar:
+            ids = dict(Permission.objects.filter(content_type=ContentType.objects.get_for_model(User),
+                                                 codename__in=UserForm.PERMISOS).values_list('codename', 'id'))
+            PermisoUsuario = User.user_permissions.through
+            PermisoUsuario.objects.bulk_create([
+                PermisoUsuario(user_id=pk, permission_id=ids[permiso])
+                for permiso, usuarios in agregar.items() for pk in usuarios], ignore_conflicts=True)
+            for permiso, usuarios in quitar.items():
+                PermisoUsuario.objects.filter(permission_id=ids[permiso], user_id__in=usuarios).delete()
+        return instancias
+
+
 class ProyectoForm(ModelForm):
     """
     Corresponde al modelo Proyecto. Este formulario se muestra en las páginas
@@ -152,30 +274,31 @@ class RoleForm(ModelForm):
 
     def __init__(self, *args, rol_actual, **kwargs):
         super(RoleForm, self).__init__(*args, **kwargs)
+        self.rol_actual = rol_actual
+        self.permisos_actuales = set()
         if self.instance.pk:
-            permisos = get_perms_for_model(Proyecto).exclude(codename='vista')
-            for perm in permisos:
-                self.fields[perm.codename].initial = self.instance.permisos.filter(id=perm.id).exists()
-            self.rol_actual = rol_actual
+            # utiliza los permisos precargados con prefetch_related('permisos')
+            self.permisos_actuales = {perm.codename for perm in self.instance.permisos.all()}
+            for codename in Proyecto.permisos_rol():
+                self.fields[codename].initial = codename in self.permisos_actuales
             if self.instance == rol_actual:
                 self.fields['administrar_equipo'].disabled = True
 
     def save(self, commit=True):
-        permisos = get_perms_for_model(Proyecto).exclude(codename='vista')
-        if self.instance.pk:
-            if self.instance == self.rol_actual:
-                self.cleaned_data['administrar_equipo'] = True
-            for perm in permisos:
-                if self.cleaned_data[perm.codename]:
-                    self.instance.asignar_permiso(perm)
-                else:
-                    self.instance.quitar_permiso(perm)
-            super(RoleForm, self).save(commit)
-        else:
+        permisos = Proyecto.permisos_rol()
+        if self.instance.pk and self.instance == self.rol_actual:
+            self.cleaned_data['administrar_equipo'] = True
+        if not self.instance.pk or 'nombre' in self.changed_data:
             super(RoleForm, self).save(commit)
-            for perm in permisos:
-                if self.cleaned_data[perm.codename]:
-                    self.instance.permisos.add(perm)
+
+        # solo agrega o quita los permisos que cambiaron
+        nuevos = {codename for codename in permisos if self.cleaned_data[codename]}
+        if nuevos - self.permisos_actuales:
+            self.instance.permisos.add(*[permisos[codename] for codename in nuevos - self.permisos_actuales])
+        if self.permisos_actuales - nuevos:
+            self.instance.permisos.remove(*[permisos[codename] for codename in self.permisos_actuales - nuevos])
+        self.permisos_actuales = nuevos
+        return self.instance
 
     class Meta:
         model = Role
@@ -202,31 +325,37 @@ class UserRoleForm(ModelForm):
 
     :param proyecto_actual: El proyecto cuyos roles se muestran.
     :param usuario_actual: El usuario accediendo a la vista.
+    :param equipo: Información del equipo compartida por todos los
+        formularios, obtenida mediante Proyecto.cargar_equipo.
     :type proyecto_actual: Proyecto
     :type usuario_actual: User
+    :type equipo: dict
     """
 
     borrar = forms.BooleanField(required=False)
 
-    def __init__(self, *args, usuario_actual, proyecto_actual, **kwargs):
+    def __init__(self, *args, usuario_actual, proyecto_actual, equipo, **kwargs):
         super(UserRoleForm, self).__init__(*args, **kwargs)
 
+        roles = equipo['roles'].values()
         if self.instance == usuario_actual:
-            perm = get_perms_for_model(Proyecto).get(codename='administrar_equipo')
-            queryset = Role.objects.filter(proyecto=proyecto_actual, permisos__in=[perm])
+            roles = [rol for rol in roles if rol.id in equipo['roles_administracion']]
             self.fields['borrar'].disabled = True
             self.borrar_string = 'Usuario actual'
-        else:
-            queryset = Role.objects.filter(proyecto=proyecto_actual)
-            if proyecto_actual.sprint_activo and self.instance in proyecto_actual.sprint_activo.equipo.all():
-                self.fields['borrar'].disabled = True
-                self.borrar_string = 'Ocupado en sprint'
-
-        initial = self.instance.participa_set.get(proyecto=proyecto_actual).rol
-        self.nombre_rol = str(initial)
-        self.fields['rol'] = forms.ModelChoiceField(
-            queryset=queryset,
-            initial=initial,
+        elif self.instance.pk in equipo['ocupados']:
+            self.fields['borrar'].disabled = True
+            self.borrar_string = 'Ocupado en sprint'
+
+        # las opciones se generan a partir de los roles ya consultados, en
+        # lugar de consultar los roles al mostrar cada formulario
+        self.rol_inicial = equipo['miembros'].get(self.instance.pk)
+        self.nombre_rol = str(equipo['roles'].get(self.rol_inicial))
+        self.fields['rol'] = forms.TypedChoiceField(
+            choices=[('', '---------')] + [(rol.id, rol.nombre) for rol in roles],
+            coerce=int,
+            empty_value=None,
+            required=False,
+            initial=self.rol_inicial,
         )
         self.fields['nombre'].disabled = True
         self.fields['apellido'].disabled = True
@@ -237,26 +366,56 @@ class UserRoleForm(ModelForm):
 
     def clean(self):
         """
-        Además de validar los datos, se asegura de que al marcar un formulario
-        para borrarlo, esto quite al usuario del equipo en vez de eliminarlo.
+        Además de validar los datos, se asegura de que los miembros que no se
+        quitan del equipo tengan un rol.
 
         |
         """
         cleaned_data = super(ModelForm, self).clean()
-        if cleaned_data.get('borrar'):
-            self.proyecto_actual.quitar_rol(self.instance)
+        if not cleaned_data.get('borrar') and not cleaned_data.get('rol'):
+            self.add_error('rol', 'Seleccione un rol.')
         return cleaned_data
 
-    def save(self, commit=True):
-        if self.cleaned_data.get('rol'):
-            self.proyecto_actual.asignar_rol(self.instance, self.cleaned_data['rol'].nombre)
-        super(UserRoleForm, self).save(commit)
+    def validate_unique(self):
+        # los datos del usuario no se pueden editar desde este formulario
+        pass
 
     class Meta:
         model = User
         fields = ['nombre', 'apellido', 'email', 'borrar']
 
 
+class UserRoleFormSet(ListadoFormSet):
+    """
+    Conjunto de formularios de la página de administración de equipo. Carga
+    los roles, los miembros y el equipo del sprint activo una sola vez y los
+    comparte con cada formulario. Al guardar, aplica solo los cambios de rol y
+    las bajas en una sola transacción.
+
+    **Fecha:** 18/10/26
+
+    **Artefacto:** módulo de proyecto
+
+    |
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.proyecto = self.form_kwargs['proyecto_actual']
+        self.form_kwargs['equipo'] = self.proyecto.cargar_equipo()
+
+    def save(self, commit=True):
+        roles, quitar = {}, []
+        for form in self.initial_forms:
+            if form.cleaned_data.get('borrar'):
+                quitar.append(form.instance.pk)
+            elif form.cleaned_data['rol'] != form.rol_inicial:
+                roles[form.instance.pk] = form.cleaned_data['rol']
+        self.proyecto.actualizar_equipo(roles, quitar)
+        self.quitados = quitar
+        return [form.instance for form in self.initial_forms if form.instance.pk in roles]
+
+
 class AgregarMiembroForm(forms.Form):
     """
     Permite seleccionar un usuario que no forma parte del equipo del proyecto y
@@ -285,6 +444,77 @@ class AgregarMiembroForm(forms.Form):
         self.proyecto.asignar_rol(self.cleaned_data['usuarios'], self.cleaned_data['roles'].nombre)
 
 
+class ImportarMiembrosForm(forms.Form):
+    """
+    Permite agregar varios usuarios al equipo a partir de un archivo CSV. Cada
+    fila contiene el correo electrónico del usuario y el nombre de su rol. Los
+    usuarios y los roles se validan con una consulta por columna, sin importar
+    la cantidad de filas.
+
+    **Fecha:** 18/10/26
+
+    **Artefacto:** módulo de proyecto
+
+    :param proyecto: El proyecto al que se agregan los usuarios.
+    :type proyecto: Proyecto
+
+    |
+    """
+    archivo = forms.FileField(label="Archivo CSV")
+
+    def __init__(self, *args, proyecto, **kwargs):
+        self.proyecto = proyecto
+        super().__init__(*args, **kwargs)
+
+    def clean_archivo(self):
+        try:
+            filas = [fila for fila in csv.reader(io.TextIOWrapper(self.cleaned_data['archivo'], encoding='utf-8-sig'))
+                     if fila and any(fila)]
+        except (UnicodeDecodeError, csv.Error):
+            raise forms.ValidationError('El archivo no es un CSV válido.')
+        if filas and filas[0][0].strip().lower() in ('email', 'correo'):
+            filas = filas[1:]
+        if any(len(fila) < 2 for fila in filas):
+            raise forms.ValidationError('Cada fila debe contener un correo electrónico y un rol.')
+
+        # los correos se comparan sin distinguir mayúsculas de minúsculas
+        filas = [(email.strip(), rol.strip()) for email, rol, *_ in filas]
+        usuarios = dict(User.objects.annotate(email_normalizado=Lower('email'))
+                        .filter(email_normalizado__in=[email.lower() for email, _ in filas])
+                        .values_list('email_normalizado', 'user_id'))
+        roles = defaultdict(list)
+        for nombre, rol_id in self.proyecto.role_set.values_list('nombre', 'id'):
+            roles[nombre].append(rol_id)
+        miembros = set(self.proyecto.participa_set.values_list('usuario_id', flat=True))
+        errores = []
+        filas_usuario = {}
+        self.miembros = {}
+        for n, (email, rol) in enumerate(filas, start=1):
+            usuario_id = usuarios.get(email.lower())
+            if usuario_id is None:
+                errores.append('Fila %d: el usuario %s no existe.' % (n, email))
+            elif usuario_id in filas_usuario:
+                errores.append('Fila %d: el usuario %s ya aparece en la fila %d.'
+                               % (n, email, filas_usuario[usuario_id]))
+            elif rol not in roles:
+                errores.append('Fila %d: el rol %s no existe.' % (n, rol))
+            elif len(roles[rol]) > 1:
+                errores.append('Fila %d: existe más de un rol con el nombre %s.' % (n, rol))
+            elif usuario_id in miembros:
+                errores.append('Fila %d: el usuario %s ya forma parte del equipo.' % (n, email))
+            else:
+                self.miembros[usuario_id] = roles[rol][0]
+            if usuario_id is not None:
+                filas_usuario.setdefault(usuario_id, n)
+        if errores:
+            raise forms.ValidationError(errores)
+        return self.cleaned_data['archivo']
+
+    def save(self):
+        self.proyecto.agregar_miembros(self.miembros)
+        return len(self.miembros)
+
+
 class UploadFileForm(forms.Form):
     """
     Permite enviar archivos al servidor.
@@ -328,19 +558,18 @@ class UserStoryForm(ModelForm):
         super(ModelForm, self).__init__(*args, **kwargs)
         self.proyecto = proyecto
         if usuario:
-            if not usuario.has_perm('gestionar_proyecto', proyecto):
+            permisos = permisos_proyecto(usuario, proyecto)
+            if 'gestionar_proyecto' not in permisos:
                 self.fields.pop('horas_estimadas')
             else:
                 self.fields['horas_estimadas'] = forms.IntegerField(label="Costo estimado (en horas)",
                                                                     min_value=0, required=False)
-            if not usuario.has_perm('pila_producto', proyecto):
+            if 'pila_producto' not in permisos:
                 self.fields.pop('nombre')
                 self.fields.pop('descripcion')
 
     def save(self, commit=True):
         self.instance.proyecto = self.proyecto
-        if not self.instance.pk:
-            self.instance.numero = UserStory.objects.filter(proyecto=self.proyecto).count() + 1
         super(ModelForm, self).save(commit)
 
     class Meta:
@@ -453,30 +682,38 @@ class BacklogForm(ModelForm):
     **Artefacto:** módulo de desarrollo
 
     :param sprint: El sprint cuyos user stories se muestran.
+    :param backlog: Información del sprint compartida por todos los
+        formularios, obtenida mediante Sprint.cargar_backlog.
     :type sprint: Sprint
+    :type backlog: dict
     """
 
     borrar = forms.BooleanField(required=False)
 
-    def __init__(self, *args, proyecto, sprint, **kwargs):
+    def __init__(self, *args, proyecto, sprint, backlog, **kwargs):
         super(BacklogForm, self).__init__(*args, **kwargs)
 
         self.sprint = sprint
+        participantes = backlog['participantes']
 
         self.fields['n'] = forms.CharField(initial='US-'+str(self.instance.numero), disabled=True)
         self.fields['nombre'].disabled = True
         self.fields['prioridad'].required = False
         self.fields['horas_estimadas'].required = False
-        queryset = sprint.equipo.filter(participa__proyecto=proyecto,
-                                        participa__rol__permisos__codename__in=['desarrollo'])
-        initial = sprint.equipo.filter(participasprint__user_stories__in=[self.instance]).first()
-        self.nombre_desarrollador = str(initial)
-        self.fields['desarrollador'] = forms.ModelChoiceField(queryset=queryset, initial=initial, required=False)
+        self.desarrollador_inicial = backlog['asignaciones'].get(self.instance.pk)
+        inicial = participantes.get(self.desarrollador_inicial)
+        self.nombre_desarrollador = str(inicial.usuario) if inicial else None
+        choices = [('', '---------')] + [(usuario_id, str(p.usuario)) for usuario_id, p in participantes.items()
+                                         if usuario_id in backlog['desarrolladores']]
+        self.fields['desarrollador'] = forms.TypedChoiceField(choices=choices, initial=self.desarrollador_inicial,
+                                                              empty_value=None, required=False)
 
     def clean(self):
         """
-        Se asegura de que al marcar un formulario para borrarlo, esto quite al
-        usuario del equipo en vez de eliminarlo.
+        Conserva la prioridad y la estimación del user story cuando no se
+        envían, y descarta el desarrollador al marcar un formulario para
+        borrarlo, ya que esto quita el user story del sprint en vez de
+        eliminarlo.
 
         |
         """
@@ -486,37 +723,50 @@ class BacklogForm(ModelForm):
         if not cleaned_data.get('horas_estimadas'):
             cleaned_data['horas_estimadas'] = self.instance.horas_estimadas
         if cleaned_data.get('borrar'):
-            p = ParticipaSprint.objects.filter(sprint=self.sprint, user_stories__in=[self.instance]).first()
-            if p:
-                p.user_stories.remove(self.instance)
-                p.save()
-            if self.cleaned_data.get('desarrollador'):
-                cleaned_data.pop('desarrollador')
-            self.instance.sprint = None
-            self.instance.save()
+            cleaned_data['desarrollador'] = None
         return cleaned_data
 
-    def save(self, commit=True):
-        if self.cleaned_data.get('horas'):
-            self.participa.horas_diarias = self.cleaned_data['horas']
-            self.participa.save()
-
-        # actualiza el desarrollador del user story
-        p = ParticipaSprint.objects.filter(sprint=self.sprint, user_stories__in=[self.instance]).first()
-        if p:
-            p.user_stories.remove(self.instance)
-            p.save()
-        if self.cleaned_data.get('desarrollador'):
-            p = self.sprint.participasprint_set.get(usuario=self.cleaned_data['desarrollador'])
-            p.user_stories.add(self.instance)
-            p.save()
-        super(BacklogForm, self).save(commit)
-
     class Meta:
         model = UserStory
         fields = ['nombre', 'prioridad', 'horas_estimadas']
 
 
+class BacklogFormSet(ListadoFormSet):
+    """
+    Conjunto de formularios de la página de sprint backlog. Obtiene el equipo
+    del sprint, los desarrolladores habilitados y el desarrollador de cada
+    user story una sola vez y los comparte con cada formulario. Al guardar,
+    actualiza los user stories modificados y sus asignaciones en bloque.
+
+    **Fecha:** 18/10/26
+
+    **Artefacto:** módulo de desarrollo
+
+    |
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sprint = self.form_kwargs['sprint']
+        self.form_kwargs['backlog'] = self.backlog = self.sprint.cargar_backlog()
+
+    def save(self, commit=True):
+        modificados, asignaciones = [], {}
+        for form in self.initial_forms:
+            user_story = form.instance
+            if form.cleaned_data.get('borrar'):
+                user_story.sprint = None
+            if form.cleaned_data.get('borrar') or {'prioridad', 'horas_estimadas'} & set(form.changed_data):
+                modificados.append(user_story)
+            if form.cleaned_data.get('desarrollador') != form.desarrollador_inicial:
+                asignaciones[user_story.pk] = self.backlog['participantes'].get(form.cleaned_data['desarrollador'])
+        with transaction.atomic():
+            UserStory.objects.bulk_update(modificados, ['prioridad', 'horas_estimadas', 'sprint'])
+            if asignaciones:
+                self.sprint.asignar_user_stories(asignaciones)
+        return modificados
+
+
 class AgregarUserStoryForm(forms.Form):
     """
     Permite seleccionar un user story que no forma parte de ningún sprint.
@@ -571,16 +821,19 @@ class UserSprintForm(ModelForm):
     **Artefacto:** módulo de desarrollo
 
     :param sprint: El sprint cuyos roles se muestran.
+    :param participantes: Las participaciones del sprint indexadas por el id
+        del usuario, compartidas por todos los formularios.
     :type sprint: Sprint
+    :type participantes: dict
     """
 
     borrar = forms.BooleanField(required=False)
 
-    def __init__(self, *args, sprint, **kwargs):
+    def __init__(self, *args, sprint, participantes, **kwargs):
         super(UserSprintForm, self).__init__(*args, **kwargs)
 
         self.sprint = sprint
-        self.participa = ParticipaSprint.objects.get(sprint=sprint, usuario=self.instance)
+        self.participa = participantes[self.instance.pk]
 
         self.fields['nombre'].disabled = True
         self.fields['apellido'].disabled = True
@@ -590,29 +843,67 @@ class UserSprintForm(ModelForm):
 
     def clean(self):
         """
-        Se asegura de que al marcar un formulario para borrarlo, esto quite al
-        usuario del equipo en vez de eliminarlo.
+        Descarta las horas al marcar un formulario para borrarlo, ya que esto
+        quita al usuario del equipo en vez de eliminarlo.
 
         |
         """
         cleaned_data = super(ModelForm, self).clean()
         if cleaned_data.get('borrar'):
-            self.participa.delete()
             if cleaned_data.get('horas'):
                 cleaned_data.pop('horas')
         return cleaned_data
 
-    def save(self, commit=True):
-        if self.cleaned_data.get('horas'):
-            self.participa.horas_diarias = self.cleaned_data['horas']
-            self.participa.save()
-        super(UserSprintForm, self).save(commit)
+    def validate_unique(self):
+        # el correo del usuario no se puede editar desde este formulario
+        pass
 
     class Meta:
         model = User
         fields = ['nombre', 'apellido', 'email', 'borrar']
 
 
+class UserSprintFormSet(ListadoFormSet):
+    """
+    Conjunto de formularios de la página de equipo de sprint. Obtiene las
+    participaciones del sprint junto con sus usuarios en una sola consulta y
+    entrega a cada formulario la suya. Al guardar, actualiza las horas que
+    cambiaron y quita a los miembros marcados en bloque.
+
+    **Fecha:** 18/10/26
+
+    **Artefacto:** módulo de desarrollo
+
+    |
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sprint = self.form_kwargs['sprint']
+        if self.form_kwargs.get('participantes') is None:
+            self.form_kwargs['participantes'] = self.sprint.cargar_participantes()
+        self.participantes = self.form_kwargs['participantes']
+
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            self._queryset = [p.usuario for p in self.participantes.values()]
+        return self._queryset
+
+    def save(self, commit=True):
+        modificados, quitar = [], []
+        for form in self.initial_forms:
+            if form.cleaned_data.get('borrar'):
+                quitar.append(form.participa.id)
+            elif form.cleaned_data.get('horas') and form.cleaned_data['horas'] != form.participa.horas_diarias:
+                form.participa.horas_diarias = form.cleaned_data['horas']
+                modificados.append(form.participa)
+        with transaction.atomic():
+            ParticipaSprint.objects.bulk_update(modificados, ['horas_diarias'])
+            if quitar:
+                ParticipaSprint.objects.filter(id__in=quitar).delete()
+        return modificados
+
+
 class AgregarDesarrolladorForm(forms.Form):
     """
     Permite seleccionar un desarrollador que no forma parte del equipo del
@@ -625,18 +916,21 @@ class AgregarDesarrolladorForm(forms.Form):
 
     :param proyecto: El proyecto del cual se obtienen los usuarios.
     :param sprint: El sprint al que se le agrega un usuario.
+    :param participantes: Las participaciones del sprint indexadas por el id
+        del usuario. Si se omiten, se excluye al equipo mediante una subconsulta.
     :type proyecto: Proyecto
     :type sprint: Sprint
+    :type participantes: dict
 
     |
     """
 
-    def __init__(self, *args, proyecto, sprint, **kwargs):
+    def __init__(self, *args, proyecto, sprint, participantes=None, **kwargs):
         self.sprint = sprint
         super().__init__(*args, **kwargs)
-        queryset = proyecto.equipo \
-            .filter(participa__proyecto=proyecto, participa__rol__permisos__codename__in=['desarrollo']) \
-            .exclude(user_id__in=sprint.equipo.all())
+        equipo = list(participantes) if participantes is not None else sprint.participasprint_set.values('usuario_id')
+        queryset = User.objects.filter(participa__proyecto=proyecto, participa__rol__permisos__codename='desarrollo') \
+            .exclude(user_id__in=equipo)
         self.fields['usuario'] = forms.ModelChoiceField(queryset=queryset, required=True)
         self.fields['horas'] = forms.IntegerField(min_value=1, required=True)
 
@@ -664,3 +958,45 @@ class SprintReviewForm(ModelForm):
     class Meta:
         model = Sprint
         fields = ('review', )
+
+
+class FiltroHistorialForm(forms.Form):
+    """
+    Permite filtrar el historial de modificaciones de un proyecto por el
+    usuario que realizó el cambio y por un rango de fechas.
+
+    **Fecha:** 18/10/26
+
+    **Artefacto:** módulo de proyecto
+
+    :param proyecto: El proyecto cuyo historial se filtra.
+    :type proyecto: Proyecto
+
+    |
+    """
+    desde = forms.DateField(label="Desde", required=False,
+                            error_messages={'invalid': 'La fecha debe estar en formato dd/mm/aaaa.'})
+    hasta = forms.DateField(label="Hasta", required=False,
+                            error_messages={'invalid': 'La fecha debe estar en formato dd/mm/aaaa.'})
+
+    def __init__(self, *args, proyecto, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['usuario'] = forms.ModelChoiceField(
+            queryset=User.objects.filter(modificacion__proyecto=proyecto).distinct().order_by('nombre', 'apellido'),
+            label="Usuario", required=False)
+
+    def filtrar(self, historial):
+        """Aplica los filtros válidos a una consulta de modificaciones. Las
+        fechas se comparan como rangos de horas para aprovechar el índice
+        sobre el proyecto y la fecha."""
+        if not self.is_valid():
+            return historial
+        if self.cleaned_data.get('usuario'):
+            historial = historial.filter(usuario=self.cleaned_data['usuario'])
+        if self.cleaned_data.get('desde'):
+            historial = historial.filter(fecha__gte=timezone.make_aware(
+                datetime.datetime.combine(self.cleaned_data['desde'], datetime.time.min)))
+        if self.cleaned_data.get('hasta'):
+            historial = historial.filter(fecha__lt=timezone.make_aware(
+                datetime.datetime.combine(self.cleaned_data['hasta'] + datetime.timedelta(days=1), datetime.time.min)))
+        return historial
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from sgp.utils import enviar_correos_pendientes
+
+
+class Command(BaseCommand):
+    help = 'Envía los correos pendientes de la bandeja de salida.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=100, help='Número de correos enviados por conexión.')
+        parser.add_argument('--continuo', action='store_true',
+                            help='Sigue revisando la bandeja de salida en vez de terminar al vaciarla.')
+        parser.add_argument('--intervalo', type=float, default=10,
+                            help='Segundos de espera entre revisiones en modo continuo.')
+
+    def handle(self, *args, **options):
+        while True:
+            enviados, fallidos = enviar_correos_pendientes(options['lote'])
+            if enviados or fallidos:
+                self.stdout.write('%d correos enviados, %d fallidos.' % (enviados, fallidos))
+            if enviados + fallidos == options['lote']:
+                continue
+            if not options['continuo']:
+                break
+            time.sleep(options['intervalo'])
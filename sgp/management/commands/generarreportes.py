@@ -0,0 +1,49 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from sgp.models import Reporte
+from sgp.utils import generar_reporte
+
+
+class Command(BaseCommand):
+    help = 'Genera los reportes en PDF pendientes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=os.cpu_count(),
+                            help='Número de procesos que generan reportes en paralelo.')
+        parser.add_argument('--continuo', action='store_true',
+                            help='Sigue revisando la cola de reportes en vez de terminar al vaciarla.')
+        parser.add_argument('--intervalo', type=float, default=2,
+                            help='Segundos de espera entre revisiones en modo continuo.')
+
+    def handle(self, *args, **options):
+        procesos = max(options['procesos'] or 1, 1)
+        pool = None
+        if procesos > 1:
+            # cada proceso abre su propia conexión a la base de datos
+            connections.close_all()
+            pool = ProcessPoolExecutor(procesos, mp_context=multiprocessing.get_context('fork'))
+
+        try:
+            while True:
+                pendientes = list(Reporte.objects.filter(estado=Reporte.Estado.PENDIENTE)
+                                  .order_by('fecha_creacion').values_list('id', flat=True))
+                if pendientes:
+                    if pool:
+                        list(pool.map(generar_reporte, pendientes))
+                    else:
+                        for reporte_id in pendientes:
+                            generar_reporte(reporte_id)
+                    self.stdout.write('%d reportes generados.' % len(pendientes))
+                    continue
+                if not options['continuo']:
+                    break
+                time.sleep(options['intervalo'])
+        finally:
+            if pool:
+                pool.shutdown()
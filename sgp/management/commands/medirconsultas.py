@@ -0,0 +1,115 @@
+import json
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from sgp.models import User, Proyecto, Sprint, UserStory, Incremento, Modificacion
+
+
+class Command(BaseCommand):
+    help = ('Mide el plan de ejecución y el tiempo de las consultas de las vistas más frecuentes. '
+            'Para comparar los índices, se ejecuta una vez con --guardar antes de migrar y otra vez '
+            'con --comparar después de migrar.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sembrar', action='store_true',
+                            help='Crea proyectos de prueba antes de medir.')
+        parser.add_argument('--proyectos', type=int, default=20,
+                            help='Cantidad de proyectos de prueba a crear.')
+        parser.add_argument('--user-stories', type=int, default=500,
+                            help='Cantidad de user stories por proyecto de prueba.')
+        parser.add_argument('--repeticiones', type=int, default=20,
+                            help='Cantidad de veces que se ejecuta cada consulta.')
+        parser.add_argument('--guardar', metavar='ARCHIVO',
+                            help='Guarda los resultados en un archivo JSON.')
+        parser.add_argument('--comparar', metavar='ARCHIVO',
+                            help='Compara los resultados con los de una ejecución anterior.')
+
+    def handle(self, *args, **options):
+        if options['sembrar']:
+            inicio = time.perf_counter()
+            self.sembrar(options['proyectos'], options['user_stories'])
+            self.stdout.write('Datos de prueba creados en %.3f segundos.' % (time.perf_counter() - inicio))
+
+        proyecto = Proyecto.objects.annotate(n=Count('product_backlog')).order_by('-n', 'id').first()
+        sprint = proyecto and proyecto.sprint_set.filter(estado=Sprint.Estado.INICIADO).first()
+        if sprint is None:
+            raise CommandError('No hay un proyecto con un sprint iniciado. Utilice --sembrar.')
+        numero = proyecto.product_backlog.order_by('-numero').values_list('numero', flat=True).first() or 1
+        fecha = sprint.fecha_inicio
+
+        # consultas que realizan las vistas de user story, kanban, registro e historial
+        consultas = {
+            'user story por número': UserStory.objects.filter(proyecto_id=proyecto.id, numero=numero),
+            'sprint activo del proyecto': Sprint.objects.filter(proyecto_id=proyecto.id,
+                                                                estado=Sprint.Estado.INICIADO),
+            'registro del sprint': Incremento.objects.filter(user_story__sprint=sprint).order_by('fecha'),
+            'incrementos del día': Incremento.objects.filter(user_story__sprint=sprint, fecha=fecha),
+            'historial del proyecto': Modificacion.objects.filter(proyecto_id=proyecto.id).order_by('fecha'),
+        }
+
+        anteriores = {}
+        if options['comparar']:
+            with open(options['comparar']) as archivo:
+                anteriores = json.load(archivo)
+
+        resultados = {}
+        for nombre, consulta in consultas.items():
+            tiempos = []
+            for _ in range(options['repeticiones']):
+                inicio = time.perf_counter()
+                list(consulta.all())
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            resultados[nombre] = {'plan': consulta.explain(), 'ms': statistics.median(tiempos)}
+
+            self.stdout.write(self.style.MIGRATE_HEADING(nombre))
+            self.stdout.write(resultados[nombre]['plan'])
+            if nombre in anteriores:
+                antes = anteriores[nombre]['ms']
+                self.stdout.write('%.3f ms (antes %.3f ms, %.1fx)\n' % (
+                    resultados[nombre]['ms'], antes, antes / resultados[nombre]['ms']))
+            else:
+                self.stdout.write('%.3f ms\n' % resultados[nombre]['ms'])
+
+        if options['guardar']:
+            with open(options['guardar'], 'w') as archivo:
+                json.dump(resultados, archivo, ensure_ascii=False, indent=2)
+
+    @transaction.atomic
+    def sembrar(self, proyectos, user_stories):
+        """Crea proyectos iniciados con un sprint activo, user stories,
+        incrementos y modificaciones, utilizando inserciones en bloque."""
+        usuario, _ = User.objects.get_or_create(email='benchmark@sgp.local', defaults={
+            'user_id': 'benchmark', 'nombre': 'Benchmark', 'apellido': 'SGP'})
+        hoy = timezone.localdate()
+        for i in range(proyectos):
+            proyecto = Proyecto.objects.create(nombre='Benchmark %d' % (i + 1), creador=usuario,
+                                               duracion_sprint=14, estado=Proyecto.Estado.INICIADO,
+                                               fecha_inicio=hoy - timedelta(days=28), fecha_fin=hoy)
+            Sprint.objects.bulk_create([
+                Sprint(nombre='Sprint %d' % (j + 1), proyecto=proyecto, estado=estado,
+                       fecha_inicio=hoy - timedelta(days=28 - 14 * j), fecha_fin=hoy - timedelta(days=14 - 14 * j))
+                for j, estado in enumerate([Sprint.Estado.FINALIZADO, Sprint.Estado.INICIADO,
+                                            Sprint.Estado.PENDIENTE])
+            ])
+            sprints = list(proyecto.sprint_set.order_by('id'))
+            inicio = proyecto.reservar_numeros(user_stories)
+            UserStory.objects.bulk_create([
+                UserStory(numero=inicio + n, nombre='US %d' % (inicio + n), proyecto=proyecto, horas_estimadas=8,
+                          sprint=sprints[n % len(sprints)])
+                for n in range(user_stories)
+            ], batch_size=500)
+            backlog = proyecto.product_backlog.exclude(sprint=None).values_list('id', 'sprint__fecha_inicio')
+            Incremento.objects.bulk_create([
+                Incremento(user_story_id=us_id, usuario=usuario, fecha=inicio + timedelta(days=d), horas=1)
+                for us_id, inicio in backlog for d in range(0, 14, 3)
+            ], batch_size=500)
+            Modificacion.objects.bulk_create([
+                Modificacion(usuario=usuario, proyecto=proyecto, accion='Editar proyecto')
+                for _ in range(user_stories)
+            ], batch_size=500)
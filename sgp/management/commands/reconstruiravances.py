@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from sgp.models import Sprint
+
+
+class Command(BaseCommand):
+    help = 'Regenera el avance diario de los sprints a partir del registro de incrementos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('sprints', nargs='*', type=int, help='IDs de los sprints a procesar (todos si se omite).')
+
+    def handle(self, *args, **options):
+        sprints = Sprint.objects.exclude(estado=Sprint.Estado.PENDIENTE)
+        if options['sprints']:
+            sprints = sprints.filter(id__in=options['sprints'])
+
+        for sprint in sprints:
+            sprint.reconstruir_avance()
+            self.stdout.write('Sprint %s: %d avances registrados.' % (sprint, sprint.avancesprint_set.count()))
@@ -1,29 +1,69 @@
+import time
+from collections import defaultdict
+
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 
-from sgp.models import Proyecto
-from sgp.utils import enviar_recordatorio
+from sgp.models import Correo, Proyecto, Sprint, Participa, ParticipaSprint
+from sgp.utils import redactar_recordatorio
 
 
 class Command(BaseCommand):
-    help = 'Envía por correo recordatorios de los eventos del día de hoy.'
+    help = 'Agrega a la bandeja de salida recordatorios de los eventos del día de hoy.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Muestra los recordatorios que se enviarían sin agregarlos a la bandeja.')
 
     def handle(self, *args, **options):
+        inicio = time.perf_counter()
         hoy = timezone.localdate()
+        pendiente = Proyecto.Estado.PENDIENTE
+        iniciado = Proyecto.Estado.INICIADO
 
-        for p in Proyecto.objects.filter(estado=Proyecto.Estado.PENDIENTE):
-            if p.fecha_inicio == hoy:
-                enviar_recordatorio(p, 'proyecto', 'inicio')
-
-            if p.sprint_pendiente and p.sprint_pendiente.fecha_inicio == hoy:
-                enviar_recordatorio(p.sprint_pendiente, 'sprint', 'inicio')
+        # obtiene los eventos de hoy con una consulta por tipo de evento
+        proyectos = [
+            (p, 'proyecto', 'inicio') for p in
+            Proyecto.objects.filter(estado=pendiente, fecha_inicio=hoy).values('id', 'nombre')
+        ] + [
+            (p, 'proyecto', 'fin') for p in
+            Proyecto.objects.filter(estado=iniciado, fecha_fin=hoy).values('id', 'nombre')
+        ]
+        sprints = [
+            (s, 'sprint', 'inicio') for s in
+            Sprint.objects.filter(estado=Sprint.Estado.PENDIENTE, fecha_inicio=hoy,
+                                  proyecto__estado__in=[pendiente, iniciado]).values('id', 'nombre')
+        ] + [
+            (s, 'sprint', 'fin') for s in
+            Sprint.objects.filter(estado=Sprint.Estado.INICIADO, fecha_fin=hoy,
+                                  proyecto__estado=iniciado).values('id', 'nombre')
+        ]
 
-        for p in Proyecto.objects.filter(estado=Proyecto.Estado.INICIADO):
-            if p.sprint_pendiente and p.sprint_pendiente.fecha_inicio == hoy:
-                enviar_recordatorio(p.sprint_pendiente, 'sprint', 'inicio')
+        # obtiene los destinatarios de todos los eventos en bloque
+        equipos = {'proyecto': defaultdict(list), 'sprint': defaultdict(list)}
+        if proyectos:
+            for proyecto_id, email in Participa.objects.filter(
+                    proyecto__in={p['id'] for p, _, _ in proyectos}).values_list('proyecto_id', 'usuario__email'):
+                equipos['proyecto'][proyecto_id].append(email)
+        if sprints:
+            for sprint_id, email in ParticipaSprint.objects.filter(
+                    sprint__in={s['id'] for s, _, _ in sprints}).values_list('sprint_id', 'usuario__email'):
+                equipos['sprint'][sprint_id].append(email)
 
-            if p.sprint_activo and p.sprint_activo.fecha_fin == hoy:
-                enviar_recordatorio(p.sprint_activo, 'sprint', 'fin')
+        # redacta los recordatorios y los agrega en bloque a la bandeja de
+        # salida, desde donde el comando enviarcorreos los envía y reintenta
+        # si fallan
+        correos = []
+        for actividad, tipo, accion in proyectos + sprints:
+            destinatarios = equipos[tipo][actividad['id']]
+            if not destinatarios:
+                continue
+            asunto, cuerpo, html = redactar_recordatorio(actividad['nombre'], tipo, accion)
+            if options['dry_run']:
+                self.stdout.write('%s (%d destinatarios)' % (asunto, len(destinatarios)))
+            correos.append(Correo(asunto=asunto, cuerpo=cuerpo, html=html, destinatarios=destinatarios))
+        if correos and not options['dry_run']:
+            Correo.objects.bulk_create(correos)
 
-            if p.fecha_fin == hoy:
-                enviar_recordatorio(p, 'proyecto', 'fin')
+        self.stdout.write('%d recordatorios %s en %.3f segundos.' % (
+            len(correos), 'por enviar' if options['dry_run'] else 'encolados', time.perf_counter() - inicio))
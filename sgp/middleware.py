@@ -0,0 +1,31 @@
+"""
+Los middleware procesan cada solicitud antes de que llegue a la vista. En
+esta aplicación se utiliza uno para cargar de una vez los permisos del usuario
+sobre el proyecto al que se accede.
+"""
+from .utils import permisos_proyecto
+
+
+class PermisosProyectoMiddleware:
+    """
+    Si la vista recibe el parámetro proyecto_id, obtiene los permisos del
+    usuario sobre ese proyecto con una sola consulta y los guarda en
+    request.proyecto_perms. Las vistas, los formularios y las plantillas
+    utilizan este conjunto en lugar de consultar cada permiso por separado.
+
+    **Fecha:** 18/10/26
+
+    **Artefacto:** módulo de seguridad
+
+    |
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if 'proyecto_id' in view_kwargs:
+            request.proyecto_perms = permisos_proyecto(request.user, view_kwargs['proyecto_id'])
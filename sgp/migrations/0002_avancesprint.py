@@ -0,0 +1,32 @@
+# Generated by Django 3.2.6 on 2026-10-18 06:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sgp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvanceSprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('horas_trabajadas', models.IntegerField(default=0)),
+                ('horas_restantes', models.IntegerField(default=0)),
+                ('pendientes', models.IntegerField(default=0)),
+                ('iniciados', models.IntegerField(default=0)),
+                ('en_qa', models.IntegerField(default=0)),
+                ('finalizados', models.IntegerField(default=0)),
+                ('cancelados', models.IntegerField(default=0)),
+                ('sprint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='sgp.sprint')),
+            ],
+            options={
+                'unique_together': {('sprint', 'fecha')},
+            },
+        ),
+    ]
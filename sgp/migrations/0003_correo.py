@@ -0,0 +1,29 @@
+# Generated by Django 3.2.6 on 2026-10-18 06:03
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sgp', '0002_avancesprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Correo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('asunto', models.CharField(max_length=255)),
+                ('cuerpo', models.TextField()),
+                ('html', models.TextField(blank=True, default='')),
+                ('destinatarios', models.JSONField(default=list)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_envio', models.DateTimeField(null=True)),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('intentos', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+            ],
+        ),
+    ]
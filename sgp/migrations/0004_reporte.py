@@ -0,0 +1,34 @@
+# Generated by Django 3.2.6 on 2026-10-18 06:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sgp', '0003_correo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reporte',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('PB', 'Product Backlog'), ('SB', 'Sprint Backlog'), ('UP', 'US - Prioridad')], max_length=2)),
+                ('version', models.CharField(max_length=40)),
+                ('estado', models.CharField(choices=[('P', 'Pendiente'), ('G', 'Generado'), ('E', 'Error')], default='P', max_length=1)),
+                ('archivo', models.FileField(blank=True, upload_to='reportes/')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_generacion', models.DateTimeField(null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('proyecto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='sgp.proyecto')),
+                ('sprint', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='sgp.sprint')),
+                ('usuario', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('tipo', 'proyecto', 'sprint', 'version')},
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+from django.db import migrations
+
+
+def permisos_redundantes(apps):
+    """Retorna un par con el tipo de contenido de Proyecto y un diccionario
+    que asocia cada (usuario, proyecto) con los permisos que le otorga su rol,
+    incluyendo el de vista."""
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    Permission = apps.get_model('auth', 'Permission')
+    Participa = apps.get_model('sgp', 'Participa')
+
+    content_type = ContentType.objects.filter(app_label='sgp', model='proyecto').first()
+    if content_type is None:
+        return None, {}
+    vista = Permission.objects.filter(content_type=content_type, codename='vista').values_list('id', flat=True).first()
+
+    redundantes = {}
+    for usuario_id, proyecto_id, permiso_id in Participa.objects.values_list(
+            'usuario_id', 'proyecto_id', 'rol__permisos'):
+        permisos = redundantes.setdefault((usuario_id, str(proyecto_id)), {vista} if vista else set())
+        if permiso_id:
+            permisos.add(permiso_id)
+    return content_type, redundantes
+
+
+def eliminar_permisos_por_usuario(apps, schema_editor):
+    """Elimina las filas de django-guardian que solo copiaban los permisos del
+    rol de cada miembro. Los permisos asignados por fuera de los roles se
+    mantienen."""
+    UserObjectPermission = apps.get_model('guardian', 'UserObjectPermission')
+    content_type, redundantes = permisos_redundantes(apps)
+    borrar = [pk for pk, usuario_id, object_pk, permiso_id in UserObjectPermission.objects.filter(
+        content_type=content_type).values_list('id', 'user_id', 'object_pk', 'permission_id')
+        if permiso_id in redundantes.get((usuario_id, object_pk), ())]
+    for i in range(0, len(borrar), 500):
+        UserObjectPermission.objects.filter(id__in=borrar[i:i + 500]).delete()
+
+
+def restaurar_permisos_por_usuario(apps, schema_editor):
+    """Vuelve a copiar los permisos de cada rol a sus miembros."""
+    UserObjectPermission = apps.get_model('guardian', 'UserObjectPermission')
+    content_type, redundantes = permisos_redundantes(apps)
+    existentes = set(UserObjectPermission.objects.filter(content_type=content_type).values_list(
+        'user_id', 'object_pk', 'permission_id'))
+    UserObjectPermission.objects.bulk_create([
+        UserObjectPermission(user_id=usuario_id, object_pk=object_pk, permission_id=permiso_id,
+                             content_type=content_type)
+        for (usuario_id, object_pk), permisos in redundantes.items() for permiso_id in permisos
+        if (usuario_id, object_pk, permiso_id) not in existentes
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sgp', '0004_reporte'),
+        ('guardian', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(eliminar_permisos_por_usuario, restaurar_permisos_por_usuario),
+    ]
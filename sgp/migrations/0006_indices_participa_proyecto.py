@@ -0,0 +1,21 @@
+# Generated by Django 3.2.6 on 2026-10-18 06:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sgp', '0005_permisos_por_rol'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='participa',
+            unique_together={('usuario', 'proyecto')},
+        ),
+        migrations.AddIndex(
+            model_name='proyecto',
+            index=models.Index(fields=['estado', 'fecha_creacion'], name='sgp_proyect_estado_4bda8d_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 3.2.6 on 2026-10-18 06:21
+
+from django.db import migrations, models
+
+
+def renumerar_duplicados(apps, schema_editor):
+    """Asigna un número nuevo a los user stories que repiten el número de otro
+    del mismo proyecto, para que se pueda crear la restricción única. El user
+    story más antiguo conserva su número."""
+    UserStory = apps.get_model('sgp', 'UserStory')
+    ultimo = {}
+    vistos = set()
+    duplicados = []
+    for us in UserStory.objects.order_by('proyecto_id', 'numero', 'id').only('id', 'proyecto_id', 'numero'):
+        ultimo[us.proyecto_id] = max(ultimo.get(us.proyecto_id, 0), us.numero)
+        if (us.proyecto_id, us.numero) in vistos:
+            duplicados.append(us)
+        vistos.add((us.proyecto_id, us.numero))
+    for us in duplicados:
+        ultimo[us.proyecto_id] += 1
+        us.numero = ultimo[us.proyecto_id]
+    UserStory.objects.bulk_update(duplicados, ['numero'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sgp', '0006_indices_participa_proyecto'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='incremento',
+            index=models.Index(fields=['user_story', 'fecha'], name='sgp_increme_user_st_9336e4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='modificacion',
+            index=models.Index(fields=['proyecto', 'fecha'], name='sgp_modific_proyect_88e10a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sprint',
+            index=models.Index(fields=['proyecto', 'estado'], name='sgp_sprint_proyect_f9c221_idx'),
+        ),
+        migrations.RunPython(renumerar_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='userstory',
+            constraint=models.UniqueConstraint(fields=('proyecto', 'numero'), name='userstory_proyecto_numero'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.6 on 2026-10-18 06:23
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def inicializar_contador(apps, schema_editor):
+    """Inicializa el contador de cada proyecto con el número más alto de sus
+    user stories."""
+    Proyecto = apps.get_model('sgp', 'Proyecto')
+    UserStory = apps.get_model('sgp', 'UserStory')
+    ultimo = UserStory.objects.filter(proyecto=OuterRef('pk')).order_by().values('proyecto') \
+        .annotate(ultimo=Max('numero')).values('ultimo')
+    Proyecto.objects.update(ultimo_user_story=Coalesce(Subquery(ultimo), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sgp', '0007_indices_consultas_frecuentes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proyecto',
+            name='ultimo_user_story',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(inicializar_contador, migrations.RunPython.noop),
+    ]
@@ -3,12 +3,19 @@ Los modelos corresponden a tablas en la base de datos, y cada instancia
 representa una entrada. A continuación se documentan los campos principales y
 los métodos adicionales de los modelos en uso por la aplicación.
 """
+import hashlib
+import threading
 from datetime import date, timedelta
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, Exists, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce
+from django.db.models.signals import post_migrate
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin, Group, Permission
+from django.contrib.contenttypes.models import ContentType
+from django.dispatch import receiver
 from django.utils import timezone
-from guardian.shortcuts import assign_perm, get_perms_for_model, remove_perm
+from guardian.shortcuts import get_perms_for_model
 
 
 class UserManager(BaseUserManager):
@@ -85,6 +92,58 @@ class User(AbstractBaseUser, PermissionsMixin):
         return self.nombre + ' ' + self.apellido
 
 
+class ProyectoQuerySet(models.QuerySet):
+    def visibles(self, usuario, estado=None):
+        """
+        Retorna los proyectos que el usuario puede ver, es decir, aquellos
+        de cuyo equipo forma parte y aquellos sobre los que tiene el permiso
+        de vista asignado directamente. Los superusuarios ven todos los
+        proyectos. Opcionalmente filtra los proyectos según su estado.
+        """
+        proyectos = self
+        if not usuario.is_superuser:
+            proyecto_pk = Cast(OuterRef('pk'), models.CharField())
+            proyectos = proyectos.filter(
+                Exists(Participa.objects.filter(usuario=usuario, proyecto=OuterRef('pk'))) |
+                Exists(Permission.objects.filter(
+                    codename='vista', content_type=ContentType.objects.get_for_model(Proyecto),
+                    userobjectpermission__user=usuario, userobjectpermission__object_pk=proyecto_pk)) |
+                Exists(Permission.objects.filter(
+                    codename='vista', content_type=ContentType.objects.get_for_model(Proyecto),
+                    groupobjectpermission__group__user=usuario, groupobjectpermission__object_pk=proyecto_pk)))
+        if estado:
+            proyectos = proyectos.filter(estado=estado)
+        return proyectos
+
+
+_version_sprints = 0
+"""Cuenta las modificaciones de sprints realizadas por el proceso. Permite
+descartar el estado de sprints guardado en instancias de Proyecto cuando algún
+sprint cambia."""
+
+_bloqueo_version_sprints = threading.Lock()
+
+
+def _incrementar_version_sprints():
+    """Registra una modificación de sprints. Se utiliza un bloqueo para que
+    los hilos del servidor no pierdan incrementos."""
+    global _version_sprints
+    with _bloqueo_version_sprints:
+        _version_sprints += 1
+
+
+_permisos_rol = {}
+"""Permisos que pueden asignarse a un rol, indexados por su nombre. Se
+consultan una sola vez y se descartan cada vez que se migra o se vacía la base
+de datos, ya que sus ids pueden cambiar."""
+
+
+@receiver(post_migrate)
+def descartar_permisos_rol(**kwargs):
+    """Descarta los permisos de rol guardados por el proceso."""
+    _permisos_rol.clear()
+
+
 class Proyecto(models.Model):
     """
     Describe un proyecto. Este debe ser creado por un usuario con el permiso
@@ -137,25 +196,45 @@ class Proyecto(models.Model):
     se utiliza la relación Participa, la cual almacena el rol al que el usuario 
     pertenece dentro del proyecto."""
 
+    ultimo_user_story = models.IntegerField(default=0)
+    """Número del último user story creado en el proyecto. Se incrementa al
+    reservar números para user stories nuevos, por lo que estos nunca se
+    repiten aunque se borre un user story."""
+
+    objects = ProyectoQuerySet.as_manager()
+
+    def reservar_numeros(self, cantidad=1):
+        """
+        Reserva un bloque contiguo de números para user stories nuevos. El
+        contador se incrementa con una sola actualización, la cual bloquea la
+        fila del proyecto hasta que termine la transacción, por lo que dos
+        reservas simultáneas nunca obtienen el mismo número. Debe utilizarse
+        al crear user stories con bulk_create, ya que este no llama a save.
+
+        :param cantidad: La cantidad de números a reservar.
+        :type cantidad: int
+        :return: El primer número del bloque reservado.
+        :rtype: int
+        """
+        with transaction.atomic():
+            Proyecto.objects.filter(pk=self.pk).update(ultimo_user_story=F('ultimo_user_story') + cantidad)
+            self.ultimo_user_story = Proyecto.objects.values_list('ultimo_user_story', flat=True).get(pk=self.pk)
+        return self.ultimo_user_story - cantidad + 1
+
     def asignar_rol(self, user, role):
         """
         Asigna a un usuario un rol dentro del proyecto, otorgandole todos los
         permisos que esto implica. Si el usuario ya tenía un rol anterior,
-        revoca todos los permisos que le correspondían.
+        este es reemplazado. Los permisos no se copian al usuario, sino que se
+        obtienen del rol al consultarlos.
 
         :param user: El usuario al que se le asignará el rol.
         :param role: El nombre del rol que será asignado.
         :type user: User
         :type role: string
         """
-        if self.equipo.filter(user_id=user.user_id).exists():
-            self.quitar_rol(user)
-        else:
-            assign_perm('vista', user, self)
-
-        participa = Participa.objects.create(usuario=user, proyecto=self, rol=self.role_set.get(nombre=role))
-        for perm in participa.rol.permisos.all():
-            assign_perm(perm.codename, user, self)
+        Participa.objects.update_or_create(usuario=user, proyecto=self,
+                                           defaults={'rol': self.role_set.get(nombre=role)})
 
     def quitar_rol(self, user):
         """
@@ -165,10 +244,116 @@ class Proyecto(models.Model):
         :param user: El usuario al que se le revocará el rol.
         :type user: User
         """
-        participa = user.participa_set.get(proyecto=self)
-        for perm in participa.rol.permisos.all():
-            remove_perm(perm.codename, user, self)
-        participa.delete()
+        user.participa_set.get(proyecto=self).delete()
+
+    def cargar_equipo(self):
+        """
+        Obtiene la información necesaria para administrar el equipo con un
+        número fijo de consultas, sin importar la cantidad de miembros.
+
+        :return: Un diccionario con los roles del proyecto indexados por su id,
+            los ids de los roles con permiso de administración de equipo, el id
+            del rol de cada miembro, y los miembros del sprint activo.
+        :rtype: dict
+        """
+        roles = {rol.id: rol for rol in self.role_set.order_by('id').prefetch_related('permisos')}
+        return {
+            'roles': roles,
+            'roles_administracion': {rol.id for rol in roles.values()
+                                     if any(perm.codename == 'administrar_equipo' for perm in rol.permisos.all())},
+            'miembros': dict(self.participa_set.values_list('usuario_id', 'rol_id')),
+            'ocupados': set(ParticipaSprint.objects.filter(sprint__proyecto=self, sprint__estado=Sprint.Estado.INICIADO)
+                            .values_list('usuario_id', flat=True)),
+        }
+
+    def actualizar_equipo(self, roles=None, quitar=()):
+        """
+        Cambia el rol de varios miembros y quita a otros del equipo en una sola
+        transacción. Se realiza una actualización por cada rol asignado, sin
+        importar la cantidad de miembros que lo reciben.
+
+        :param roles: El id del nuevo rol de cada miembro, indexado por el id del usuario.
+        :param quitar: Los ids de los usuarios que se quitan del equipo.
+        :type roles: dict
+        :type quitar: [string]
+        """
+        por_rol = {}
+        for usuario_id, rol_id in (roles or {}).items():
+            por_rol.setdefault(rol_id, []).append(usuario_id)
+        with transaction.atomic():
+            for rol_id, usuarios in por_rol.items():
+                self.participa_set.filter(usuario_id__in=usuarios).update(rol_id=rol_id)
+            if quitar:
+                self.participa_set.filter(usuario_id__in=quitar).delete()
+
+    def agregar_miembros(self, miembros):
+        """
+        Agrega varios usuarios al equipo con una sola inserción. Los usuarios
+        que ya forman parte del equipo conservan su rol.
+
+        :param miembros: El id del rol de cada usuario nuevo, indexado por el id del usuario.
+        :type miembros: dict
+        """
+        Participa.objects.bulk_create([Participa(usuario_id=usuario_id, proyecto=self, rol_id=rol_id)
+                                       for usuario_id, rol_id in miembros.items()], ignore_conflicts=True)
+
+    @staticmethod
+    def consultar_permisos(participa, usuarios, proyecto_id):
+        """
+        Retorna el conjunto de permisos sobre el proyecto que otorgan las
+        participaciones dadas, junto con los asignados directamente a los
+        usuarios o a sus grupos mediante django-guardian. Cada participación
+        otorga el permiso de vista y los permisos de su rol. Todo se obtiene
+        con una sola consulta.
+
+        :param participa: Participaciones en el proyecto.
+        :param usuarios: Usuarios cuyos permisos directos se consideran.
+        :param proyecto_id: ID del proyecto.
+        :type participa: QuerySet
+        :type usuarios: [User]
+        :type proyecto_id: int
+        """
+        proyecto_id = str(proyecto_id)
+        roles = participa.order_by().values_list('rol__permisos__codename', flat=True)
+        vista = participa.order_by().annotate(
+            codename=models.Value('vista', output_field=models.CharField())).values_list('codename', flat=True)
+        directos = Permission.objects.filter(
+            content_type=ContentType.objects.get_for_model(Proyecto)
+        ).filter(
+            models.Q(userobjectpermission__user__in=usuarios, userobjectpermission__object_pk=proyecto_id) |
+            models.Q(groupobjectpermission__group__user__in=usuarios, groupobjectpermission__object_pk=proyecto_id)
+        ).order_by().values_list('codename', flat=True)
+        # la consulta con la anotación va primero para que la unión conserve sus columnas
+        return set(vista.union(roles, directos)) - {None}
+
+    @staticmethod
+    def permisos_usuario(usuario, proyecto_id):
+        """
+        Retorna el conjunto de permisos del usuario sobre el proyecto. Los
+        superusuarios activos tienen todos los permisos y los usuarios
+        inactivos o anónimos no tienen ninguno.
+
+        :param usuario: El usuario cuyos permisos se consultan.
+        :param proyecto_id: ID del proyecto.
+        :type usuario: User
+        :type proyecto_id: int
+        """
+        if usuario.is_anonymous or not usuario.is_active:
+            return set()
+        if usuario.is_superuser:
+            return {perm for perm, _ in Proyecto._meta.permissions}
+        return Proyecto.consultar_permisos(Participa.objects.filter(usuario=usuario, proyecto_id=proyecto_id),
+                                           [usuario], proyecto_id)
+
+    @staticmethod
+    def permisos_rol():
+        """Retorna un diccionario con los permisos de proyecto que pueden
+        asignarse a un rol, indexados por su nombre. Estos solo cambian al
+        migrar la base de datos, por lo que se consultan una sola vez."""
+        if not _permisos_rol:
+            _permisos_rol.update((perm.codename, perm) for perm in
+                                 get_perms_for_model(Proyecto).exclude(codename='vista'))
+        return _permisos_rol
 
     def crear_rol(self, nombre, permisos):
         """
@@ -179,11 +364,8 @@ class Proyecto(models.Model):
         :type nombre: string
         :type permisos: [string]"""
         rol = Role.objects.create(nombre=nombre, proyecto=self)
-        perms = get_perms_for_model(Proyecto)
-        for perm in permisos:
-            rol.permisos.add(perms.get(codename=perm))
-            rol.permisos.add(perms.get(codename=perm))
-            rol.permisos.add(perms.get(codename=perm))
+        if permisos:
+            rol.permisos.add(*[Proyecto.permisos_rol()[perm] for perm in permisos])
 
     def crear_roles_predeterminados(self):
         """
@@ -219,11 +401,14 @@ class Proyecto(models.Model):
             msg['errores'].append('No hay suficiente tiempo para realizar al menos un sprint.')
 
         # verifica que existe al menos un usuario con cada permiso
+        equipo = self.equipo.filter(is_active=True)
+        if equipo.filter(is_superuser=True).exists():
+            permisos = {perm for perm, _ in Proyecto._meta.permissions}
+        else:
+            permisos = Proyecto.consultar_permisos(self.participa_set.filter(usuario__is_active=True),
+                                                   equipo, self.pk)
         for perm, desc in Proyecto._meta.permissions:
-            for user in self.equipo.all():
-                if user.has_perm(perm, self):
-                    break
-            else:
+            if perm not in permisos:
                 msg['errores'].append('Falta al menos un usuario con el permiso de '+desc+'.')
 
         return msg
@@ -255,23 +440,46 @@ class Proyecto(models.Model):
 
         return msg
 
+    def estado_sprints(self):
+        """
+        Retorna un diccionario con el sprint activo, el sprint pendiente y la
+        lista de sprints finalizados del proyecto. Todos los sprints se cargan
+        con una sola consulta y el resultado se guarda en la instancia hasta
+        que algún sprint sea guardado o eliminado.
+        """
+        version = _version_sprints
+        cache = getattr(self, '_estado_sprints', None)
+        if cache is None or cache[0] != version:
+            estado = {'activo': None, 'pendiente': None, 'finalizados': []}
+            for sprint in self.sprint_set.order_by('id'):
+                sprint.proyecto = self
+                if sprint.estado == Sprint.Estado.INICIADO:
+                    estado['activo'] = estado['activo'] or sprint
+                elif sprint.estado == Sprint.Estado.PENDIENTE:
+                    estado['pendiente'] = estado['pendiente'] or sprint
+                else:
+                    estado['finalizados'].append(sprint)
+            cache = self._estado_sprints = (version, estado)
+        return cache[1]
+
     @property
     def sprint_activo(self):
         """Retorna el sprint activo del proyecto, si este existe."""
-        return self.sprint_set.filter(estado=Sprint.Estado.INICIADO).first()
+        return self.estado_sprints()['activo']
 
     @property
     def sprint_pendiente(self):
         """Retorna el sprint pendiente del proyecto, si este existe."""
-        return self.sprint_set.filter(estado=Sprint.Estado.PENDIENTE).first()
+        return self.estado_sprints()['pendiente']
 
     @property
     def sprints_finalizados(self):
-        """Retorna el conjunto de sprints pendientes del proyecto."""
-        return self.sprint_set.filter(estado=Sprint.Estado.FINALIZADO)
+        """Retorna la lista de sprints finalizados del proyecto."""
+        return self.estado_sprints()['finalizados']
 
     class Meta:
         default_permissions = ()
+        indexes = [models.Index(fields=['estado', 'fecha_creacion'])]
         permissions = [
             ('administrar_equipo', 'administración de equipo'),
             ('gestionar_proyecto', 'gestión de proyecto'),
@@ -303,20 +511,16 @@ class Role(models.Model):
     """Permisos que otorga el rol con respecto al proyecto."""
 
     def asignar_permiso(self, permiso):
-        """Asigna un permiso al rol y a todos los usuarios que forman parte de
-        él."""
+        """Asigna un permiso al rol y, por lo tanto, a todos los usuarios que
+        forman parte de él."""
         self.permisos.add(permiso)
-        for p in self.participa_set.select_related('usuario'):
-            assign_perm(permiso, p.usuario, self.proyecto)
 
     def quitar_permiso(self, permiso):
-        """Quita un permiso al rol y a todos los usuarios que forman parte de
-        él.
+        """Quita un permiso al rol y, por lo tanto, a todos los usuarios que
+        forman parte de él.
 
         |"""
         self.permisos.remove(permiso)
-        for p in self.participa_set.select_related('usuario'):
-            remove_perm(permiso, p.usuario, self.proyecto)
 
     def __str__(self):
         return self.nombre
@@ -341,6 +545,25 @@ class Participa(models.Model):
     
     |"""
 
+    class Meta:
+        unique_together = ('usuario', 'proyecto')
+
+
+class SprintQuerySet(models.QuerySet):
+    def con_capacidad(self):
+        """
+        Anota cada sprint con la suma de las horas diarias de su equipo y la
+        suma de las horas estimadas de su backlog. Las propiedades
+        capacidad_diaria y costo_backlog utilizan estas anotaciones cuando
+        existen, de modo que una lista de sprints se obtiene con una consulta.
+        """
+        capacidad = ParticipaSprint.objects.filter(sprint=OuterRef('pk')).order_by().values('sprint') \
+            .annotate(total=Sum('horas_diarias')).values('total')
+        costo = UserStory.objects.filter(sprint=OuterRef('pk')).order_by().values('sprint') \
+            .annotate(total=Sum('horas_estimadas')).values('total')
+        return self.annotate(total_horas_diarias=Coalesce(Subquery(capacidad), 0),
+                             total_horas_estimadas=Coalesce(Subquery(costo), 0))
+
 
 class Sprint(models.Model):
     """
@@ -391,6 +614,70 @@ class Sprint(models.Model):
     review = models.TextField(null=True)
     """Almacena el contenido del sprint review una vez que este termine."""
 
+    objects = SprintQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        _incrementar_version_sprints()
+
+    def delete(self, *args, **kwargs):
+        resultado = super().delete(*args, **kwargs)
+        _incrementar_version_sprints()
+        return resultado
+
+    def cargar_participantes(self):
+        """
+        Obtiene la participación de cada miembro del sprint junto con su
+        usuario en una sola consulta.
+
+        :return: Las participaciones del sprint indexadas por el id del usuario,
+            ordenadas por nombre.
+        :rtype: dict
+        """
+        return {p.usuario_id: p for p in self.participasprint_set.select_related('usuario')
+                .order_by('usuario__nombre', 'usuario__apellido')}
+
+    def cargar_backlog(self):
+        """
+        Obtiene la información necesaria para editar el sprint backlog con un
+        número fijo de consultas, sin importar la cantidad de user stories.
+
+        :return: Un diccionario con la participación de cada miembro del sprint
+            indexada por el id del usuario, los ids de los miembros con permiso
+            de desarrollo en el proyecto, y el id del desarrollador asignado a
+            cada user story.
+        :rtype: dict
+        """
+        participantes = self.cargar_participantes()
+        return {
+            'participantes': participantes,
+            'desarrolladores': set(Participa.objects.filter(
+                proyecto_id=self.proyecto_id, usuario_id__in=participantes, rol__permisos__codename='desarrollo'
+            ).values_list('usuario_id', flat=True)),
+            'asignaciones': dict(ParticipaSprint.user_stories.through.objects.filter(
+                participasprint__sprint=self).values_list('userstory_id', 'participasprint__usuario_id')),
+        }
+
+    def asignar_user_stories(self, asignaciones):
+        """
+        Cambia el desarrollador asignado a varios user stories del sprint con
+        una eliminación y una inserción, sin importar la cantidad de user
+        stories.
+
+        :param asignaciones: La participación del nuevo desarrollador de cada
+            user story, indexada por el id del user story. Los user stories
+            asociados a None quedan sin desarrollador.
+        :type asignaciones: dict
+        """
+        UserStoryAsignado = ParticipaSprint.user_stories.through
+        with transaction.atomic():
+            UserStoryAsignado.objects.filter(participasprint__sprint=self,
+                                             userstory_id__in=list(asignaciones)).delete()
+            UserStoryAsignado.objects.bulk_create([
+                UserStoryAsignado(participasprint_id=participa.id, userstory_id=user_story_id)
+                for user_story_id, participa in asignaciones.items() if participa is not None
+            ])
+
     def validar_inicio(self):
         """
         Verifica si el sprint puede iniciar y retorna un diccionario con
@@ -420,26 +707,34 @@ class Sprint(models.Model):
         elif self.fecha_fin > self.proyecto.fecha_fin:
             msg['advertencias'].append('El sprint no puede terminar después que el proyecto.')
 
+        # carga el backlog, las asignaciones y las capacidades en una pasada
+        backlog = list(self.sprint_backlog.order_by('id').values_list('id', 'numero', 'horas_estimadas'))
+        asignados = set(ParticipaSprint.user_stories.through.objects.filter(
+            participasprint__sprint=self).values_list('userstory_id', flat=True))
+        horas_diarias = list(self.participasprint_set.values_list('horas_diarias', flat=True))
+
         # verifica que haya al menos un desarrollador
-        if not self.equipo.first():
+        if not horas_diarias:
             msg['errores'].append('El sprint necesita al menos un desarrollador.')
 
         # verifica que exista al menos un user story
-        if not self.sprint_backlog.first():
+        if not backlog:
             msg['errores'].append('El sprint necesta al menos un user story.')
 
         # verifica que cada user story tenga un desarrollador asociado
-        for us in self.sprint_backlog.all():
-            if not ParticipaSprint.objects.filter(sprint=self, user_stories__in=[us]).exists():
-                msg['errores'].append('US-'+str(us.numero)+' no tiene un desarrollador asociado.')
+        for us_id, numero, _ in backlog:
+            if us_id not in asignados:
+                msg['errores'].append('US-'+str(numero)+' no tiene un desarrollador asociado.')
 
         # verifica que cada user story tenga un costo estimado
-        for us in self.sprint_backlog.all():
-            if not us.horas_estimadas:
-                msg['errores'].append('US-'+str(us.numero)+' aún no tiene un costo estimado en horas.')
+        for _, numero, horas_estimadas in backlog:
+            if not horas_estimadas:
+                msg['errores'].append('US-'+str(numero)+' aún no tiene un costo estimado en horas.')
 
         # verifica que la capacidad del equipo sea suficiente para el costo del backlog
-        if self.capacidad_equipo < self.costo_backlog:
+        capacidad_equipo = sum(horas_diarias) * (self.fecha_fin - self.fecha_inicio).days
+        costo_backlog = sum(horas_estimadas or 0 for _, _, horas_estimadas in backlog)
+        if capacidad_equipo < costo_backlog:
             msg['advertencias'].append('El costo total del backlog es mayor que la capacidad del equipo.')
 
         return msg
@@ -476,27 +771,101 @@ class Sprint(models.Model):
 
     def concluir_user_stories(self):
         """Por cada user story sin finalizar, crea otra user story con
-        prioridad muy alta y una estimación de horas actualizada"""
-        for us in self.sprint_backlog.exclude(
-                estado__in=[UserStory.Estado.FINALIZADO, UserStory.Estado.CANCELADO]):
-            us.estado = UserStory.Estado.CANCELADO
-            us.save()
-            us_nuevo = UserStory.objects.create(numero=UserStory.objects.filter(proyecto=self.proyecto).count() + 1,
-                                                nombre=us.nombre + '*', descripcion=us.descripcion, prioridad=1,
-                                                estado=UserStory.Estado.PENDIENTE, proyecto=self.proyecto,
-                                                horas_estimadas=us.horas_estimadas - us.horas_trabajadas)
-            for c in Comentario.objects.filter(user_story=us):
-                Comentario.objects.create(texto=c.texto, autor=c.autor, fecha=c.fecha, user_story=us_nuevo)
-        return
+        prioridad muy alta y una estimación de horas actualizada. Los user
+        stories nuevos reciben un bloque contiguo de números y se crean junto
+        con sus comentarios en una sola transacción."""
+        with transaction.atomic():
+            proyecto = Proyecto.objects.select_for_update().get(pk=self.proyecto_id)
+            pendientes = list(self.sprint_backlog.exclude(
+                estado__in=[UserStory.Estado.FINALIZADO, UserStory.Estado.CANCELADO]).order_by('id'))
+            if not pendientes:
+                return
+            UserStory.objects.filter(id__in=[us.id for us in pendientes]).update(estado=UserStory.Estado.CANCELADO)
+
+            inicio = proyecto.reservar_numeros(len(pendientes))
+            numeros = {us.id: inicio + i for i, us in enumerate(pendientes)}
+            UserStory.objects.bulk_create(
+                UserStory(numero=numeros[us.id], nombre=us.nombre + '*', descripcion=us.descripcion, prioridad=1,
+                          estado=UserStory.Estado.PENDIENTE, proyecto_id=self.proyecto_id,
+                          horas_estimadas=us.horas_estimadas - us.horas_trabajadas)
+                for us in pendientes)
+
+            # copia los comentarios a los user stories nuevos
+            nuevos = dict(UserStory.objects.filter(proyecto_id=self.proyecto_id, numero__gte=inicio)
+                          .values_list('numero', 'id'))
+            Comentario.objects.bulk_create(
+                Comentario(texto=c.texto, autor_id=c.autor_id, fecha=c.fecha,
+                           user_story_id=nuevos[numeros[c.user_story_id]])
+                for c in Comentario.objects.filter(user_story__in=pendientes).order_by('id'))
+
+    def registrar_avance(self, horas=0, fecha=None):
+        """
+        Actualiza el avance del sprint en una fecha, sumando las horas
+        trabajadas y recontando los user stories en cada estado. Se llama cada
+        vez que se registra un incremento en el tablero kanban, luego de
+        guardarlo. Si el avance del día no existe, sus horas trabajadas se
+        inician con las de todos los incrementos de ese día.
+
+        :param horas: Las horas trabajadas que se agregan al avance.
+        :param fecha: La fecha del avance. Si no se indica, se utiliza la fecha actual.
+        :type horas: int
+        :type fecha: date
+        """
+        fecha = fecha or timezone.localdate()
+        avance, creado = AvanceSprint.objects.get_or_create(sprint=self, fecha=fecha)
+        if creado:
+            incrementos = Incremento.objects.filter(user_story__sprint=self, fecha=fecha)
+            avance.horas_trabajadas = incrementos.aggregate(Sum('horas'))['horas__sum'] or 0
+            avance.save(update_fields=['horas_trabajadas'])
+        elif horas:
+            AvanceSprint.objects.filter(pk=avance.pk).update(horas_trabajadas=F('horas_trabajadas') + horas)
+            avance.refresh_from_db(fields=['horas_trabajadas'])
+
+        trabajadas = self.avancesprint_set.filter(fecha__lte=fecha).aggregate(Sum('horas_trabajadas'))
+        avance.horas_restantes = max(self.costo_backlog - (trabajadas['horas_trabajadas__sum'] or 0), 0)
+        for campo in AvanceSprint.CAMPOS_ESTADO.values():
+            setattr(avance, campo, 0)
+        for fila in self.sprint_backlog.values('estado').annotate(cantidad=Count('id')):
+            setattr(avance, AvanceSprint.CAMPOS_ESTADO[fila['estado']], fila['cantidad'])
+        avance.save(update_fields=['horas_restantes', *AvanceSprint.CAMPOS_ESTADO.values()])
+
+    def reconstruir_avance(self):
+        """
+        Regenera todos los avances del sprint a partir del registro de
+        incrementos. Reproduce los cambios de estado de cada user story en
+        orden para obtener la cantidad de user stories en cada estado al final
+        de cada día.
+        """
+        costo = self.costo_backlog
+        estados = {us: UserStory.Estado.PENDIENTE for us in self.sprint_backlog.values_list('id', flat=True)}
+        avances = []
+        restante = costo
+        for incremento in Incremento.objects.filter(user_story__sprint=self).order_by('fecha', 'id'):
+            if not avances or avances[-1].fecha != incremento.fecha:
+                avances.append(AvanceSprint(sprint=self, fecha=incremento.fecha))
+            avance = avances[-1]
+            avance.horas_trabajadas += incremento.horas
+            restante -= incremento.horas
+            avance.horas_restantes = max(restante, 0)
+            if incremento.estado:
+                estados[incremento.user_story_id] = incremento.estado
+            for campo in AvanceSprint.CAMPOS_ESTADO.values():
+                setattr(avance, campo, 0)
+            for estado in estados.values():
+                campo = AvanceSprint.CAMPOS_ESTADO[estado]
+                setattr(avance, campo, getattr(avance, campo) + 1)
+
+        self.avancesprint_set.all().delete()
+        AvanceSprint.objects.bulk_create(avances)
 
     @property
     def capacidad_diaria(self):
         """Calcula el número de horas disponibles de los miembros del sprint en un día."""
 
-        capacidad = 0
-        for miembro in self.participasprint_set.all():
-            capacidad = capacidad + miembro.horas_diarias
-        return capacidad
+        if getattr(self, 'total_horas_diarias', None) is None:
+            self.total_horas_diarias = self.participasprint_set.aggregate(
+                total=Coalesce(Sum('horas_diarias'), 0))['total']
+        return self.total_horas_diarias
 
     @property
     def capacidad_equipo(self):
@@ -510,15 +879,17 @@ class Sprint(models.Model):
 
         |"""
 
-        costo = 0
-        for us in self.sprint_backlog.all():
-            if us.horas_estimadas:
-                costo = costo + us.horas_estimadas
-        return costo
+        if getattr(self, 'total_horas_estimadas', None) is None:
+            self.total_horas_estimadas = self.sprint_backlog.aggregate(
+                total=Coalesce(Sum('horas_estimadas'), 0))['total']
+        return self.total_horas_estimadas
 
     def __str__(self):
         return self.nombre
 
+    class Meta:
+        indexes = [models.Index(fields=['proyecto', 'estado'])]
+
 
 class UserStory(models.Model):
     """
@@ -575,9 +946,22 @@ class UserStory(models.Model):
     
     |"""
 
+    def save(self, *args, **kwargs):
+        # los user stories nuevos reciben el siguiente número del proyecto, y
+        # los que se crean con un número explícito adelantan el contador
+        if self.numero is None:
+            self.numero = self.proyecto.reservar_numeros()
+        elif self._state.adding:
+            Proyecto.objects.filter(pk=self.proyecto_id, ultimo_user_story__lt=self.numero) \
+                .update(ultimo_user_story=self.numero)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.nombre
 
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['proyecto', 'numero'], name='userstory_proyecto_numero')]
+
 
 class Comentario(models.Model):
     """
@@ -651,6 +1035,62 @@ class Incremento(models.Model):
     estado = models.CharField(max_length=50, choices=UserStory.Estado.choices, null=True)
     """Estado que se asignó al user story"""
 
+    class Meta:
+        indexes = [models.Index(fields=['user_story', 'fecha'])]
+
+
+class AvanceSprint(models.Model):
+    """
+    Almacena el avance de un sprint al final de un día: las horas trabajadas
+    ese día, las horas restantes del backlog y la cantidad de user stories en
+    cada estado. Permite generar el burndown chart y los reportes sin recorrer
+    todo el registro de incrementos.
+
+    **Fecha:** 18/10/26
+
+    **Artefacto:** módulo de desarrollo
+
+    |
+    """
+    CAMPOS_ESTADO = {
+        UserStory.Estado.PENDIENTE: 'pendientes',
+        UserStory.Estado.INICIADO: 'iniciados',
+        UserStory.Estado.FASE_DE_QA: 'en_qa',
+        UserStory.Estado.FINALIZADO: 'finalizados',
+        UserStory.Estado.CANCELADO: 'cancelados',
+    }
+    """Relaciona cada estado de un user story con el campo que los cuenta."""
+
+    sprint = models.ForeignKey(Sprint, on_delete=models.CASCADE)
+    """Sprint cuyo avance se registra"""
+
+    fecha = models.DateField()
+    """Día al que corresponde el avance"""
+
+    horas_trabajadas = models.IntegerField(default=0)
+    """Horas que se trabajaron en el sprint ese día"""
+
+    horas_restantes = models.IntegerField(default=0)
+    """Horas del sprint backlog que quedaban por trabajar al final del día"""
+
+    pendientes = models.IntegerField(default=0)
+    """Cantidad de user stories pendientes"""
+
+    iniciados = models.IntegerField(default=0)
+    """Cantidad de user stories iniciados"""
+
+    en_qa = models.IntegerField(default=0)
+    """Cantidad de user stories en fase de QA"""
+
+    finalizados = models.IntegerField(default=0)
+    """Cantidad de user stories finalizados"""
+
+    cancelados = models.IntegerField(default=0)
+    """Cantidad de user stories cancelados"""
+
+    class Meta:
+        unique_together = ('sprint', 'fecha')
+
 
 class Modificacion(models.Model):
     """
@@ -673,3 +1113,175 @@ class Modificacion(models.Model):
 
     accion = models.TextField()
     """Descripción del cambio"""
+
+    class Meta:
+        indexes = [models.Index(fields=['proyecto', 'fecha'])]
+
+
+class Correo(models.Model):
+    """
+    Representa un correo en la bandeja de salida del sistema. Las vistas solo
+    agregan correos a la bandeja, y estos son enviados en lotes por el comando
+    ``enviarcorreos``. Si el envío falla, se vuelve a intentar más tarde con
+    un intervalo que se duplica en cada intento.
+
+    **Fecha:** 18/10/26
+
+    **Artefacto:** módulo de desarrollo
+
+    |
+    """
+    MAX_INTENTOS = 5
+    """Número de intentos fallidos luego del cual se deja de enviar el correo."""
+
+    MINUTOS_RESERVA = 10
+    """Minutos durante los cuales un lote tomado por un proceso no es enviado por otro."""
+
+    asunto = models.CharField(max_length=255)
+    """Asunto del correo"""
+
+    cuerpo = models.TextField()
+    """Contenido del correo en texto plano"""
+
+    html = models.TextField(blank=True, default='')
+    """Contenido del correo en formato HTML"""
+
+    destinatarios = models.JSONField(default=list)
+    """Lista de direcciones de correo de los destinatarios"""
+
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    """Fecha en la que el correo fue agregado a la bandeja de salida"""
+
+    fecha_envio = models.DateTimeField(null=True)
+    """Fecha en la que el correo fue enviado. Es nula mientras esté pendiente."""
+
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    """Fecha a partir de la cual se puede intentar enviar el correo"""
+
+    intentos = models.IntegerField(default=0)
+    """Número de intentos de envío fallidos"""
+
+    error = models.TextField(blank=True, default='')
+    """Último error ocurrido al intentar enviar el correo"""
+
+
+class Reporte(models.Model):
+    """
+    Representa un reporte en PDF. Los reportes son generados en segundo plano
+    por el comando ``generarreportes`` y se almacenan junto con una versión
+    calculada a partir de los datos que muestran, de forma que un mismo
+    reporte solo se vuelve a generar cuando sus user stories cambian.
+
+    **Fecha:** 18/10/26
+
+    **Artefacto:** módulo de desarrollo
+
+    |
+    """
+
+    class Tipo(models.TextChoices):
+        PRODUCT_BACKLOG = 'PB', 'Product Backlog'
+        SPRINT_BACKLOG = 'SB', 'Sprint Backlog'
+        US_PRIORIDAD = 'UP', 'US - Prioridad'
+    """Contiene los tipos de reporte posibles."""
+
+    class Estado(models.TextChoices):
+        PENDIENTE = 'P', 'Pendiente'
+        GENERADO = 'G', 'Generado'
+        ERROR = 'E', 'Error'
+    """Contiene los estados posibles del reporte."""
+
+    PLANTILLAS = {
+        Tipo.PRODUCT_BACKLOG: 'sgp/reporte-product-backlog.html',
+        Tipo.SPRINT_BACKLOG: 'sgp/reporte-sprint-backlog.html',
+        Tipo.US_PRIORIDAD: 'sgp/reporte-us-prioridad.html',
+    }
+    """Relaciona cada tipo de reporte con la plantilla que lo genera."""
+
+    tipo = models.CharField(max_length=2, choices=Tipo.choices)
+    """Indica qué reporte se genera."""
+
+    proyecto = models.ForeignKey(Proyecto, on_delete=models.CASCADE)
+    """Proyecto del reporte."""
+
+    sprint = models.ForeignKey(Sprint, null=True, on_delete=models.CASCADE)
+    """Sprint del reporte, si este corresponde a un sprint."""
+
+    version = models.CharField(max_length=40)
+    """Resumen de los datos mostrados en el reporte al momento de solicitarlo."""
+
+    estado = models.CharField(max_length=1, choices=Estado.choices, default=Estado.PENDIENTE)
+    """Indica si el reporte ya fue generado."""
+
+    archivo = models.FileField(upload_to='reportes/', blank=True)
+    """Archivo PDF del reporte una vez generado."""
+
+    usuario = models.ForeignKey(User, null=True, on_delete=models.SET_NULL)
+    """Usuario que solicitó el reporte."""
+
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    """Fecha en la que se solicitó el reporte."""
+
+    fecha_generacion = models.DateTimeField(null=True)
+    """Fecha en la que se generó el reporte."""
+
+    error = models.TextField(blank=True, default='')
+    """Error ocurrido al generar el reporte."""
+
+    class Meta:
+        unique_together = ('tipo', 'proyecto', 'sprint', 'version')
+
+    @staticmethod
+    def calcular_version(tipo, proyecto, sprint=None):
+        """
+        Calcula la versión de los datos de un reporte a partir de los campos de
+        los user stories que este muestra y de los desarrolladores asignados.
+
+        :param tipo: El tipo de reporte.
+        :param proyecto: El proyecto del reporte.
+        :param sprint: El sprint del reporte, si corresponde.
+        :type tipo: Reporte.Tipo
+        :type proyecto: Proyecto
+        :type sprint: Sprint
+        """
+        if tipo == Reporte.Tipo.PRODUCT_BACKLOG:
+            datos = [list(proyecto.product_backlog.order_by('id')
+                          .values_list('id', 'numero', 'nombre', 'estado', 'sprint__nombre'))]
+        else:
+            datos = [list(sprint.sprint_backlog.order_by('id')
+                          .values_list('id', 'numero', 'nombre', 'estado', 'prioridad',
+                                       'horas_trabajadas', 'horas_estimadas')),
+                     list(ParticipaSprint.user_stories.through.objects.filter(participasprint__sprint=sprint)
+                          .order_by('id').values_list('userstory_id', 'participasprint__usuario_id'))]
+            if tipo == Reporte.Tipo.SPRINT_BACKLOG:
+                datos.append(sprint.avancesprint_set.order_by('-fecha').values_list(
+                    'fecha', 'horas_restantes', *AvanceSprint.CAMPOS_ESTADO.values()).first())
+        return hashlib.sha1(repr(datos).encode('utf-8')).hexdigest()
+
+    def obtener_contexto(self):
+        """Retorna la plantilla y el contexto con los que se genera el reporte."""
+        contexto = {'proyecto': self.proyecto, 'sprint': self.sprint, 'usuario': self.usuario,
+                    'fecha': timezone.now(), 'filename': 'Reporte - ' + self.get_tipo_display()}
+
+        if self.tipo != Reporte.Tipo.PRODUCT_BACKLOG:
+            desarrolladores = {
+                us: nombre + ' ' + apellido for us, nombre, apellido in
+                ParticipaSprint.user_stories.through.objects.filter(participasprint__sprint=self.sprint)
+                .values_list('userstory_id', 'participasprint__usuario__nombre',
+                             'participasprint__usuario__apellido')}
+            backlog = list(self.sprint.sprint_backlog.order_by('prioridad'))
+            for user_story in backlog:
+                user_story.desarrollador = desarrolladores.get(user_story.id)
+
+            if self.tipo == Reporte.Tipo.SPRINT_BACKLOG:
+                grupos = {'terminados': [UserStory.Estado.FINALIZADO],
+                          'pendientes': [UserStory.Estado.PENDIENTE],
+                          'cancelados': [UserStory.Estado.CANCELADO],
+                          'por terminar': [UserStory.Estado.INICIADO, UserStory.Estado.FASE_DE_QA]}
+                contexto['backlog'] = {grupo: [us for us in backlog if us.estado in estados]
+                                       for grupo, estados in grupos.items()}
+                contexto['avance'] = self.sprint.avancesprint_set.order_by('-fecha').first()
+            else:
+                contexto['backlog'] = backlog
+
+        return Reporte.PLANTILLAS[self.tipo], contexto
@@ -9,15 +9,80 @@ realizar esta prueba, es necesario utilizar el siguiente comando.
 Las pruebas se encuentran agrupadas en clases según que componente evalúan.
 """
 import datetime
-
+import importlib.util
+import json
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import authenticate
 from django.core import mail
-from django.test import TestCase
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from google.auth import crypt, jwt
+from guardian.models import UserObjectPermission
 from guardian.shortcuts import assign_perm, get_perms_for_model
 
 from .forms import ProyectoForm, UserStoryForm, ComentarioForm, SprintForm, \
     AgregarDesarrolladorForm, AgregarUserStoryForm, SprintReviewForm
-from .models import Proyecto, User, UserStory, Comentario, Sprint, ParticipaSprint, Role, Incremento
+from .models import Proyecto, User, UserStory, Comentario, Sprint, ParticipaSprint, Role, Incremento, \
+    AvanceSprint, Correo, Reporte, Participa, Modificacion
+from .backends import CertificadosGoogle, CLIENT_ID, OAuth2Backend, cache_usuarios
+from .utils import calcular_burndown, encolar_correo, enviar_correos_pendientes, generar_reporte
+
+
+class ConsultasMixin:
+    """
+    Métodos auxiliares de las pruebas que verifican que el número de consultas
+    de una página no dependa de la cantidad de datos que muestra.
+    """
+
+    def assertConsultasConstantes(self, url, agregar, **parametros):
+        """Verifica que la página utilice el mismo número de consultas antes y
+        después de llamar a agregar. Retorna ambas respuestas."""
+        self.client.get(url, parametros)
+        with CaptureQueriesContext(connection) as consultas:
+            antes = self.client.get(url, parametros)
+        agregar()
+        with self.assertNumQueries(len(consultas)):
+            despues = self.client.get(url, parametros)
+        return antes, despues
+
+    @staticmethod
+    def escrituras(consultas):
+        """Retorna las consultas capturadas que modifican la base de datos."""
+        return [c['sql'] for c in consultas if c['sql'].split()[0] in ('INSERT', 'UPDATE', 'DELETE')]
+
+    @staticmethod
+    def datos_formset(formset, **cambios):
+        """Retorna los datos que envía el formset sin modificaciones, junto con
+        los cambios indicados. Los cambios con valor None quitan el campo."""
+        datos = {'form-TOTAL_FORMS': len(formset.forms), 'form-INITIAL_FORMS': len(formset.forms)}
+        for form in formset.forms:
+            for nombre, campo in form.fields.items():
+                valor = form[nombre].value()
+                if not campo.disabled and valor not in (None, '', False):
+                    datos[form.add_prefix(nombre)] = 'on' if valor is True else valor
+        datos.update(cambios)
+        return {k: v for k, v in datos.items() if v is not None}
+
+    @staticmethod
+    def prefijos(formset, atributo='pk'):
+        """Retorna el prefijo del formulario de cada instancia, indexado por el
+        atributo indicado."""
+        return {getattr(form.instance, atributo): form.prefix for form in formset.forms}
 
 
 class NavigationTest(TestCase):
@@ -98,7 +163,7 @@ class NavigationTest(TestCase):
                          "La página de edición de proyecto retornó un error HTTP")
 
 
-class PermissionTest(TestCase):
+class PermissionTest(ConsultasMixin, TestCase):
 
     def test_otorgar_permisos(self):
         """
@@ -196,6 +261,531 @@ class PermissionTest(TestCase):
         user.delete()
         proj.delete()
 
+    def test_permisos_por_rol(self):
+        """Verifica que los permisos se obtengan del rol sin copiarlos a cada
+        usuario."""
+        proj = Proyecto.objects.create(nombre='Proyecto de prueba')
+        user = User.objects.create(user_id=1, email='ejemplo@fpuna.edu.py', nombre='Nombre', apellido='Apellido')
+        proj.crear_roles_predeterminados()
+        proj.asignar_rol(user, 'Interesado')
+        self.assertFalse(UserObjectPermission.objects.exists(), "Se copiaron permisos al usuario")
+        self.assertTrue(user.has_perm('sgp.vista', proj), "El miembro no tiene acceso al proyecto")
+        with self.assertNumQueries(0):
+            self.assertTrue(user.has_perm('vista', proj), "Los permisos del usuario no se reutilizaron")
+        rol = proj.role_set.get(nombre='Interesado')
+        rol.asignar_permiso(get_perms_for_model(Proyecto).get(codename='desarrollo'))
+        user = User.objects.get(user_id=1)
+        self.assertTrue(user.has_perm('desarrollo', proj), "El permiso del rol no se otorgó al miembro")
+        proj.quitar_rol(user)
+        user = User.objects.get(user_id=1)
+        self.assertFalse(user.has_perm('vista', proj), "El usuario quitado aún tiene acceso")
+
+    def test_migrar_permisos_por_usuario(self):
+        """Verifica que la migración elimine solo los permisos copiados de los
+        roles."""
+        proj = Proyecto.objects.create(nombre='Proyecto de prueba')
+        miembro = User.objects.create(user_id=1, email='ejemplo@fpuna.edu.py', nombre='Nombre', apellido='Apellido')
+        externo = User.objects.create(user_id=2, email='otro@fpuna.edu.py', nombre='Nombre', apellido='Apellido')
+        proj.crear_roles_predeterminados()
+        proj.asignar_rol(miembro, 'Product owner')
+        for perm in ['vista', 'pila_producto', 'desarrollo']:
+            assign_perm(perm, miembro, proj)
+        assign_perm('vista', externo, proj)
+        migracion = importlib.import_module('sgp.migrations.0005_permisos_por_rol')
+        migracion.eliminar_permisos_por_usuario(apps, None)
+        self.assertEquals(sorted(UserObjectPermission.objects.values_list('user_id', 'permission__codename')),
+                          [('1', 'desarrollo'), ('2', 'vista')], "Se eliminaron permisos que no eran del rol")
+
+    def test_editar_roles_equipo_grande(self):
+        """Verifica que editar los roles de un equipo de 500 miembros utilice
+        el mismo número de consultas que con un solo miembro."""
+        proj = Proyecto.objects.create(nombre='Proyecto de prueba')
+        user = User.objects.create(user_id=1, email='ejemplo@fpuna.edu.py', nombre='Nombre', apellido='Apellido')
+        proj.crear_roles_predeterminados()
+        proj.asignar_rol(user, 'Scrum master')
+        self.client.login(token=1, test=True)
+        url = reverse('sgp:administrar_roles', kwargs={'proyecto_id': proj.id})
+        roles = list(proj.role_set.order_by('id'))
+
+        def editar(permiso):
+            datos = {'form-TOTAL_FORMS': len(roles), 'form-INITIAL_FORMS': len(roles)}
+            for i, rol in enumerate(roles):
+                datos.update({'form-%d-id' % i: rol.id, 'form-%d-nombre' % i: rol.nombre,
+                              'form-%d-administrar_equipo' % i: 'on', 'form-%d-%s' % (i, permiso): 'on'})
+            with CaptureQueriesContext(connection) as consultas:
+                self.client.post(url, datos)
+            return len(consultas)
+
+        editar('desarrollo')
+        consultas_uno = editar('pila_producto')
+        desarrollador = proj.role_set.get(nombre='Desarrollador')
+        User.objects.bulk_create(User(user_id=str(n), email='%d@fpuna.edu.py' % n, nombre='Nombre',
+                                      apellido='Apellido') for n in range(2, 502))
+        Participa.objects.bulk_create(Participa(usuario_id=str(n), proyecto=proj, rol=desarrollador)
+                                      for n in range(2, 502))
+        consultas_500 = editar('desarrollo')
+        self.assertEquals(consultas_500, consultas_uno, "Las consultas dependen del tamaño del equipo")
+        self.assertTrue(User.objects.get(user_id='501').has_perm('desarrollo', proj),
+                        "El permiso del rol no se otorgó a los miembros")
+        self.assertFalse(User.objects.get(user_id='501').has_perm('pila_producto', proj),
+                         "El permiso quitado al rol se mantuvo en los miembros")
+
+    def test_permisos_rol_tras_migrar(self):
+        """Verifica que los permisos de rol guardados se descarten al migrar o
+        vaciar la base de datos."""
+        anteriores = dict(Proyecto.permisos_rol())
+        emit_post_migrate_signal(verbosity=0, interactive=False, db=connection.alias)
+        self.assertIsNot(Proyecto.permisos_rol()['desarrollo'], anteriores.get('desarrollo'),
+                         "Los permisos de rol no se volvieron a consultar")
+
+    def test_matriz_roles(self):
+        """Verifica que la página de roles cargue la matriz de permisos con un
+        número fijo de consultas y que al guardar solo se escriban los
+        cambios."""
+        proj = Proyecto.objects.create(nombre='Proyecto de prueba')
+        user = User.objects.create(user_id=1, email='ejemplo@fpuna.edu.py', nombre='Nombre', apellido='Apellido')
+        proj.crear_roles_predeterminados()
+        proj.asignar_rol(user, 'Scrum master')
+        self.client.login(token=1, test=True)
+        url = reverse('sgp:administrar_roles', kwargs={'proyecto_id': proj.id})
+        _, response = self.assertConsultasConstantes(url, lambda: [
+            proj.crear_rol('Rol %d' % n, ['desarrollo', 'pila_producto']) for n in range(20)])
+        form = response.context['formset'].forms[-1]
+        self.assertEquals([form.fields[p].initial for p in ['administrar_equipo', 'pila_producto', 'desarrollo']],
+                          [False, True, True], "La matriz de permisos es incorrecta")
+
+        datos = self.datos_formset(response.context['formset'])
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.post(url, datos)
+        self.assertEquals(len(self.escrituras(consultas)), 1, "Se guardaron roles sin cambios")
+        datos.pop('form-23-desarrollo')
+        datos['form-22-gestionar_proyecto'] = 'on'
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.post(url, datos)
+        self.assertEquals(len(self.escrituras(consultas)), 3, "Se escribieron permisos que no cambiaron")
+        self.assertEquals(set(proj.role_set.get(nombre='Rol 19').permisos.values_list('codename', flat=True)),
+                          {'pila_producto'}, "El permiso no fue quitado")
+        self.assertTrue(proj.role_set.get(nombre='Rol 18').permisos.filter(codename='gestionar_proyecto').exists(),
+                        "El permiso no fue agregado")
+
+
+class AdministracionEquipoTest(ConsultasMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create(user_id=1, email='ejemplo@fpuna.edu.py', nombre='Nombre', apellido='Apellido')
+        self.client.login(token=1, test=True)
+        self.proyecto = Proyecto.objects.create(nombre='Proyecto de prueba')
+        self.proyecto.crear_roles_predeterminados()
+        self.proyecto.asignar_rol(self.user, 'Scrum master')
+        self.url = reverse('sgp:administrar_equipo', kwargs={'proyecto_id': self.proyecto.id})
+        self.agregar_miembros(range(2, 5))
+        sprint = Sprint.objects.create(nombre='Sprint de prueba', proyecto=self.proyecto, estado=Sprint.Estado.INICIADO,
+                                       fecha_inicio=datetime.date(2021, 11, 1), fecha_fin=datetime.date(2021, 11, 7))
+        ParticipaSprint.objects.create(sprint=sprint, usuario_id='2', horas_diarias=4)
+
+    def agregar_miembros(self, numeros):
+        User.objects.bulk_create(User(user_id=str(n), email='%d@fpuna.edu.py' % n, nombre='Nombre',
+                                      apellido='Apellido') for n in numeros)
+        rol = self.proyecto.role_set.get(nombre='Desarrollador')
+        self.proyecto.agregar_miembros({str(n): rol.id for n in numeros})
+
+    def test_consultas_equipo(self):
+        """Verifica que la página del equipo se cargue con un número fijo de
+        consultas."""
+        _, response = self.assertConsultasConstantes(self.url, lambda: self.agregar_miembros(range(5, 305)))
+        formset = response.context['formset']
+        self.assertEquals(len(formset.forms), 304, "No se muestran todos los miembros")
+        ocupado = next(form for form in formset.forms if form.instance.pk == '2')
+        self.assertEquals(ocupado.borrar_string, 'Ocupado en sprint',
+                          "No se indica que el miembro participa del sprint activo")
+
+    def test_guardar_cambios(self):
+        """Verifica que solo se escriban los roles que cambiaron y las bajas,
+        con un número de consultas que no depende del equipo."""
+        self.agregar_miembros(range(5, 305))
+        formset = self.client.get(self.url).context['formset']
+        datos, prefijos = self.datos_formset(formset, asignar_roles='Guardar'), self.prefijos(formset)
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.post(self.url, datos)
+        self.assertEquals(len(self.escrituras(consultas)), 1, "Se guardaron miembros sin cambios")
+
+        interesado = self.proyecto.role_set.get(nombre='Interesado').id
+        datos[prefijos['3'] + '-rol'] = interesado
+        datos[prefijos['4'] + '-rol'] = interesado
+        datos[prefijos['5'] + '-borrar'] = 'on'
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.post(self.url, datos)
+        self.assertLess(len(consultas), 20, "La cantidad de consultas depende del equipo")
+        self.assertEquals(set(Participa.objects.filter(rol_id=interesado).values_list('usuario_id', flat=True)),
+                          {'3', '4'}, "Los roles no fueron actualizados")
+        self.assertFalse(Participa.objects.filter(usuario_id='5').exists(), "El miembro no fue quitado")
+        self.assertEquals(self.proyecto.participa_set.count(), 303, "Se modificaron otros miembros")
+
+    def test_importar_miembros(self):
+        """Verifica que se agreguen varios miembros desde un archivo CSV y que
+        se rechacen los archivos con filas inválidas."""
+        User.objects.bulk_create(User(user_id=str(n), email='%d@fpuna.edu.py' % n, nombre='Nombre',
+                                      apellido='Apellido') for n in range(10, 12))
+        User.objects.create(user_id='12', email='Doce@FPUNA.edu.py', nombre='Nombre', apellido='Apellido')
+        archivo = SimpleUploadedFile('miembros.csv', b'email,rol\n10@fpuna.edu.py,Desarrollador\n'
+                                                     b'11@fpuna.edu.py,Rol inexistente\n')
+        response = self.client.post(self.url, {'importar_miembros': 'Importar', 'archivo': archivo})
+        self.assertContains(response, 'Fila 2: el rol Rol inexistente no existe.')
+        self.assertFalse(Participa.objects.filter(usuario_id='10').exists(), "Se importó un archivo inválido")
+
+        archivo = SimpleUploadedFile('miembros.csv', b'10@fpuna.edu.py,Desarrollador\n'
+                                                     b'11@fpuna.edu.py,Product owner\ndoce@fpuna.edu.py,Interesado\n')
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.post(self.url, {'importar_miembros': 'Importar', 'archivo': archivo})
+        inserciones = [c for c in consultas if c['sql'].startswith('INSERT') and '"sgp_participa"' in c['sql']]
+        self.assertEquals(len(inserciones), 1, "Los miembros no se agregaron con una sola inserción")
+        self.assertEquals(dict(Participa.objects.filter(usuario_id__in=['10', '11', '12'])
+                               .values_list('usuario_id', 'rol__nombre')),
+                          {'10': 'Desarrollador', '11': 'Product owner', '12': 'Interesado'},
+                          "Los miembros no fueron agregados con su rol")
+
+    def test_importar_filas_repetidas(self):
+        """Verifica que se rechacen los usuarios repetidos en el archivo y los
+        roles cuyo nombre es ambiguo."""
+        User.objects.bulk_create(User(user_id=str(n), email='%d@fpuna.edu.py' % n, nombre='Nombre',
+                                      apellido='Apellido') for n in range(10, 12))
+        self.proyecto.crear_rol('Interesado', [])
+        archivo = SimpleUploadedFile('miembros.csv', b'10@fpuna.edu.py,Desarrollador\n'
+                                                     b'10@FPUNA.edu.py,Product owner\n11@fpuna.edu.py,Interesado\n')
+        form = self.client.post(self.url, {'importar_miembros': 'Importar', 'archivo': archivo}).context['importar']
+        self.assertEquals(form.errors['archivo'], ['Fila 2: el usuario 10@FPUNA.edu.py ya aparece en la fila 1.',
+                                                   'Fila 3: existe más de un rol con el nombre Interesado.'],
+                          "No se rechazaron las filas repetidas")
+        self.assertFalse(Participa.objects.filter(usuario_id__in=['10', '11']).exists(),
+                         "Se importó un archivo inválido")
+
+
+class AdministracionUsuariosTest(ConsultasMixin, TestCase):
+    def setUp(self):
+        User.objects.create(user_id=1, email='admin@fpuna.edu.py', nombre='Admin', apellido='Sistema',
+                            is_superuser=True)
+        self.client.login(token=1, test=True)
+        self.crear_usuarios(range(2, 120))
+        for n in range(2, 12):
+            assign_perm('sgp.crear_proyecto', User.objects.get(user_id=n))
+
+    @staticmethod
+    def crear_usuarios(numeros):
+        User.objects.bulk_create(User(user_id=n, email='usuario%d@fpuna.edu.py' % n, nombre='Usuario',
+                                      apellido=str(n)) for n in numeros)
+
+    def test_consultas_listado(self):
+        """Verifica que la página de administración cargue los permisos de
+        todos los usuarios con un número fijo de consultas."""
+        formset = self.client.get(reverse('sgp:administrar')).context['formset']
+        self.assertEquals(len(formset.forms), 50, "La página no está completa")
+        self.assertEquals([form.fields['crear_proyecto'].initial for form in formset.forms[:13]],
+                          [True] * 11 + [False] * 2, "Los permisos iniciales son incorrectos")
+        self.assertConsultasConstantes(reverse('sgp:administrar'), lambda: self.crear_usuarios(range(200, 400)),
+                                       pagina=3)
+
+    def test_busqueda(self):
+        """Verifica que los usuarios se busquen por nombre, apellido o
+        correo."""
+        response = self.client.get(reverse('sgp:administrar'), {'q': 'usuario 11'})
+        self.assertEquals([form.instance.pk for form in response.context['formset'].forms],
+                          ['11', '110', '111', '112', '113', '114', '115', '116', '117', '118', '119'],
+                          "La búsqueda no funciona")
+        response = self.client.get(reverse('sgp:administrar'), {'q': 'usuario42@'})
+        self.assertEquals(len(response.context['formset'].forms), 1, "La búsqueda por correo no funciona")
+
+    def test_guardar_cambios(self):
+        """Verifica que solo se guarden los permisos que cambiaron, con un
+        número de consultas que no depende de la cantidad de usuarios."""
+        formset = self.client.get(reverse('sgp:administrar')).context['formset']
+        datos = self.datos_formset(formset, **{'form-2-crear_proyecto': None, 'form-20-administrar': 'on',
+                                               'form-21-apellido': 'Modificado'})
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.post(reverse('sgp:administrar'), datos)
+        self.assertLess(len(consultas), 15, "La cantidad de consultas depende de los usuarios")
+        usuarios = User.objects.in_bulk(['3', '21', '22'])
+        self.assertFalse(usuarios['3'].has_perm('sgp.crear_proyecto'), "El permiso no fue quitado")
+        self.assertTrue(usuarios['21'].has_perm('sgp.administrar'), "El permiso no fue asignado")
+        self.assertTrue(User.objects.get(user_id=4).has_perm('sgp.crear_proyecto'), "Se quitó un permiso sin cambios")
+        self.assertEquals(usuarios['22'].apellido, 'Modificado', "El apellido no fue modificado")
+
+
+class ListadoProyectosTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(user_id=1, email='ejemplo@fpuna.edu.py', nombre='Nombre', apellido='Apellido')
+        self.client.login(token=1, test=True)
+        for n in range(30):
+            proyecto = Proyecto.objects.create(nombre='Proyecto %d' % n,
+                                               estado=Proyecto.Estado.INICIADO if n % 2 else Proyecto.Estado.PENDIENTE)
+            proyecto.crear_roles_predeterminados()
+            if n < 25:
+                proyecto.asignar_rol(self.user, 'Interesado')
+        assign_perm('vista', self.user, Proyecto.objects.get(nombre='Proyecto 29'))
+
+    def test_proyectos_visibles(self):
+        """Verifica que el listado incluya los proyectos del equipo y los
+        asignados directamente."""
+        self.assertEquals(Proyecto.objects.visibles(self.user).count(), 26,
+                          "El listado no coincide con los proyectos visibles")
+        self.assertEquals(Proyecto.objects.visibles(self.user, Proyecto.Estado.INICIADO).count(), 13,
+                          "El filtro por estado no funciona")
+
+    def test_paginacion(self):
+        """Verifica que la página de inicio muestre los proyectos paginados."""
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse('sgp:index'))
+        self.assertEquals(len(response.context['proyectos']), 20, "La primera página no está completa")
+        response = self.client.get(reverse('sgp:index'), {'pagina': 2})
+        self.assertEquals([p.nombre for p in response.context['proyectos']],
+                          ['Proyecto %d' % n for n in range(20, 25)] + ['Proyecto 29'], "La paginación es incorrecta")
+        response = self.client.get(reverse('sgp:index'), {'estado': Proyecto.Estado.PENDIENTE})
+        self.assertEquals(response.context['proyectos'].paginator.count, 13, "El filtro por estado no funciona")
+
+
+class HistorialModificacionesTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(user_id=1, email='ejemplo@fpuna.edu.py', nombre='Nombre', apellido='Apellido')
+        self.otro = User.objects.create(user_id=2, email='otro@fpuna.edu.py', nombre='Otro', apellido='Usuario')
+        self.client.login(token=1, test=True)
+        self.proyecto = Proyecto.objects.create(nombre='Proyecto de prueba')
+        Modificacion.objects.bulk_create(Modificacion(usuario=self.otro if n % 4 else self.user,
+                                                      proyecto=self.proyecto, accion='Cambio %d' % n)
+                                         for n in range(120))
+        self.url = reverse('sgp:historial_modificaciones', kwargs={'proyecto_id': self.proyecto.id})
+
+    def test_paginacion(self):
+        """Verifica que el historial se recorra completo con los cursores y que
+        cada página cueste las mismas consultas."""
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(self.url)
+        acciones = [c.accion for c in response.context['historial']]
+        self.assertIsNone(response.context['anterior'], "La primera página tiene una página anterior")
+        while response.context['siguiente']:
+            siguiente = response.context['siguiente']
+            with self.assertNumQueries(len(consultas)):
+                response = self.client.get(self.url, {'despues': siguiente})
+            acciones += [c.accion for c in response.context['historial']]
+        self.assertEquals(acciones, ['Cambio %d' % n for n in range(120)], "El historial no se recorrió en orden")
+        response = self.client.get(self.url, {'antes': response.context['anterior']})
+        self.assertEquals([c.accion for c in response.context['historial']], ['Cambio %d' % n for n in range(50, 100)],
+                          "La página anterior es incorrecta")
+
+    def test_filtros(self):
+        """Verifica que el historial se filtre por usuario y por fecha."""
+        response = self.client.get(self.url, {'usuario': self.user.pk})
+        self.assertEquals(len(response.context['historial']), 30, "El filtro por usuario no funciona")
+        response = self.client.get(self.url, {'usuario': self.otro.pk})
+        self.assertContains(response, 'usuario=2&despues=', msg_prefix="Los cursores no mantienen los filtros")
+        Modificacion.objects.filter(accion='Cambio 0').update(fecha=timezone.now() - datetime.timedelta(days=10))
+        hoy = timezone.localdate().strftime('%d/%m/%Y')
+        response = self.client.get(self.url, {'desde': hoy, 'hasta': hoy})
+        self.assertEquals(response.context['historial'][0].accion, 'Cambio 1', "El filtro por fecha no funciona")
+
+    def test_exportar_csv(self):
+        """Verifica que el historial se exporte como un archivo CSV
+        transmitido por partes."""
+        response = self.client.get(reverse('sgp:exportar_historial', kwargs={'proyecto_id': self.proyecto.id}),
+                                   {'usuario': self.otro.pk})
+        self.assertTrue(response.streaming, "La respuesta no es transmitida por partes")
+        filas = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEquals(filas[0], 'Fecha,Usuario,Correo,Acción', "El encabezado es incorrecto")
+        self.assertEquals(len(filas), 91, "El archivo no contiene las modificaciones filtradas")
+        self.assertTrue(filas[1].endswith(',Otro Usuario,otro@fpuna.edu.py,Cambio 1'), "La fila es incorrecta")
+
+
+class SprintBacklogTest(ConsultasMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create(user_id=1, email='ejemplo@fpuna.edu.py', nombre='Nombre', apellido='Apellido')
+        self.client.login(token=1, test=True)
+        self.proyecto = Proyecto.objects.create(nombre='Proyecto de prueba')
+        self.proyecto.crear_roles_predeterminados()
+        self.proyecto.asignar_rol(self.user, 'Scrum master')
+        self.sprint = Sprint.objects.create(nombre='Sprint de prueba', proyecto=self.proyecto,
+                                            fecha_inicio=datetime.date(2021, 11, 1),
+                                            fecha_fin=datetime.date(2021, 11, 7))
+        ParticipaSprint.objects.create(sprint=self.sprint, usuario=self.user, horas_diarias=2)
+        for n in (2, 3):
+            usuario = User.objects.create(user_id=n, email='%d@fpuna.edu.py' % n, nombre='Nombre %d' % n,
+                                          apellido='Apellido')
+            self.proyecto.asignar_rol(usuario, 'Desarrollador')
+            ParticipaSprint.objects.create(sprint=self.sprint, usuario=usuario, horas_diarias=4)
+        self.url = reverse('sgp:sprint_backlog', kwargs={'proyecto_id': self.proyecto.id, 'sprint_id': self.sprint.id})
+        self.agregar_user_stories(10)
+
+    def agregar_user_stories(self, cantidad):
+        inicio = self.proyecto.reservar_numeros(cantidad)
+        UserStory.objects.bulk_create(UserStory(numero=n, nombre='US %d' % n, proyecto=self.proyecto, horas_estimadas=2,
+                                                sprint=self.sprint) for n in range(inicio, inicio + cantidad))
+        self.sprint.participasprint_set.get(usuario_id='2').user_stories.add(
+            *self.sprint.sprint_backlog.filter(numero__gt=inicio + cantidad // 2))
+
+    def test_consultas_backlog(self):
+        """Verifica que el sprint backlog se cargue con un número fijo de
+        consultas y que solo se ofrezcan miembros con permiso de desarrollo."""
+        antes, despues = self.assertConsultasConstantes(self.url, lambda: self.agregar_user_stories(300))
+        form = antes.context['formset'].forms[-1]
+        self.assertEquals([valor for valor, _ in form.fields['desarrollador'].choices], ['', '2', '3'],
+                          "Los desarrolladores ofrecidos son incorrectos")
+        self.assertEquals(form.nombre_desarrollador, 'Nombre 2 Apellido (2@fpuna.edu.py)',
+                          "El desarrollador asignado es incorrecto")
+        self.assertEquals(len(despues.context['formset'].forms), 310, "No se muestran todos los user stories")
+
+    def test_guardar_backlog(self):
+        """Verifica que los cambios del sprint backlog se guarden en bloque."""
+        self.agregar_user_stories(300)
+        formset = self.client.get(self.url).context['formset']
+        datos, prefijos = self.datos_formset(formset, editar_user_stories='Guardar'), self.prefijos(formset, 'numero')
+        datos[prefijos[1] + '-prioridad'] = 1
+        datos[prefijos[2] + '-desarrollador'] = '3'
+        datos[prefijos[300] + '-desarrollador'] = ''
+        datos[prefijos[3] + '-borrar'] = 'on'
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.post(self.url, datos)
+        self.assertEquals(response.status_code, 302, "El formulario no fue aceptado")
+        self.assertLess(len(consultas), 30, "La cantidad de consultas depende del backlog")
+        backlog = self.proyecto.product_backlog
+        self.assertEquals(backlog.get(numero=1).prioridad, 1, "La prioridad no fue actualizada")
+        self.assertEquals(list(ParticipaSprint.objects.filter(user_stories__numero=2)
+                               .values_list('usuario_id', flat=True)),
+                          ['3'], "El desarrollador no fue reasignado")
+        self.assertFalse(ParticipaSprint.objects.filter(user_stories__numero=300).exists(),
+                         "El desarrollador no fue quitado")
+        self.assertIsNone(backlog.get(numero=3).sprint, "El user story no fue quitado del sprint")
+        self.assertEquals(self.sprint.participasprint_set.get(usuario_id='2').user_stories.count(), 152,
+                          "Se modificaron otras asignaciones")
+
+
+class EquipoSprintTest(ConsultasMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create(user_id=1, email='ejemplo@fpuna.edu.py', nombre='Nombre', apellido='Apellido')
+        self.client.login(token=1, test=True)
+        self.proyecto = Proyecto.objects.create(nombre='Proyecto de prueba')
+        self.proyecto.crear_roles_predeterminados()
+        self.proyecto.asignar_rol(self.user, 'Scrum master')
+        self.sprint = Sprint.objects.create(nombre='Sprint de prueba', proyecto=self.proyecto,
+                                            fecha_inicio=datetime.date(2021, 11, 1),
+                                            fecha_fin=datetime.date(2021, 11, 7))
+        self.url = reverse('sgp:equipo_sprint', kwargs={'proyecto_id': self.proyecto.id, 'sprint_id': self.sprint.id})
+        self.agregar_desarrolladores(range(2, 7))
+
+    def agregar_desarrolladores(self, numeros, horas=4):
+        User.objects.bulk_create(User(user_id=str(n), email='%d@fpuna.edu.py' % n, nombre='Nombre %d' % n,
+                                      apellido='Apellido') for n in numeros)
+        rol = self.proyecto.role_set.get(nombre='Desarrollador')
+        self.proyecto.agregar_miembros({str(n): rol.id for n in numeros})
+        ParticipaSprint.objects.bulk_create(ParticipaSprint(sprint=self.sprint, usuario_id=str(n), horas_diarias=horas)
+                                            for n in numeros)
+
+    def test_consultas_equipo(self):
+        """Verifica que el equipo del sprint se cargue con un número fijo de
+        consultas."""
+        antes, despues = self.assertConsultasConstantes(self.url, lambda: self.agregar_desarrolladores(range(7, 307)))
+        self.assertEquals(antes.context['formset'].forms[0].fields['horas'].initial, 4,
+                          "Las horas del desarrollador son incorrectas")
+        self.assertEquals(len(despues.context['formset'].forms), 305, "No se muestra todo el equipo")
+
+    def test_guardar_equipo(self):
+        """Verifica que las horas se actualicen en bloque y que se quiten los
+        miembros marcados."""
+        self.agregar_desarrolladores(range(7, 307))
+        formset = self.client.get(self.url).context['formset']
+        datos, prefijos = self.datos_formset(formset, editar_usuarios='Guardar'), self.prefijos(formset)
+        datos[prefijos['2'] + '-horas'] = 8
+        datos[prefijos['3'] + '-horas'] = 6
+        datos[prefijos['4'] + '-borrar'] = 'on'
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.post(self.url, datos)
+        self.assertEquals(response.status_code, 302, "El formulario no fue aceptado")
+        self.assertLess(len(consultas), 20, "La cantidad de consultas depende del equipo")
+        self.assertEquals(dict(self.sprint.participasprint_set.exclude(horas_diarias=4)
+                               .values_list('usuario_id', 'horas_diarias')),
+                          {'2': 8, '3': 6}, "Las horas no fueron actualizadas")
+        self.assertFalse(self.sprint.participasprint_set.filter(usuario_id='4').exists(), "El miembro no fue quitado")
+        self.assertEquals(self.sprint.participasprint_set.count(), 304, "Se modificaron otros miembros")
+
+    def test_agregar_desarrollador(self):
+        """Verifica que solo se ofrezcan los desarrolladores que no forman
+        parte del sprint."""
+        User.objects.create(user_id=7, email='7@fpuna.edu.py', nombre='Nombre 7', apellido='Apellido')
+        self.proyecto.asignar_rol(User.objects.get(user_id=7), 'Desarrollador')
+        form = self.client.get(self.url).context['form']
+        self.assertEquals(list(form.fields['usuario'].queryset.values_list('user_id', flat=True)), ['7'],
+                          "Los desarrolladores ofrecidos son incorrectos")
+
+
+class ExportacionBacklogTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(user_id=1, email='ejemplo@fpuna.edu.py', nombre='Nombre', apellido='Apellido')
+        self.client.login(token=1, test=True)
+        self.proyecto = Proyecto.objects.create(nombre='Proyecto de prueba')
+        self.sprint = Sprint.objects.create(nombre='Sprint de prueba', proyecto=self.proyecto,
+                                            fecha_inicio=datetime.date(2021, 11, 1),
+                                            fecha_fin=datetime.date(2021, 11, 7))
+        inicio = self.proyecto.reservar_numeros(300)
+        UserStory.objects.bulk_create(UserStory(numero=n, nombre='US %d' % n, proyecto=self.proyecto,
+                                                horas_estimadas=2, sprint=self.sprint if n % 2 else None)
+                                      for n in range(inicio, inicio + 300))
+        ParticipaSprint.objects.create(sprint=self.sprint, usuario=self.user, horas_diarias=8) \
+            .user_stories.add(UserStory.objects.get(numero=1))
+        Incremento.objects.bulk_create(Incremento(user_story=us, usuario=self.user, horas=1,
+                                                  fecha=datetime.date(2021, 11, 2))
+                                       for us in self.sprint.sprint_backlog.all())
+
+    def descargar(self, nombre, formato, **kwargs):
+        """Descarga una exportación y retorna sus líneas y la cantidad de
+        consultas realizadas."""
+        kwargs['proyecto_id'] = self.proyecto.id
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('sgp:' + nombre, kwargs=dict(kwargs, formato=formato)))
+            self.assertTrue(response.streaming, "La respuesta no es transmitida por partes")
+            lineas = b''.join(response.streaming_content).decode().splitlines()
+        return lineas, len(consultas)
+
+    def test_exportar_product_backlog(self):
+        """Verifica que el product backlog se exporte en CSV con un número
+        fijo de consultas."""
+        self.descargar('exportar_product_backlog', 'json')
+        lineas, consultas = self.descargar('exportar_product_backlog', 'csv')
+        self.assertEquals(lineas[0], 'numero,nombre,descripcion,prioridad,estado,horas_estimadas,'
+                                     'horas_trabajadas,sprint', "El encabezado es incorrecto")
+        self.assertEquals(len(lineas), 301, "El archivo no contiene todo el backlog")
+        self.assertEquals(lineas[1], '1,US 1,,Normal,Pendiente,2,0,Sprint de prueba', "La fila es incorrecta")
+        inicio = self.proyecto.reservar_numeros(300)
+        UserStory.objects.bulk_create(UserStory(numero=n, nombre='US %d' % n, proyecto=self.proyecto)
+                                      for n in range(inicio, inicio + 300))
+        self.assertEquals(self.descargar('exportar_product_backlog', 'csv')[1], consultas,
+                          "La cantidad de consultas depende del backlog")
+
+    def test_exportar_cancelados(self):
+        """Verifica que los user stories cancelados solo se exporten a los
+        usuarios que pueden verlos en el product backlog."""
+        UserStory.objects.filter(numero=1).update(estado=UserStory.Estado.CANCELADO)
+        lineas, _ = self.descargar('exportar_product_backlog', 'csv')
+        self.assertEquals(len(lineas), 300, "Se exportó un user story cancelado")
+        self.proyecto.crear_roles_predeterminados()
+        self.proyecto.asignar_rol(self.user, 'Product owner')
+        lineas, _ = self.descargar('exportar_product_backlog', 'csv')
+        self.assertEquals(len(lineas), 301, "No se exportaron los user stories cancelados")
+
+    def test_exportar_sprint_backlog(self):
+        """Verifica que el sprint backlog se exporte en JSON delimitado por
+        líneas con el desarrollador de cada user story."""
+        lineas, _ = self.descargar('exportar_sprint_backlog', 'json', sprint_id=self.sprint.id)
+        self.assertEquals(len(lineas), 150, "El archivo no contiene todo el sprint backlog")
+        primero = json.loads(lineas[0])
+        self.assertEquals((primero['numero'], primero['desarrollador']), (1, 'ejemplo@fpuna.edu.py'),
+                          "El desarrollador no fue exportado")
+        self.assertIsNone(json.loads(lineas[1])['desarrollador'], "Se exportó un desarrollador no asignado")
+
+    def test_exportar_registro(self):
+        """Verifica que el registro de incrementos se exporte y que se rechacen
+        los formatos desconocidos."""
+        lineas, _ = self.descargar('exportar_registro', 'json', sprint_id=self.sprint.id)
+        self.assertEquals(len(lineas), 150, "El archivo no contiene todo el registro")
+        self.assertEquals(json.loads(lineas[0])['fecha'], '2021-11-02', "La fecha no fue exportada")
+        response = self.client.get(reverse('sgp:exportar_registro', kwargs={
+            'proyecto_id': self.proyecto.id, 'sprint_id': self.sprint.id, 'formato': 'xml'}))
+        self.assertEquals(response.status_code, 404, "Se aceptó un formato desconocido")
+
 
 class CrearProyectoTest(TestCase):
 
@@ -352,6 +942,34 @@ class FormulariosDesarrolloTest(TestCase):
                                                  horas_estimadas=10, prioridad=3).exists(),
                         "El user story no fue modificado correctamente")
 
+    def test_numero_user_story(self):
+        """Verifica que los user stories nuevos se numeren con el contador del
+        proyecto, sin contar el backlog y sin reutilizar números borrados."""
+        UserStory.objects.create(numero=40, nombre='US importado', proyecto=self.proj)
+        form = UserStoryForm(usuario=self.user, proyecto=self.proj,
+                             data={'nombre': 'US de prueba', 'horas_estimadas': 10, 'prioridad': 3})
+        self.assertTrue(form.is_valid(), "El formulario no es válido")
+        with CaptureQueriesContext(connection) as consultas:
+            form.save()
+        self.assertFalse(any('COUNT' in c['sql'] or 'MAX' in c['sql'] for c in consultas),
+                         "Se recorrió el backlog para numerar el user story")
+        us = UserStory.objects.get(nombre='US de prueba')
+        self.assertEquals(us.numero, 41, "El user story no recibió el siguiente número")
+        us.delete()
+        self.assertEquals(self.proj.reservar_numeros(10), 42, "Se reutilizó el número de un user story borrado")
+        self.assertEquals(UserStory.objects.create(nombre='US nuevo', proyecto=self.proj).numero, 52,
+                          "El bloque reservado no fue respetado")
+
+    def test_numero_user_story_unico(self):
+        """Verifica que no existan dos user stories con el mismo número en un
+        proyecto."""
+        UserStory.objects.create(numero=1, nombre='US de prueba', proyecto=self.proj)
+        otro = Proyecto.objects.create(nombre='Otro proyecto')
+        UserStory.objects.create(numero=1, nombre='US de prueba', proyecto=otro)
+        with self.assertRaises(IntegrityError, msg="Se repitió el número del user story"):
+            with transaction.atomic():
+                UserStory.objects.create(numero=1, nombre='US repetido', proyecto=self.proj)
+
     def test_agregar_comentario(self):
         """
         Verifica que ComentarioForm sea capaz de agregar un comentario a un proyecto.
@@ -506,6 +1124,60 @@ class FlujoKanbanTest(TestCase):
         self.assertEquals(sprint.estado, Sprint.Estado.INICIADO,
                           "El sprint no ha iniciado: " + str(sprint.validar_inicio()['errores']))
 
+    def test_validar_inicio_sprint(self):
+        """Verifica que la validación del sprint utilice un número constante de
+        consultas y mantenga los mensajes."""
+        proyecto = Proyecto.objects.get()
+        proyecto.estado = Proyecto.Estado.INICIADO
+        proyecto.save()
+        sprint = Sprint.objects.create(nombre='Sprint pendiente', proyecto=proyecto,
+                                       fecha_inicio=datetime.date(2021, 12, 30), fecha_fin=datetime.date(2021, 12, 31))
+        participa = ParticipaSprint.objects.create(sprint=sprint, usuario=User.objects.get(user_id=1),
+                                                   horas_diarias=1)
+        inicio = proyecto.reservar_numeros(200)
+        UserStory.objects.bulk_create(UserStory(numero=n, nombre='US', proyecto=proyecto, sprint=sprint,
+                                                horas_estimadas=n % 2 or None) for n in range(inicio, inicio + 200))
+        participa.user_stories.add(*UserStory.objects.filter(sprint=sprint, numero__gte=102))
+        sprint = Sprint.objects.get(nombre='Sprint pendiente')
+        with self.assertNumQueries(5):
+            msg = sprint.validar_inicio()
+        self.assertEquals(msg['errores'][0], 'Ya existe un sprint en curso.', "No se detectó el sprint en curso")
+        self.assertEquals(len(msg['errores']), 1 + 100 + 100, "Los errores del backlog no coinciden")
+        self.assertEquals(msg['errores'][1], 'US-2 no tiene un desarrollador asociado.',
+                          "El mensaje de asignación difiere del original")
+        self.assertIn('El costo total del backlog es mayor que la capacidad del equipo.', msg['advertencias'],
+                      "No se detectó la falta de capacidad")
+
+    def test_estado_sprints(self):
+        """Verifica que el estado de los sprints se consulte una vez y se
+        actualice al modificar un sprint."""
+        proyecto = Proyecto.objects.get()
+        with self.assertNumQueries(1):
+            sprint = proyecto.sprint_activo
+            self.assertIsNone(proyecto.sprint_pendiente, "Se encontró un sprint pendiente inexistente")
+            self.assertEquals(proyecto.sprints_finalizados, [], "Se encontraron sprints finalizados inexistentes")
+        sprint.estado = Sprint.Estado.FINALIZADO
+        sprint.save()
+        Sprint.objects.create(nombre='Sprint pendiente', proyecto=proyecto, fecha_inicio=datetime.date(2021, 12, 31),
+                              fecha_fin=datetime.date(2021, 12, 31))
+        self.assertIsNone(proyecto.sprint_activo, "El sprint activo no fue actualizado")
+        self.assertEquals(proyecto.sprints_finalizados, [sprint], "Los sprints finalizados no fueron actualizados")
+        Sprint.objects.get(nombre='Sprint pendiente').delete()
+        self.assertIsNone(proyecto.sprint_pendiente, "El sprint pendiente no fue actualizado")
+
+    def test_consultas_permisos(self):
+        """Verifica que los permisos del usuario sobre el proyecto se obtengan
+        con una sola consulta por solicitud."""
+        proyecto = Proyecto.objects.get()
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('sgp:product_backlog', kwargs={'proyecto_id': proyecto.id}))
+        permisos = [q for q in consultas.captured_queries if 'auth_permission' in q['sql']]
+        self.assertEquals(len(permisos), 1, "Los permisos se consultaron más de una vez")
+        self.assertEquals(response.context['proyecto_perms'],
+                          {'vista', 'administrar_equipo', 'gestionar_proyecto', 'pila_producto', 'desarrollo'},
+                          "Los permisos del usuario son incorrectos")
+        self.assertContains(response, 'Crear user story')
+
     def test_registrar_horas(self):
         """Verifica que el tablero kanban registre las horas trabajadas."""
         self.client.post(reverse('sgp:kanban', kwargs={'proyecto_id': Proyecto.objects.get().id}),
@@ -575,6 +1247,43 @@ class FlujoKanbanTest(TestCase):
         us = UserStory.objects.get()
         self.assertEquals(us.estado, UserStory.Estado.INICIADO, "El user story no ha iniciado automáticamente")
 
+    def test_avance_sprint(self):
+        """Verifica que el tablero kanban actualice el avance diario del sprint."""
+        self.client.post(reverse('sgp:kanban', kwargs={'proyecto_id': Proyecto.objects.get().id}),
+                         {'us': 1, 'accion': 'trabajar', 'horas': 5})
+        avance = AvanceSprint.objects.get()
+        self.assertEquals((avance.horas_trabajadas, avance.horas_restantes, avance.iniciados), (5, 5, 1),
+                          "El avance del sprint no se ha actualizado")
+
+    def test_consultas_tablero(self):
+        """Verifica que el tablero kanban de un sprint con 500 user stories se
+        cargue con un número fijo de consultas."""
+        proyecto = Proyecto.objects.get()
+        sprint = Sprint.objects.get()
+        inicio = proyecto.reservar_numeros(499)
+        UserStory.objects.bulk_create([
+            UserStory(numero=n, nombre='US %d' % n, proyecto=proyecto, sprint=sprint, horas_estimadas=1,
+                      estado=UserStory.Estado.values[n % 5]) for n in range(inicio, inicio + 499)])
+        ParticipaSprint.objects.get().user_stories.add(*UserStory.objects.filter(numero__lte=250))
+        Incremento.objects.create(user_story=UserStory.objects.get(numero=1), usuario=User.objects.get(user_id=1),
+                                  horas=2, fecha=timezone.localdate())
+        with self.assertNumQueries(9):
+            response = self.client.get(reverse('sgp:kanban', kwargs={'proyecto_id': proyecto.id}))
+        self.assertContains(response, 'US 500', msg_prefix="El tablero no muestra todos los user stories")
+        self.assertContains(response, 'Usted ha trabajado 2 horas')
+
+    def test_medir_consultas(self):
+        """Verifica que el comando medirconsultas cree los datos de prueba y
+        mida cada consulta frecuente."""
+        salida = StringIO()
+        call_command('medirconsultas', '--sembrar', '--proyectos', '1', '--user-stories', '10',
+                     '--repeticiones', '1', stdout=salida)
+        self.assertEquals(UserStory.objects.filter(proyecto__nombre='Benchmark 1').count(), 10,
+                          "No se crearon los datos de prueba")
+        for consulta in ['user story por número', 'sprint activo del proyecto', 'registro del sprint',
+                         'incrementos del día', 'historial del proyecto']:
+            self.assertIn(consulta, salida.getvalue(), "No se midió la consulta " + consulta)
+
     def test_registro_horas_trabajadas(self):
         """Verifica que las horas trabajadas aparezcan en el registro."""
         self.client.post(reverse('sgp:kanban', kwargs={'proyecto_id': Proyecto.objects.get().id}),
@@ -590,7 +1299,13 @@ class FlujoKanbanTest(TestCase):
         self.assertContains(response, "Iniciado", msg_prefix="El nuevo estado no aparece en el registro")
 
 
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class CierreProyectoTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
     def setUp(self):
         self.user = User.objects.create(user_id=1, email='correo@test.com.py',
                                         nombre='Nombre', apellido='Apellido')
@@ -626,6 +1341,78 @@ class CierreProyectoTest(TestCase):
         self.assertContains(response, str(list(range(9))),
                             msg_prefix="El burndown chart no contiene los datos de los incrementos")
 
+    def test_burndown_json(self):
+        """Verifica que los datos del burndown chart se expongan en formato JSON."""
+        Incremento.objects.create(user_story=self.us, usuario=self.user, fecha=datetime.date(2021, 11, 2), horas=4)
+        response = self.client.get(reverse('sgp:burndown_json',
+                                           kwargs={'proyecto_id': self.proyecto.id, 'sprint_id': self.sprint.id}))
+        chart = response.json()
+        self.assertEquals(chart['incremento'][:4], [0, 0, 4, 0], "Las horas trabajadas no coinciden")
+        self.assertEquals(chart['restante'][:4], [10, 10, 6, 6], "Las horas restantes no coinciden")
+
+    def test_burndown_consultas_constantes(self):
+        """Verifica que el número de consultas del burndown chart no dependa de
+        la duración del sprint."""
+        largo = Sprint.objects.create(nombre='Sprint largo', proyecto=self.proyecto,
+                                      estado=Sprint.Estado.FINALIZADO, fecha_inicio=datetime.date(2021, 11, 8),
+                                      fecha_fin=datetime.date(2021, 12, 30))
+        us = UserStory.objects.create(numero=2, nombre='US largo', proyecto=self.proyecto, sprint=largo,
+                                      horas_estimadas=100)
+        for i in range(50):
+            Incremento.objects.create(user_story=us, usuario=self.user,
+                                      fecha=datetime.date(2021, 11, 8) + datetime.timedelta(days=i), horas=1)
+        with CaptureQueriesContext(connection) as corto:
+            calcular_burndown(self.sprint)
+        with CaptureQueriesContext(connection) as extenso:
+            calcular_burndown(largo)
+        self.assertEquals(len(corto), len(extenso), "Las consultas aumentan con la duración del sprint")
+
+    def test_reconstruir_avance(self):
+        """Verifica que los avances reconstruidos generen el mismo burndown chart
+        que los incrementos."""
+        for i in range(5):
+            Incremento.objects.create(user_story=self.us, usuario=self.user,
+                                      fecha=datetime.date(2021, 11, 1+i), horas=2)
+        Incremento.objects.create(user_story=self.us, usuario=self.user, fecha=datetime.date(2021, 11, 5),
+                                  estado=UserStory.Estado.FINALIZADO)
+        chart = calcular_burndown(self.sprint)
+        self.sprint.reconstruir_avance()
+        self.assertEquals(self.sprint.avancesprint_set.count(), 5, "No se registró un avance por día")
+        self.assertEquals(self.sprint.avancesprint_set.get(fecha=datetime.date(2021, 11, 5)).finalizados, 1,
+                          "El avance no refleja el estado de los user stories")
+        self.assertEquals(calcular_burndown(self.sprint), chart, "El burndown chart difiere del original")
+
+    def test_burndown_avances_parciales(self):
+        """Verifica que un avance nuevo se inicie con los incrementos de su día
+        y que se agrupen los incrementos posteriores al último avance."""
+        Incremento.objects.create(user_story=self.us, usuario=self.user, fecha=datetime.date(2021, 11, 2), horas=3)
+        Incremento.objects.create(user_story=self.us, usuario=self.user, fecha=datetime.date(2021, 11, 2), horas=2)
+        self.sprint.registrar_avance(2, datetime.date(2021, 11, 2))
+        self.assertEquals(self.sprint.avancesprint_set.get().horas_trabajadas, 5,
+                          "El avance no incluye los incrementos previos del día")
+        Incremento.objects.create(user_story=self.us, usuario=self.user, fecha=datetime.date(2021, 11, 3), horas=2)
+        chart = calcular_burndown(self.sprint)
+        self.assertEquals(chart['incremento'][:5], [0, 0, 5, 2, 0], "Faltan las horas posteriores al último avance")
+        self.assertEquals(chart['restante'][:5], [10, 10, 5, 3, 3], "Las horas restantes no coinciden")
+
+    def test_capacidad_anotada(self):
+        """Verifica que la capacidad y el costo de varios sprints se obtengan
+        con una sola consulta."""
+        for n in range(2, 12):
+            sprint = Sprint.objects.create(nombre='Sprint %d' % n, proyecto=self.proyecto,
+                                           fecha_inicio=datetime.date(2021, 11, 1),
+                                           fecha_fin=datetime.date(2021, 11, 7))
+            ParticipaSprint.objects.create(sprint=sprint, usuario=self.user, horas_diarias=n)
+            UserStory.objects.create(numero=n, nombre='US', proyecto=self.proyecto, sprint=sprint,
+                                     horas_estimadas=n)
+        with self.assertNumQueries(1):
+            sprints = list(Sprint.objects.con_capacidad().order_by('id'))
+            self.assertEquals([(s.capacidad_diaria, s.costo_backlog) for s in sprints],
+                              [(10, 10)] + [(n, n) for n in range(2, 12)], "La capacidad anotada es incorrecta")
+        sprint = Sprint.objects.get(id=self.sprint.id)
+        self.assertEquals((sprint.capacidad_equipo, sprint.costo_backlog), (60, 10),
+                          "La capacidad calculada es incorrecta")
+
     def test_cerrar_sprint(self):
         """Verifica que el sprint finalice sin errores."""
         sprint = Sprint.objects.get()
@@ -637,6 +1424,29 @@ class CierreProyectoTest(TestCase):
         self.assertEquals(sprint.estado, Sprint.Estado.FINALIZADO,
                           "El sprint no ha finalizado: " + str(sprint.validar_inicio()['errores']))
 
+    def test_concluir_user_stories(self):
+        """Verifica que los user stories sin terminar pasen al product backlog
+        con un número constante de consultas."""
+        inicio = self.proyecto.reservar_numeros(200)
+        UserStory.objects.bulk_create(UserStory(numero=n, nombre='US %d' % n, proyecto=self.proyecto,
+                                                sprint=self.sprint, horas_estimadas=10, horas_trabajadas=4,
+                                                estado=UserStory.Estado.INICIADO) for n in range(inicio, inicio + 200))
+        Comentario.objects.bulk_create(Comentario(texto='Comentario', autor=self.user, user_story=us)
+                                       for us in UserStory.objects.filter(estado=UserStory.Estado.INICIADO))
+        with CaptureQueriesContext(connection) as consultas:
+            self.sprint.concluir_user_stories()
+        self.assertLess(len(consultas), 15, "La cantidad de consultas depende del backlog")
+        self.assertEquals(self.sprint.sprint_backlog.filter(estado=UserStory.Estado.CANCELADO).count(), 200,
+                          "Los user stories sin terminar no fueron cancelados")
+        nuevos = UserStory.objects.filter(sprint=None)
+        self.assertEquals(sorted(nuevos.values_list('numero', flat=True)), list(range(202, 402)),
+                          "Los números de los user stories nuevos no son contiguos")
+        us = nuevos.get(numero=202)
+        self.assertEquals((us.nombre, us.horas_estimadas, us.prioridad), ('US 2*', 6, 1),
+                          "El user story nuevo no conserva los datos del original")
+        self.assertEquals(Comentario.objects.filter(user_story__sprint=None).count(), 200,
+                          "Los comentarios no fueron copiados")
+
     def test_cerrar_proyecto(self):
         """Verifica que el proyecto finalice sin errores."""
         self.client.post(reverse('sgp:mostrar_proyecto', kwargs={'proyecto_id': self.proyecto.id}))
@@ -648,19 +1458,52 @@ class CierreProyectoTest(TestCase):
         """Verifica que se coloquen las notificaciones por correo en la bandeja
         de salida del sistema."""
         self.client.post(reverse('sgp:mostrar_proyecto', kwargs={'proyecto_id': self.proyecto.id}))
+        self.assertEquals(len(mail.outbox), 0, "El correo se envió durante la solicitud")
+        call_command('enviarcorreos', stdout=StringIO())
         self.assertTrue(len(mail.outbox) > 0, "No se ha generado ningún correo")
         self.assertEquals(mail.outbox[0].subject, 'SGP: El proyecto Proyecto de prueba ha finalizado',
                           "La notificación por correo no se ha generado correctamente")
+        self.assertFalse(Correo.objects.filter(fecha_envio__isnull=True).exists(),
+                         "La bandeja de salida no fue vaciada")
+
+    def test_reintentar_correos(self):
+        """Verifica que los correos que no pudieron enviarse se reintenten más
+        tarde."""
+        encolar_correo('Asunto', 'Cuerpo', '', ['correo@test.com.py'])
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                        side_effect=ConnectionError('Servidor no disponible')):
+            self.assertEquals(enviar_correos_pendientes(), (0, 1), "El correo no fue marcado como fallido")
+        correo = Correo.objects.get()
+        self.assertEquals(correo.intentos, 1, "El intento fallido no fue registrado")
+        self.assertTrue(correo.proximo_intento > timezone.now(), "El reintento no fue pospuesto")
+        self.assertEquals(enviar_correos_pendientes(), (0, 0), "El correo se reintentó antes de tiempo")
+
+    def test_cierre_fallido(self):
+        """Verifica que los correos enviados queden registrados aunque falle el
+        cierre de la conexión."""
+        encolar_correo('Asunto', 'Cuerpo', '', ['correo@test.com.py'])
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.close',
+                        side_effect=ConnectionError('Conexión interrumpida')):
+            with self.assertRaises(ConnectionError):
+                enviar_correos_pendientes()
+        self.assertEquals(len(mail.outbox), 1, "El correo no fue enviado")
+        self.assertIsNotNone(Correo.objects.get().fecha_envio, "El envío no fue registrado")
+        self.assertEquals(enviar_correos_pendientes(), (0, 0), "El correo se volvió a enviar")
 
     def test_generar_reporte_proyecto(self):
         """Verifica que se genere el informe del product backlog."""
-        response = self.client.get(reverse('sgp:reporte_proyecto', kwargs={'proyecto_id': self.proyecto.id}))
+        url = reverse('sgp:reporte_proyecto', kwargs={'proyecto_id': self.proyecto.id})
+        self.assertEquals(self.client.get(url).status_code, 202, "El reporte no fue agregado a la cola")
+        call_command('generarreportes', procesos=1, stdout=StringIO())
+        response = self.client.get(url)
         self.assertEquals(response.get('Content-Disposition'), "filename=Reporte - Product Backlog")
 
     def test_generar_reporte_sprint(self):
         """Verifica que se genere el informe del sprint backlog."""
-        response = self.client.get(reverse('sgp:reporte_sprint',
-                                           kwargs={'proyecto_id': self.proyecto.id, 'sprint_id': self.sprint.id}))
+        url = reverse('sgp:reporte_sprint', kwargs={'proyecto_id': self.proyecto.id, 'sprint_id': self.sprint.id})
+        self.client.get(url)
+        call_command('generarreportes', procesos=1, stdout=StringIO())
+        response = self.client.get(url)
         self.assertEquals(response.get('Content-Disposition'), "filename=Reporte - Sprint Backlog")
 
     def test_generar_reporte_us_prioridad(self):
@@ -668,5 +1511,187 @@ class CierreProyectoTest(TestCase):
         sprint = Sprint.objects.get()
         sprint.estado = Sprint.Estado.INICIADO
         sprint.save()
-        response = self.client.get(reverse('sgp:reporte_us_prioridad', kwargs={'proyecto_id': self.proyecto.id}))
+        url = reverse('sgp:reporte_us_prioridad', kwargs={'proyecto_id': self.proyecto.id})
+        self.client.get(url)
+        call_command('generarreportes', procesos=1, stdout=StringIO())
+        response = self.client.get(url)
         self.assertEquals(response.get('Content-Disposition'), "filename=Reporte - US - Prioridad")
+
+    def test_version_reporte(self):
+        """Verifica que un reporte generado se reutilice hasta que cambien sus
+        user stories."""
+        url = reverse('sgp:reporte_proyecto', kwargs={'proyecto_id': self.proyecto.id})
+        self.client.get(url)
+        call_command('generarreportes', procesos=1, stdout=StringIO())
+        self.assertEquals(self.client.get(url).status_code, 200, "El reporte generado no fue reutilizado")
+        self.us.nombre = 'US modificado'
+        self.us.save()
+        self.assertEquals(self.client.get(url).status_code, 202, "El reporte no se invalidó")
+        call_command('generarreportes', procesos=1, stdout=StringIO())
+        self.assertEquals(Reporte.objects.count(), 1, "No se eliminó la versión anterior del reporte")
+
+    def test_version_pendiente_conservada(self):
+        """Verifica que al generar un reporte no se eliminen las versiones más
+        recientes que otro proceso aún está generando."""
+        url = reverse('sgp:reporte_proyecto', kwargs={'proyecto_id': self.proyecto.id})
+        self.client.get(url)
+        anterior = Reporte.objects.get()
+        Reporte.objects.filter(pk=anterior.pk).update(fecha_creacion=timezone.now() - datetime.timedelta(minutes=1))
+        self.us.nombre = 'US modificado'
+        self.us.save()
+        self.client.get(url)
+        nuevo = Reporte.objects.exclude(pk=anterior.pk).get()
+        generar_reporte(anterior.pk)
+        self.assertEquals(Reporte.objects.get(pk=nuevo.pk).estado, Reporte.Estado.PENDIENTE,
+                          "Se eliminó una versión pendiente más reciente")
+        generar_reporte(nuevo.pk)
+        self.assertEquals(list(Reporte.objects.values_list('pk', flat=True)), [nuevo.pk],
+                          "No se eliminó la versión anterior del reporte")
+
+
+class RecordatoriosTest(TestCase):
+    def setUp(self):
+        hoy = timezone.localdate()
+        for i in range(3):
+            user = User.objects.create(user_id=i, email='correo%d@test.com.py' % i,
+                                       nombre='Nombre', apellido='Apellido')
+            proyecto = Proyecto.objects.create(nombre='Proyecto %d' % i, fecha_inicio=hoy,
+                                               fecha_fin=hoy + datetime.timedelta(days=10), duracion_sprint=5)
+            proyecto.crear_roles_predeterminados()
+            proyecto.asignar_rol(user, 'Scrum master')
+            sprint = Sprint.objects.create(nombre='Sprint %d' % i, proyecto=proyecto, fecha_inicio=hoy,
+                                           fecha_fin=hoy + datetime.timedelta(days=5))
+            ParticipaSprint.objects.create(sprint=sprint, usuario=user, horas_diarias=5)
+
+    def test_enviar_recordatorios(self):
+        """Verifica que se encole un recordatorio por cada evento del día,
+        consultando los eventos y sus equipos y guardando los correos con un
+        número fijo de consultas."""
+        with self.assertNumQueries(6 + 1):
+            call_command('recordatorios', stdout=StringIO())
+        self.assertEquals(len(mail.outbox), 0, "Los recordatorios no pasaron por la bandeja de salida")
+        self.assertEquals(Correo.objects.count(), 6, "No se encoló un recordatorio por cada evento")
+        enviar_correos_pendientes()
+        self.assertEquals(len(mail.outbox), 6, "No se envió un recordatorio por cada evento")
+        self.assertEquals(mail.outbox[0].subject, 'SGP: inicio del proyecto Proyecto 0',
+                          "El recordatorio no se ha generado correctamente")
+
+    def test_recordatorios_dry_run(self):
+        """Verifica que la opción --dry-run no envíe ningún correo."""
+        salida = StringIO()
+        call_command('recordatorios', dry_run=True, stdout=salida)
+        self.assertFalse(Correo.objects.exists(), "Se encolaron correos durante la simulación")
+        self.assertIn('6 recordatorios por enviar', salida.getvalue())
+
+
+@skipUnless(importlib.util.find_spec('cryptography'), "Se necesita cryptography para generar los certificados")
+class OAuth2BackendTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # cryptography no es una dependencia del sistema, solo se utiliza para
+        # generar un certificado de prueba
+        from cryptography import x509
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+
+        super().setUpClass()
+        clave = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        nombre = x509.Name([x509.NameAttribute(x509.NameOID.COMMON_NAME, 'prueba')])
+        certificado = x509.CertificateBuilder().subject_name(nombre).issuer_name(nombre) \
+            .public_key(clave.public_key()).serial_number(1) \
+            .not_valid_before(datetime.datetime(2000, 1, 1)).not_valid_after(datetime.datetime(2100, 1, 1)) \
+            .sign(clave, hashes.SHA256())
+        cls.signer = crypt.RSASigner.from_string(clave.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()), 'clave')
+        cls.certificados = {'clave': certificado.public_bytes(serialization.Encoding.PEM).decode()}
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as archivo:
+            json.dump(cls.certificados, archivo)
+        cls.archivo = archivo.name
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.archivo)
+        super().tearDownClass()
+
+    def token(self, **datos):
+        ahora = int(time.time())
+        payload = {'iss': 'accounts.google.com', 'aud': CLIENT_ID, 'sub': '123', 'iat': ahora,
+                   'exp': ahora + 3600, 'email': 'correo@test.com.py', 'given_name': 'Nombre',
+                   'family_name': 'Apellido'}
+        payload.update(datos)
+        return jwt.encode(self.signer, payload).decode()
+
+    def test_autenticar_token_local(self):
+        """Verifica que un token se valide con certificados locales y cree al
+        usuario."""
+        with override_settings(GOOGLE_OAUTH2_CERTS=self.archivo), \
+                mock.patch('sgp.backends.certificados_google', CertificadosGoogle()):
+            user = authenticate(None, token=self.token())
+            self.assertEquals(user.email, 'correo@test.com.py', "El usuario no fue autenticado")
+            self.assertIsNone(authenticate(None, token=self.token(aud='otro')), "Se aceptó un token ajeno")
+            self.assertIsNone(authenticate(None, token=self.token(iss='otro')), "Se aceptó un emisor inválido")
+
+    def test_cache_certificados(self):
+        """Verifica que los certificados se descarguen una vez hasta que
+        expiren."""
+        respuesta = mock.Mock(status=200, headers={'cache-control': 'public, max-age=3600'},
+                              data=json.dumps(self.certificados).encode())
+        transporte = mock.Mock(return_value=respuesta)
+        certificados = CertificadosGoogle('https://prueba/certs', transporte)
+        for _ in range(10):
+            self.assertEquals(certificados.verificar(self.token())['sub'], '123', "El token no fue verificado")
+        self.assertEquals(transporte.call_count, 1, "Los certificados se descargaron más de una vez")
+        certificados.expiracion = 0
+        certificados.verificar(self.token())
+        self.assertEquals(transporte.call_count, 2, "Los certificados expirados no se renovaron")
+
+
+@override_settings(USUARIOS_CACHE_TTL=60)
+class CacheUsuariosTest(TestCase):
+    def setUp(self):
+        self.limpiar_cache()
+        self.addCleanup(self.limpiar_cache)
+        self.user = User.objects.create(user_id=1, email='correo@test.com.py', nombre='Nombre', apellido='Apellido')
+        self.backend = OAuth2Backend()
+
+    @staticmethod
+    def limpiar_cache():
+        """Vacía el LRU del proceso y la cache de Django, que se conservan
+        entre pruebas."""
+        cache_usuarios.usuarios.clear()
+        caches['default'].clear()
+
+    def test_usuario_en_cache(self):
+        """Verifica que un usuario frecuente se obtenga sin consultas."""
+        self.backend.get_user('1')
+        with self.assertNumQueries(0):
+            user = self.backend.get_user('1')
+        self.assertEquals(user.email, 'correo@test.com.py', "El usuario en cache es incorrecto")
+        self.assertEquals(user._state.db, self.user._state.db, "El usuario en cache no conserva su base de datos")
+
+    def test_invalidar_usuario(self):
+        """Verifica que desactivar un usuario lo elimine de la cache."""
+        self.backend.get_user('1')
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(self.backend.get_user('1'), "El usuario desactivado sigue autenticado")
+
+    def test_expiracion_usuario(self):
+        """Verifica que los cambios hechos sin save se reflejen al expirar la
+        cache."""
+        self.backend.get_user('1')
+        User.objects.filter(user_id=1).update(nombre='Otro')
+        self.assertEquals(self.backend.get_user('1').nombre, 'Nombre', "El usuario no se obtuvo de la cache")
+        with mock.patch('sgp.backends.time.monotonic', return_value=time.monotonic() + 61):
+            self.assertEquals(self.backend.get_user('1').nombre, 'Otro', "La cache no expiró")
+
+    @override_settings(USUARIOS_CACHE_BACKEND='default')
+    def test_cache_compartida(self):
+        """Verifica que el usuario se obtenga de la cache de Django cuando no
+        se encuentra en el LRU del proceso."""
+        self.backend.get_user('1')
+        cache_usuarios.usuarios.clear()
+        with self.assertNumQueries(0):
+            self.assertEquals(self.backend.get_user('1').user_id, '1', "El usuario no se obtuvo de la cache")
+        self.user.delete()
+        self.assertIsNone(self.backend.get_user('1'), "El usuario eliminado sigue en la cache")
@@ -15,6 +15,8 @@ urlpatterns = [
     path('proyecto-<int:proyecto_id>/roles/exportar', views.exportar_roles, name='exportar_roles'),
     path('proyecto-<int:proyecto_id>/equipo', views.administrar_equipo, name='administrar_equipo'),
     path('proyecto-<int:proyecto_id>/product-backlog', views.product_backlog, name='product_backlog'),
+    path('proyecto-<int:proyecto_id>/product-backlog/exportar.<str:formato>', views.exportar_product_backlog,
+         name='exportar_product_backlog'),
     path('proyecto-<int:proyecto_id>/crear-user-story', views.crear_user_story, name='crear_user_story'),
     path('proyecto-<int:proyecto_id>/us-<int:us_numero>', views.mostrar_user_story, name='mostrar_user_story'),
     path('proyecto-<int:proyecto_id>/us-<int:us_numero>/editar', views.editar_user_story, name='editar_user_story'),
@@ -23,12 +25,19 @@ urlpatterns = [
     path('proyecto-<int:proyecto_id>/sprint-<int:sprint_id>/editar', views.editar_sprint, name='editar_sprint'),
     path('proyecto-<int:proyecto_id>/sprint-<int:sprint_id>/equipo', views.equipo_sprint, name='equipo_sprint'),
     path('proyecto-<int:proyecto_id>/sprint-<int:sprint_id>/backlog', views.sprint_backlog, name='sprint_backlog'),
+    path('proyecto-<int:proyecto_id>/sprint-<int:sprint_id>/backlog/exportar.<str:formato>',
+         views.exportar_sprint_backlog, name='exportar_sprint_backlog'),
+    path('proyecto-<int:proyecto_id>/sprint-<int:sprint_id>/registro/exportar.<str:formato>',
+         views.exportar_registro, name='exportar_registro'),
     path('proyecto-<int:proyecto_id>/planificacion', views.planificacion, name='planificacion'),
     path('proyecto-<int:proyecto_id>/kanban', views.kanban, name='kanban'),
     path('proyecto-<int:proyecto_id>/kanban/registro', views.registro_kanban, name='registro_kanban'),
     path('proyecto-<int:proyecto_id>/sprint-<int:sprint_id>/burndown-chart', views.burndown, name='burndown_chart'),
+    path('proyecto-<int:proyecto_id>/sprint-<int:sprint_id>/burndown-chart/json', views.burndown_json,
+         name='burndown_json'),
     path('proyecto-<int:proyecto_id>/reportes/product-backlog', views.reporte_proyecto, name='reporte_proyecto'),
     path('proyecto-<int:proyecto_id>/reportes/sprint-<int:sprint_id>', views.reporte_sprint, name='reporte_sprint'),
     path('proyecto-<int:proyecto_id>/reportes/us-prioridad', views.reporte_us_prioridad, name='reporte_us_prioridad'),
     path('proyecto-<int:proyecto_id>/historial', views.historial_modificaciones, name='historial_modificaciones'),
+    path('proyecto-<int:proyecto_id>/historial/exportar', views.exportar_historial, name='exportar_historial'),
 ]
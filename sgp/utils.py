@@ -1,50 +1,89 @@
+import csv
+import datetime
+import itertools
 from io import BytesIO
 
-from django.core.mail import send_mail
-from django.http import HttpResponse
+from django.core.files.base import ContentFile
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.shortcuts import render
 from django.template.loader import get_template
+from django.utils import timezone
 
 from xhtml2pdf import pisa
 
+from .models import Incremento, Proyecto, Sprint, UserStory, Correo, Reporte
 
-def enviar_recordatorio(actividad, tipo, accion):
+
+def permisos_proyecto(usuario, proyecto):
     """
-    Envía un correo al equipo correspondiente a una actividad de cierto tipo
-    recordándoles de una acción agendada para el día de hoy.
+    Retorna el conjunto de permisos que tiene el usuario sobre el proyecto,
+    incluyendo los de su rol y los otorgados a sus grupos. Los permisos se
+    obtienen con una sola consulta y se guardan en la instancia del usuario,
+    de modo que las vistas, los formularios y las plantillas de una misma
+    solicitud los reutilizan.
 
-    **Fecha:** 2/12/21
+    **Fecha:** 18/10/26
+
+    **Artefacto:** módulo de seguridad
+
+    :param usuario: El usuario cuyos permisos se consultan.
+    :param proyecto: El proyecto o su ID.
+    :type usuario: User
+    :type proyecto: Proyecto
+
+    |
+    """
+    proyecto_id = str(getattr(proyecto, 'pk', proyecto))
+    cache = getattr(usuario, '_permisos_proyecto', None)
+    if cache is None:
+        cache = usuario._permisos_proyecto = {}
+    if proyecto_id not in cache:
+        cache[proyecto_id] = Proyecto.permisos_usuario(usuario, proyecto_id)
+    return cache[proyecto_id]
+
+
+def redactar_recordatorio(nombre, tipo, accion):
+    """
+    Redacta un correo recordándole a un equipo de una acción agendada para el
+    día de hoy. Retorna el asunto, el cuerpo en texto plano y el cuerpo en
+    formato HTML.
+
+    **Fecha:** 18/10/26
 
     **Artefacto:** módulo de desarrollo
 
-    :param actividad: El proyecto o sprint cuyo recordatorio se va a enviar
+    :param nombre: El nombre del proyecto o sprint
     :param tipo: Indica si la actividad es un proyecto o un sprint
     :param accion: Indica si se notificará acerca del inicio o el fin de la actividad
-    :type actividad: Proyecto | Sprint
+    :type nombre: string
     :type tipo: string
     :type accion: string
 
     |
     """
-    asunto = 'SGP: '+accion+' del '+tipo+' '+actividad.nombre
+    asunto = 'SGP: '+accion+' del '+tipo+' '+nombre
     cuerpo = '¡Buenos días!\n\n' \
              'Le recordamos que el %s del %s %s se encuentra agendado para hoy.\n\n' \
              'Atentamente,\n\n' \
              'Sistema Gestor de Proyectos' \
-             % (accion, tipo, actividad.nombre)
+             % (accion, tipo, nombre)
     html = '<p>¡Buenos días!</p>' \
            '<p>Le recordamos que el %s del %s <strong>%s</strong> se encuentra agendado para hoy.</p>' \
            '<p>Atentamente,</p>' \
            '<p>Sistema Gestor de Proyectos</p>' \
-           % (accion, tipo, actividad.nombre)
-    send_mail(asunto, cuerpo, None,
-              actividad.equipo.values_list('email', flat=True),
-              fail_silently=False, html_message=html)
+           % (accion, tipo, nombre)
+    return asunto, cuerpo, html
 
 
 def enviar_notificacion(actividad, tipo, estado):
     """
     Envía un correo al equipo correspondiente a una actividad de cierto tipo
-    notificandoles de una acción que se ha realizado.
+    notificandoles de una acción que se ha realizado. El correo se agrega a la
+    bandeja de salida.
 
     **Fecha:** 2/12/21
 
@@ -72,42 +111,476 @@ def enviar_notificacion(actividad, tipo, estado):
            '<p>Atentamente,</p>' \
            '<p>Sistema Gestor de Proyectos</p>' \
            % (tipo, actividad.nombre, estado, fecha_fin)
-    send_mail(asunto, cuerpo, None,
-              actividad.equipo.values_list('email', flat=True),
-              fail_silently=False, html_message=html)
+    encolar_correo(asunto, cuerpo, html, actividad.equipo.values_list('email', flat=True))
 
 
-def render_to_pdf(request, template_src, context=None):
+def encolar_correo(asunto, cuerpo, html, destinatarios):
     """
-    Envía un correo al equipo correspondiente a una actividad de cierto tipo
-    notificandoles de una acción que se ha realizado.
+    Agrega un correo a la bandeja de salida del sistema para que sea enviado
+    por el comando ``enviarcorreos``. Si no hay destinatarios, no hace nada.
 
-    **Fecha:** 2/12/21
+    **Fecha:** 18/10/26
+
+    **Artefacto:** módulo de desarrollo
+
+    :param asunto: El asunto del correo
+    :param cuerpo: El contenido del correo en texto plano
+    :param html: El contenido del correo en formato HTML
+    :param destinatarios: Las direcciones de correo de los destinatarios
+    :type asunto: string
+    :type cuerpo: string
+    :type html: string
+    :type destinatarios: [string]
+
+    |
+    """
+    destinatarios = list(destinatarios)
+    if destinatarios:
+        Correo.objects.create(asunto=asunto, cuerpo=cuerpo, html=html, destinatarios=destinatarios)
+
+
+def enviar_correos_pendientes(lote=100):
+    """
+    Envía un lote de correos pendientes de la bandeja de salida utilizando una
+    sola conexión al servidor de correo. El lote se reserva en una transacción
+    breve, de modo que la conexión al servidor no mantiene bloqueadas las
+    filas, y el resultado de los envíos se guarda antes de cerrar la conexión.
+    Los correos cuyo envío falla se vuelven a intentar luego de 2, 4, 8...
+    minutos, hasta un máximo de ``Correo.MAX_INTENTOS`` intentos. Retorna el
+    número de correos enviados y el número de correos fallidos.
+
+    **Fecha:** 18/10/26
+
+    **Artefacto:** módulo de desarrollo
+
+    :param lote: El número máximo de correos que se enviarán
+    :type lote: int
+
+    |
+    """
+    enviados = fallidos = 0
+    with transaction.atomic():
+        correos = list(Correo.objects.select_for_update(skip_locked=True)
+                       .filter(fecha_envio__isnull=True, intentos__lt=Correo.MAX_INTENTOS,
+                               proximo_intento__lte=timezone.now())
+                       .order_by('proximo_intento')[:lote])
+        if not correos:
+            return enviados, fallidos
+        # reserva el lote para que otros procesos no lo envíen
+        Correo.objects.filter(id__in=[correo.id for correo in correos]).update(
+            proximo_intento=timezone.now() + datetime.timedelta(minutes=Correo.MINUTOS_RESERVA))
+
+    conexion = get_connection(fail_silently=False)
+    try:
+        try:
+            conexion.open()
+        except Exception as e:
+            error = e
+        else:
+            error = None
+
+        for correo in correos:
+            if not error:
+                mensaje = EmailMultiAlternatives(correo.asunto, correo.cuerpo, None,
+                                                 correo.destinatarios, connection=conexion)
+                if correo.html:
+                    mensaje.attach_alternative(correo.html, 'text/html')
+                try:
+                    mensaje.send()
+                except Exception as e:
+                    correo.error = str(e)
+                else:
+                    correo.fecha_envio = timezone.now()
+                    correo.error = ''
+                    enviados += 1
+                    continue
+            else:
+                correo.error = str(error)
+            correo.intentos += 1
+            correo.proximo_intento = timezone.now() + datetime.timedelta(minutes=2 ** correo.intentos)
+            fallidos += 1
+
+        Correo.objects.bulk_update(correos, ['fecha_envio', 'proximo_intento', 'intentos', 'error'])
+    finally:
+        conexion.close()
+    return enviados, fallidos
+
+
+def calcular_burndown(sprint):
+    """
+    Calcula las series del burndown chart de un sprint y las retorna en un
+    diccionario con las listas fechas, ideal, incremento y restante.
+
+    Obtiene las horas trabajadas de todo el sprint a partir de sus avances
+    diarios y construye las series en memoria, por lo que el número de
+    consultas no depende de la duración del sprint. Solo los incrementos
+    posteriores al último avance se agrupan por fecha; los días anteriores
+    sin avance se regeneran con el comando ``reconstruiravances``.
+
+    **Fecha:** 18/10/26
+
+    **Artefacto:** módulo de desarrollo
+
+    :param sprint: El sprint cuyo burndown chart se va a calcular
+    :type sprint: Sprint
+
+    |
+    """
+    costo = sprint.costo_backlog
+    hoy = timezone.localdate()
+    chart = {'fechas': [], 'ideal': [], 'incremento': [0], 'restante': [costo]}
+
+    # agrega las fechas planeadas del sprint
+    duracion = ((sprint.fecha_fin_original if sprint.fecha_fin_original else sprint.fecha_fin)
+                - sprint.fecha_inicio).days + 1
+    for dias in range(duracion + 1):
+        fecha = sprint.fecha_inicio + datetime.timedelta(days=dias-1)
+        chart['fechas'].append(str(fecha))
+        chart['ideal'].append(costo * (1 - dias / duracion))
+
+    # agrega las fechas luego del final planeado del sprint
+    if sprint.estado != Sprint.Estado.PENDIENTE:
+        fecha_fin = hoy if sprint.estado == Sprint.Estado.INICIADO else sprint.fecha_fin
+        for dias in range((fecha_fin - sprint.fecha_fin).days):
+            fecha = sprint.fecha_fin + datetime.timedelta(days=dias + 1)
+            chart['fechas'].append(str(fecha))
+
+    # obtiene las horas trabajadas en cada día a partir de los avances del
+    # sprint, y agrupa los incrementos posteriores al último avance
+    horas = dict(sprint.avancesprint_set.values_list('fecha', 'horas_trabajadas'))
+    incrementos = Incremento.objects.filter(user_story__sprint=sprint)
+    if horas:
+        incrementos = incrementos.filter(fecha__gt=max(horas))
+    horas.update(incrementos.values('fecha').annotate(total=Sum('horas')).values_list('fecha', 'total'))
+
+    # calcula las horas restantes en cada día
+    anterior = costo
+    for dias in range(len(chart['fechas'])):
+        fecha = sprint.fecha_inicio + datetime.timedelta(days=dias)
+        incremento = int(horas.get(fecha) or 0)
+        chart['incremento'].append(incremento)
+        anterior = anterior - incremento
+        if fecha > hoy:
+            break
+        chart['restante'].append(anterior if anterior > 0 else 0)
+
+    return chart
+
+
+def cargar_tablero(sprint, usuario, gestion):
+    """
+    Obtiene los datos del tablero kanban de un usuario en un sprint: la matriz
+    de user stories, con una columna por estado, y las horas que el usuario
+    trabajó hoy. Utiliza un número fijo de consultas sin importar el tamaño
+    del sprint backlog.
+
+    **Fecha:** 18/10/26
+
+    **Artefacto:** módulo de desarrollo
+
+    :param sprint: El sprint activo del proyecto
+    :param usuario: El usuario que accede al tablero
+    :param gestion: Indica si el usuario tiene permisos de gestión de proyecto
+    :type sprint: Sprint
+    :type usuario: User
+    :type gestion: bool
+
+    |
+    """
+    # calcula las horas trabajadas y disponibles
+    participa = sprint.participasprint_set.filter(usuario=usuario).first()
+    horas = {}
+    asignados = []
+    if participa:
+        asignados = list(participa.user_stories.all())
+        trabajadas = Incremento.objects.filter(user_story__participasprint=participa, usuario=usuario,
+                                               fecha=timezone.localdate()).aggregate(Sum('horas'))['horas__sum']
+        horas['trabajadas'] = trabajadas or 0
+        horas['disponibles'] = participa.horas_diarias
+        horas['porcentaje'] = round(100 * horas['trabajadas'] / horas['disponibles']) \
+            if horas['disponibles'] else 0
+
+    # obtiene matriz de user stories
+    tablero = {estado: [] for estado in UserStory.Estado.values}
+
+    # si el usuario tiene permisos de gestion, muestra todas las user stories
+    if gestion:
+        ids = {us.id for us in asignados}
+        for user_story in sprint.sprint_backlog.all():
+            user_story.asignado = user_story.id in ids
+            tablero[str(user_story.estado)].append(user_story)
+
+    # si no, muestra los user stories que tiene asignado
+    else:
+        for user_story in asignados:
+            tablero[str(user_story.estado)].append(user_story)
+
+    # ordena las user stories en filas
+    count = max(len(lista) for lista in tablero.values())
+    for lista in tablero.values():
+        lista.extend([None] * (count - len(lista)))
+    return [*zip(*tablero.values())], horas
+
+
+def codificar_cursor(fila):
+    """Retorna un cursor que identifica la posición de una fila dentro de una
+    consulta ordenada por fecha e id."""
+    fecha = fila.fecha.astimezone(datetime.timezone.utc).strftime('%Y%m%d%H%M%S%f')
+    return '%s-%d' % (fecha, fila.id)
+
+
+def decodificar_cursor(cursor):
+    """Retorna la fecha y el id que identifica un cursor, o None si este no es
+    válido."""
+    try:
+        fecha, pk = cursor.split('-')
+        return datetime.datetime.strptime(fecha, '%Y%m%d%H%M%S%f').replace(tzinfo=datetime.timezone.utc), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+def paginar_por_cursor(consulta, despues=None, antes=None, cantidad=50):
+    """
+    Obtiene una página de una consulta ordenada por fecha e id. En lugar de
+    contar las filas y saltar las anteriores, cada página se ubica a partir
+    del cursor de la última fila de la página anterior, por lo que el costo
+    de obtener una página no depende de su posición.
+
+    **Fecha:** 18/10/26
+
+    **Artefacto:** módulo de proyecto
+
+    :param consulta: La consulta que será paginada
+    :param despues: El cursor a partir del cual se obtiene la página
+    :param antes: El cursor hasta el cual se obtiene la página
+    :param cantidad: La cantidad máxima de filas por página
+    :type consulta: QuerySet
+    :type despues: string
+    :type antes: string
+    :type cantidad: int
+    :return: Las filas de la página, y los cursores de la página anterior y de
+        la siguiente, o None si estas no existen
+
+    |
+    """
+    antes, despues = decodificar_cursor(antes), decodificar_cursor(despues)
+    if antes:
+        filas = list(consulta.filter(Q(fecha__lt=antes[0]) | Q(fecha=antes[0], id__lt=antes[1]))
+                     .order_by('-fecha', '-id')[:cantidad + 1])
+        hay_anterior, hay_siguiente = len(filas) > cantidad, True
+        filas = filas[:cantidad][::-1]
+    else:
+        if despues:
+            consulta = consulta.filter(Q(fecha__gt=despues[0]) | Q(fecha=despues[0], id__gt=despues[1]))
+        filas = list(consulta.order_by('fecha', 'id')[:cantidad + 1])
+        hay_anterior, hay_siguiente = despues is not None, len(filas) > cantidad
+        filas = filas[:cantidad]
+    if not filas:
+        return filas, None, None
+    return (filas, codificar_cursor(filas[0]) if hay_anterior else None,
+            codificar_cursor(filas[-1]) if hay_siguiente else None)
+
+
+class Eco:
+    """Objeto con la interfaz de un archivo, que retorna lo que se le escribe
+    en lugar de almacenarlo."""
+
+    def write(self, valor):
+        return valor
+
+
+def respuesta_csv(nombre_archivo, encabezado, filas):
+    """
+    Genera una respuesta que transmite un archivo CSV a medida que se recorren
+    las filas, sin almacenar el archivo completo en memoria.
+
+    **Fecha:** 18/10/26
+
+    **Artefacto:** módulo de proyecto
+
+    :param nombre_archivo: El nombre con el que se descarga el archivo
+    :param encabezado: Los nombres de las columnas
+    :param filas: Un iterable con las filas del archivo
+    :type nombre_archivo: string
+    :type encabezado: list
+    :type filas: iterable
+
+    |
+    """
+    escritor = csv.writer(Eco())
+    response = StreamingHttpResponse((escritor.writerow(fila) for fila in itertools.chain([encabezado], filas)),
+                                     content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename=' + nombre_archivo
+    return response
+
+
+def respuesta_ndjson(nombre_archivo, filas):
+    """
+    Genera una respuesta que transmite un archivo JSON delimitado por líneas,
+    con un objeto por línea, a medida que se recorren las filas.
+
+    **Fecha:** 18/10/26
+
+    **Artefacto:** módulo de desarrollo
+
+    :param nombre_archivo: El nombre con el que se descarga el archivo
+    :param filas: Un iterable de diccionarios, uno por línea
+    :type nombre_archivo: string
+    :type filas: iterable
+
+    |
+    """
+    codificador = DjangoJSONEncoder(ensure_ascii=False)
+    response = StreamingHttpResponse((codificador.encode(fila) + '\n' for fila in filas),
+                                     content_type='application/x-ndjson; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename=' + nombre_archivo
+    return response
+
+
+def exportar_consulta(consulta, columnas, nombre_archivo, formato):
+    """
+    Genera una respuesta que transmite las filas de una consulta en formato
+    CSV o JSON delimitado por líneas. Las filas se leen de la base de datos
+    por bloques con ``iterator()``, por lo que la memoria utilizada no depende
+    de la cantidad de filas.
+
+    **Fecha:** 18/10/26
+
+    **Artefacto:** módulo de desarrollo
+
+    :param consulta: La consulta cuyas filas se exportan
+    :param columnas: Una lista de tuplas con el campo de la consulta, el nombre
+        de la columna y, opcionalmente, las opciones con las que se muestra el
+        valor del campo
+    :param nombre_archivo: El nombre del archivo sin extensión
+    :param formato: El formato del archivo, 'csv' o 'json'
+    :type consulta: QuerySet
+    :type columnas: list
+    :type nombre_archivo: string
+    :type formato: string
+
+    |
+    """
+    if formato not in ('csv', 'json'):
+        raise Http404('Formato de exportación desconocido')
+    nombres = [columna[1] for columna in columnas]
+    opciones = [dict(columna[2]) if len(columna) > 2 else None for columna in columnas]
+    filas = ([o.get(valor, valor) if o else valor for o, valor in zip(opciones, fila)]
+             for fila in consulta.values_list(*[columna[0] for columna in columnas]).iterator(chunk_size=2000))
+    if formato == 'csv':
+        return respuesta_csv(nombre_archivo + '.csv', nombres, filas)
+    return respuesta_ndjson(nombre_archivo + '.ndjson', (dict(zip(nombres, fila)) for fila in filas))
+
+
+def generar_pdf(template_src, context):
+    """
+    Renderiza una plantilla y la convierte a un documento PDF, retornando su
+    contenido.
+
+    **Fecha:** 18/10/26
 
     **Artefacto:** módulo de desarrollo
 
-    :param request: La solicitud para la cual se generará una respuesta
     :param template_src: El nombre de la plantilla que será renderizada
     :param context: El contexto que será pasado a la plantilla
-    :type request: Request
     :type template_src: string
     :type context: dict
 
     |
     """
-    if context is None:
-        context = {}
-    else:
-        context['request'] = request
-        if not context.get('pagesize'):
-            context['pagesize'] = 'A4'
+    if not context.get('pagesize'):
+        context['pagesize'] = 'A4'
     template = get_template(template_src)
     html = template.render(context)
     result = BytesIO()
     pdf = pisa.pisaDocument(BytesIO(html.encode("utf-8")), result)
     if pdf.err:
         raise Exception("Ocurrió un error generando el PDF del reporte")
-    response = HttpResponse(result.getvalue(), content_type='application/pdf')
-    if context.get('filename'):
-        response['Content-Disposition'] = 'filename='+context['filename']
-    return response
+    return result.getvalue()
+
+
+def generar_reporte(reporte_id):
+    """
+    Genera el PDF de un reporte pendiente y lo almacena. El reporte se
+    bloquea mientras se genera, de modo que otro proceso no lo genere al
+    mismo tiempo. Una vez generado, elimina las versiones anteriores del
+    mismo reporte que ya no estén pendientes. Es ejecutada por el comando
+    ``generarreportes``.
+
+    **Fecha:** 18/10/26
+
+    **Artefacto:** módulo de desarrollo
+
+    :param reporte_id: El identificador del reporte que será generado
+    :type reporte_id: int
+
+    |
+    """
+    with transaction.atomic():
+        # omite el reporte si ya fue generado o si otro proceso lo está generando
+        reporte = Reporte.objects.select_for_update(skip_locked=True, of=('self',)) \
+            .select_related('proyecto', 'sprint', 'usuario') \
+            .filter(pk=reporte_id, estado=Reporte.Estado.PENDIENTE).first()
+        if reporte is None:
+            return
+        plantilla, contexto = reporte.obtener_contexto()
+        try:
+            pdf = generar_pdf(plantilla, contexto)
+        except Exception as e:
+            reporte.estado = Reporte.Estado.ERROR
+            reporte.error = str(e)
+            reporte.save()
+            return
+
+        reporte.archivo.save('%s-%d-%s.pdf' % (reporte.get_tipo_display(), reporte.proyecto_id, reporte.version),
+                             ContentFile(pdf), save=False)
+        reporte.estado = Reporte.Estado.GENERADO
+        reporte.fecha_generacion = timezone.now()
+        reporte.save()
+
+    # solo elimina las versiones anteriores ya procesadas, ya que las versiones
+    # pendientes pueden estar siendo generadas por otro proceso
+    for anterior in Reporte.objects.filter(tipo=reporte.tipo, proyecto=reporte.proyecto_id, sprint=reporte.sprint_id,
+                                           fecha_creacion__lt=reporte.fecha_creacion) \
+            .exclude(estado=Reporte.Estado.PENDIENTE):
+        anterior.archivo.delete(save=False)
+        anterior.delete()
+
+
+def obtener_reporte(request, tipo, proyecto, sprint=None):
+    """
+    Retorna el PDF de un reporte si este ya fue generado para la versión
+    actual de sus datos. Si no, lo agrega a la cola de reportes pendientes y
+    muestra una página que se actualiza hasta que el reporte esté listo.
+
+    **Fecha:** 18/10/26
+
+    **Artefacto:** módulo de desarrollo
+
+    :param request: La solicitud para la cual se generará una respuesta
+    :param tipo: El tipo de reporte solicitado
+    :param proyecto: El proyecto del reporte
+    :param sprint: El sprint del reporte, si corresponde
+    :type request: Request
+    :type tipo: Reporte.Tipo
+    :type proyecto: Proyecto
+    :type sprint: Sprint
+
+    |
+    """
+    version = Reporte.calcular_version(tipo, proyecto, sprint)
+    usuario = request.user if request.user.is_authenticated else None
+    reporte, _ = Reporte.objects.get_or_create(tipo=tipo, proyecto=proyecto, sprint=sprint, version=version,
+                                               defaults={'usuario': usuario})
+
+    if reporte.estado == Reporte.Estado.GENERADO:
+        response = FileResponse(reporte.archivo.open('rb'), content_type='application/pdf')
+        response['Content-Disposition'] = 'filename=Reporte - ' + reporte.get_tipo_display()
+        return response
+
+    # si el reporte falló, vuelve a intentar generarlo
+    if reporte.estado == Reporte.Estado.ERROR:
+        reporte.estado = Reporte.Estado.PENDIENTE
+        reporte.save()
+
+    return render(request, 'sgp/reporte-pendiente.html', {'proyecto': proyecto, 'reporte': reporte}, status=202)
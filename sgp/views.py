@@ -7,23 +7,36 @@ archivo ``urls.py``.
 
 A continuación se documentan todas las vistas de la aplicación SGP.
 """
-import datetime
 import json
 
-from django.db.models import Sum
+from django.contrib.auth import authenticate, login, logout
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery
 from django.forms import modelformset_factory
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
 from django.shortcuts import render
-from django.http import HttpResponse, HttpResponseRedirect
-from django.contrib.auth import authenticate, login, logout
 from django.urls import reverse
 from django.utils import timezone
-from guardian.shortcuts import get_objects_for_user
 
-from .models import User, Proyecto, Role, Sprint, UserStory, Incremento, Modificacion
+from .models import User, Proyecto, Role, Sprint, UserStory, Incremento, Modificacion, Reporte, ParticipaSprint
 from .forms import ProyectoForm, UserForm, RoleForm, UserRoleForm, AgregarMiembroForm, UploadFileForm, SprintForm, \
     UserStoryForm, ComentarioForm, AgregarUserStoryForm, AgregarDesarrolladorForm, UserSprintForm, BacklogForm, \
-    SprintReviewForm
-from .utils import render_to_pdf, enviar_notificacion
+    BacklogFormSet, UserSprintFormSet, SprintReviewForm, FiltroHistorialForm, ListadoFormSet, UserFormSet, \
+    UserRoleFormSet, ImportarMiembrosForm
+from .utils import enviar_notificacion, calcular_burndown, obtener_reporte, cargar_tablero, paginar_por_cursor, \
+    respuesta_csv, exportar_consulta
+
+COLUMNAS_USER_STORY = [
+    ('numero', 'numero'),
+    ('nombre', 'nombre'),
+    ('descripcion', 'descripcion'),
+    ('prioridad', 'prioridad', UserStory._meta.get_field('prioridad').choices),
+    ('estado', 'estado', UserStory.Estado.choices),
+    ('horas_estimadas', 'horas_estimadas'),
+    ('horas_trabajadas', 'horas_trabajadas'),
+]
+"""Columnas de los user stories en las exportaciones de los backlogs."""
 
 
 def index(request):
@@ -33,10 +46,11 @@ def index(request):
     Para usuarios que no han iniciado sesión, da una bienvenida al sistema y
     muestra un botón de acceso con Google.
 
-    Para usuarios que ya accedieron al sistema, muestra la lista de proyectos a
-    los que estos pertenecen. Si el usuario cuenta con el permiso de creación
-    de proyectos, presenta una opción para crear uno. Si el usuario cuenta con
-    el permiso de administración de usuarios, presenta una opción para hacerlo.
+    Para usuarios que ya accedieron al sistema, muestra la lista paginada de
+    proyectos a los que estos pertenecen, la cual puede filtrarse por estado.
+    Si el usuario cuenta con el permiso de creación de proyectos, presenta una
+    opción para crear uno. Si el usuario cuenta con el permiso de
+    administración de usuarios, presenta una opción para hacerlo.
 
     **Fecha:** 15/08/21
 
@@ -46,7 +60,10 @@ def index(request):
     """
     context = None
     if request.user.is_authenticated:
-        context = {'proyectos': get_objects_for_user(request.user, 'sgp.vista').order_by('fecha_creacion')}
+        estado = request.GET.get('estado')
+        proyectos = Proyecto.objects.visibles(request.user, estado).order_by('fecha_creacion', 'id')
+        pagina = Paginator(proyectos, 20).get_page(request.GET.get('pagina'))
+        context = {'proyectos': pagina, 'estado': estado, 'estados': Proyecto.Estado.choices}
     return render(request, 'sgp/index.html', context)
 
 
@@ -91,7 +108,8 @@ def logout_view(request):
 def administrar(request):
     """
     Permite administrar los permisos de los usuarios registrados y eliminarlos
-    de la base de datos si es necesario.
+    de la base de datos si es necesario. Los usuarios se muestran paginados y
+    pueden buscarse por nombre, apellido o correo electrónico.
 
     **Fecha:** 24/08/21
 
@@ -99,18 +117,26 @@ def administrar(request):
 
     |
     """
-    UserFormSet = modelformset_factory(User, form=UserForm, extra=0, can_delete=True)
+    UsuariosFormSet = modelformset_factory(User, form=UserForm, formset=UserFormSet, extra=0, can_delete=True)
+    busqueda = request.GET.get('q', '').strip()
+    pagina = None
     if request.method == 'POST':
-        formset = UserFormSet(request.POST)
+        formset = UsuariosFormSet(request.POST)
         if formset.is_valid():
-            formset.save()
+            with transaction.atomic():
+                formset.save()
             for form in formset:
                 if form.cleaned_data.get('DELETE'):
                     return HttpResponseRedirect(reverse('sgp:administrar'))
             return HttpResponseRedirect(reverse('sgp:index'))
     else:
-        formset = UserFormSet(queryset=User.objects.exclude(user_id='AnonymousUser').order_by('fecha_registro'))
-    return render(request, 'sgp/administrar.html', {'formset': formset})
+        usuarios = User.objects.exclude(user_id='AnonymousUser').order_by('fecha_registro', 'user_id')
+        for palabra in busqueda.split():
+            usuarios = usuarios.filter(Q(nombre__icontains=palabra) | Q(apellido__icontains=palabra) |
+                                       Q(email__icontains=palabra))
+        pagina = Paginator(usuarios, 50).get_page(request.GET.get('pagina'))
+        formset = UsuariosFormSet(queryset=pagina.object_list)
+    return render(request, 'sgp/administrar.html', {'formset': formset, 'pagina': pagina, 'busqueda': busqueda})
 
 
 def crear_proyecto(request):
@@ -238,11 +264,12 @@ def administrar_roles(request, proyecto_id):
     """
     proyecto = Proyecto.objects.get(pk=proyecto_id)
     rol = Role.objects.get(proyecto=proyecto, participa__usuario=request.user)
-    RoleFormSet = modelformset_factory(Role, form=RoleForm, extra=0, can_delete=True)
+    RoleFormSet = modelformset_factory(Role, form=RoleForm, formset=ListadoFormSet, extra=0, can_delete=True)
+    roles = Role.objects.filter(proyecto=proyecto).prefetch_related('permisos')
 
     # Si el request es de tipo POST, procesar los roles recibidos
     if request.method == 'POST':
-        formset = RoleFormSet(request.POST, form_kwargs={'rol_actual': rol})
+        formset = RoleFormSet(request.POST, queryset=roles, form_kwargs={'rol_actual': rol})
 
         # Si uno de los roles es nuevo, apuntarlo al proyecto actual
         for form in formset:
@@ -251,14 +278,14 @@ def administrar_roles(request, proyecto_id):
 
         # Guardar los roles
         if formset.is_valid():
-            formset.save()
-            Modificacion.objects.create(usuario=request.user, proyecto=proyecto, accion='Editar roles')
+            with transaction.atomic():
+                formset.save()
+                Modificacion.objects.create(usuario=request.user, proyecto=proyecto, accion='Editar roles')
             return HttpResponseRedirect(reverse('sgp:mostrar_proyecto', kwargs={'proyecto_id': proyecto_id}))
 
     # Si el request es de tipo GET, enviar una lista de roles
     else:
-        formset = RoleFormSet(queryset=Role.objects.filter(proyecto=proyecto_id),
-                              form_kwargs={'rol_actual': rol})
+        formset = RoleFormSet(queryset=roles, form_kwargs={'rol_actual': rol})
 
     return render(request, 'sgp/proyecto-roles.html',
                   {'proyecto': proyecto, 'formset': formset, 'rol': rol, 'file_form': UploadFileForm()})
@@ -300,7 +327,7 @@ def exportar_roles(request, proyecto_id):
     |
     """
     roles = []
-    for instance in Role.objects.filter(proyecto=proyecto_id):
+    for instance in Role.objects.filter(proyecto=proyecto_id).prefetch_related('permisos'):
         rol = dict()
         rol['nombre'] = instance.nombre
         perms = []
@@ -324,7 +351,8 @@ def administrar_equipo(request, proyecto_id):
 
     Utiliza un formset con instancias de UserRoleForm para la lista de usuarios
     que pertenecen al proyecto y una instancia de AgregarMiembroForm para los
-    usuarios que no pertenecen.
+    usuarios que no pertenecen. Además, una instancia de ImportarMiembrosForm
+    permite agregar varios usuarios a la vez desde un archivo CSV.
 
     **Fecha:** 18/09/21
 
@@ -334,7 +362,9 @@ def administrar_equipo(request, proyecto_id):
     """
     proyecto = Proyecto.objects.get(pk=proyecto_id)
     usuario = request.user
-    UserRoleFormSet = modelformset_factory(User, form=UserRoleForm, extra=0, can_delete=True)
+    MiembrosFormSet = modelformset_factory(User, form=UserRoleForm, formset=UserRoleFormSet, extra=0)
+    miembros = User.objects.filter(participa__proyecto=proyecto_id).order_by('participa__rol', 'user_id')
+    form_kwargs = {'usuario_actual': usuario, 'proyecto_actual': proyecto}
 
     # Si se agregó un nuevo miembro al equipo, registrarlo
     if 'agregar_usuario' in request.POST:
@@ -347,33 +377,46 @@ def administrar_equipo(request, proyecto_id):
     else:
         lista = AgregarMiembroForm(proyecto=proyecto)
 
+    # Si se subió un archivo con miembros nuevos, agregarlos en bloque
+    if 'importar_miembros' in request.POST:
+        importar = ImportarMiembrosForm(request.POST, request.FILES, proyecto=proyecto)
+        if importar.is_valid():
+            with transaction.atomic():
+                cantidad = importar.save()
+                Modificacion.objects.create(usuario=request.user, proyecto=proyecto,
+                                            accion='Agregar %d miembros al equipo' % cantidad)
+            return HttpResponseRedirect(reverse('sgp:administrar_equipo',
+                                                kwargs={'proyecto_id': proyecto_id}))
+    else:
+        importar = ImportarMiembrosForm(proyecto=proyecto)
+
     # Si se modificaron los roles de los miembros, procesar los cambios
     if 'asignar_roles' in request.POST:
-        formset = UserRoleFormSet(request.POST,
-                                  form_kwargs={'usuario_actual': usuario, 'proyecto_actual': proyecto})
+        formset = MiembrosFormSet(request.POST, queryset=miembros, form_kwargs=form_kwargs)
         if formset.is_valid():
-            formset.save()
+            with transaction.atomic():
+                formset.save()
 
-            # Si se eliminó a un usuario del equipo, mostrar de nuevo la pagina
-            for form in formset:
-                if form.cleaned_data.get('borrar'):
+                # Si se eliminó a un usuario del equipo, mostrar de nuevo la pagina
+                if formset.quitados:
                     Modificacion.objects.create(usuario=request.user, proyecto=proyecto,
                                                 accion='Eliminar miembro del equipo')
-                    return HttpResponseRedirect(reverse('sgp:administrar_equipo',
-                                                        kwargs={'proyecto_id': proyecto.id}))
+                else:
+                    Modificacion.objects.create(usuario=request.user, proyecto=proyecto,
+                                                accion='Modificar roles del equipo')
+            if formset.quitados:
+                return HttpResponseRedirect(reverse('sgp:administrar_equipo',
+                                                    kwargs={'proyecto_id': proyecto.id}))
 
             # Si solo se cambiaron los roles, volver a la pagina de proyecto
-            Modificacion.objects.create(usuario=request.user, proyecto=proyecto, accion='Modificar roles del equipo')
             return HttpResponseRedirect(reverse('sgp:mostrar_proyecto',
                                                 kwargs={'proyecto_id': proyecto_id}))
-
-    # Enviar una lista de miembros
-    formset = UserRoleFormSet(
-        queryset=User.objects.filter(participa__proyecto=proyecto_id).order_by('participa__rol'),
-        form_kwargs={'usuario_actual': usuario, 'proyecto_actual': proyecto})
+    else:
+        # Enviar una lista de miembros
+        formset = MiembrosFormSet(queryset=miembros, form_kwargs=form_kwargs)
 
     return render(request, 'sgp/proyecto-equipo.html',
-                  {'proyecto': proyecto, 'formset': formset, 'usuario': usuario, 'lista': lista})
+                  {'proyecto': proyecto, 'formset': formset, 'usuario': usuario, 'lista': lista, 'importar': importar})
 
 
 def product_backlog(request, proyecto_id):
@@ -395,7 +438,7 @@ def product_backlog(request, proyecto_id):
     backlog = dict()
 
     backlog['activo'] = proyecto.product_backlog.exclude(estado=UserStory.Estado.CANCELADO).order_by('prioridad')
-    if request.user.has_perm('gestionar_proyecto', proyecto) or request.user.has_perm('pila_producto', proyecto):
+    if request.proyecto_perms & {'gestionar_proyecto', 'pila_producto'}:
         backlog['cancelado'] = proyecto.product_backlog.filter(estado=UserStory.Estado.CANCELADO)
 
     context = {'proyecto': proyecto, 'backlog': backlog}
@@ -536,7 +579,7 @@ def mostrar_sprint(request, proyecto_id, sprint_id):
     |
     """
     proyecto = Proyecto.objects.get(pk=proyecto_id)
-    sprint = Sprint.objects.get(id=sprint_id)
+    sprint = Sprint.objects.con_capacidad().get(id=sprint_id)
     mensajes = None
     form = None
 
@@ -624,7 +667,8 @@ def equipo_sprint(request, proyecto_id, sprint_id):
 
     Utiliza un formset con instancias de UserSprintForm para la lista de
     usuarios que pertenecen al sprint y una instancia de
-    AgregarDesarrolladorForm para los usuarios que no pertenecen.
+    AgregarDesarrolladorForm para los usuarios que no pertenecen. Ambos
+    comparten las participaciones del sprint, que se consultan una sola vez.
 
     **Fecha:** 30/09/21
 
@@ -633,20 +677,22 @@ def equipo_sprint(request, proyecto_id, sprint_id):
     |
     """
     proyecto = Proyecto.objects.get(id=proyecto_id)
-    sprint = Sprint.objects.get(id=sprint_id)
-    UserSprintFormSet = modelformset_factory(User, form=UserSprintForm, extra=0, can_delete=True)
+    sprint = Sprint.objects.con_capacidad().get(id=sprint_id)
+    EquipoSprintFormSet = modelformset_factory(User, form=UserSprintForm, formset=UserSprintFormSet,
+                                               extra=0, can_delete=True)
+    participantes = sprint.cargar_participantes()
 
     if 'agregar_usuario' in request.POST:
-        form = AgregarDesarrolladorForm(request.POST, proyecto=proyecto, sprint=sprint)
+        form = AgregarDesarrolladorForm(request.POST, proyecto=proyecto, sprint=sprint, participantes=participantes)
         if form.is_valid():
             form.save()
             return HttpResponseRedirect(
                 reverse('sgp:equipo_sprint', kwargs={'proyecto_id': proyecto_id, 'sprint_id': sprint_id}))
     else:
-        form = AgregarDesarrolladorForm(proyecto=proyecto, sprint=sprint)
+        form = AgregarDesarrolladorForm(proyecto=proyecto, sprint=sprint, participantes=participantes)
 
     if 'editar_usuarios' in request.POST:
-        formset = UserSprintFormSet(request.POST, form_kwargs={'sprint': sprint})
+        formset = EquipoSprintFormSet(request.POST, form_kwargs={'sprint': sprint, 'participantes': participantes})
         if formset.is_valid():
             formset.save()
 
@@ -659,7 +705,7 @@ def equipo_sprint(request, proyecto_id, sprint_id):
                 reverse('sgp:mostrar_sprint', kwargs={'proyecto_id': proyecto_id, 'sprint_id': sprint_id}))
 
     else:
-        formset = UserSprintFormSet(queryset=sprint.equipo.all(), form_kwargs={'sprint': sprint})
+        formset = EquipoSprintFormSet(form_kwargs={'sprint': sprint, 'participantes': participantes})
 
     return render(request, 'sgp/sprint-equipo.html',
                   {'proyecto': proyecto, 'sprint': sprint, 'formset': formset, 'form': form})
@@ -674,6 +720,10 @@ def sprint_backlog(request, proyecto_id, sprint_id):
     permite quitar sprints o agregarlos al backlog mediante una instancia de
     AgregarUserStoryForm.
 
+    El formset BacklogFormSet consulta el equipo y los desarrolladores
+    asignados una sola vez para todos los user stories, y guarda los cambios
+    en bloque.
+
     **Fecha:** 30/09/21
 
     **Artefacto:** módulo de desarrollo
@@ -681,8 +731,10 @@ def sprint_backlog(request, proyecto_id, sprint_id):
     |
     """
     proyecto = Proyecto.objects.get(id=proyecto_id)
-    sprint = Sprint.objects.get(id=sprint_id)
-    BacklogFormSet = modelformset_factory(UserStory, form=BacklogForm, extra=0, can_delete=True)
+    sprint = Sprint.objects.con_capacidad().get(id=sprint_id)
+    SprintBacklogFormSet = modelformset_factory(UserStory, form=BacklogForm, formset=BacklogFormSet,
+                                                extra=0, can_delete=True)
+    backlog = sprint.sprint_backlog.annotate(comentarios=Count('comentario')).order_by('prioridad')
 
     if 'agregar_user_story' in request.POST:
         form = AgregarUserStoryForm(request.POST, proyecto=proyecto, sprint=sprint)
@@ -694,7 +746,8 @@ def sprint_backlog(request, proyecto_id, sprint_id):
         form = AgregarUserStoryForm(proyecto=proyecto, sprint=sprint)
 
     if 'editar_user_stories' in request.POST:
-        formset = BacklogFormSet(request.POST, form_kwargs={'proyecto': proyecto, 'sprint': sprint})
+        formset = SprintBacklogFormSet(request.POST, queryset=backlog,
+                                       form_kwargs={'proyecto': proyecto, 'sprint': sprint})
         if formset.is_valid():
             formset.save()
             if sprint.estado == Sprint.Estado.INICIADO:
@@ -708,8 +761,7 @@ def sprint_backlog(request, proyecto_id, sprint_id):
             return HttpResponseRedirect(
                 reverse('sgp:mostrar_sprint', kwargs={'proyecto_id': proyecto_id, 'sprint_id': sprint_id}))
     else:
-        formset = BacklogFormSet(queryset=sprint.sprint_backlog.all().order_by('prioridad'),
-                                 form_kwargs={'proyecto': proyecto, 'sprint': sprint})
+        formset = SprintBacklogFormSet(queryset=backlog, form_kwargs={'proyecto': proyecto, 'sprint': sprint})
 
     context = {'proyecto': proyecto, 'sprint': sprint, 'form': form, 'formset': formset}
     return render(request, 'sgp/sprint-backlog.html', context)
@@ -794,7 +846,7 @@ def kanban(request, proyecto_id):
                 return HttpResponse(status=400)
 
             # registra el incremento
-            Incremento.objects.create(user_story=user_story, usuario=request.user, horas=horas)
+            incremento = Incremento.objects.create(user_story=user_story, usuario=request.user, horas=horas)
 
             # actualiza la información del user story
             user_story.horas_trabajadas += horas
@@ -833,45 +885,19 @@ def kanban(request, proyecto_id):
                     user_story.estado = iniciado
             else:
                 return HttpResponse(status=405)
-            Incremento.objects.create(user_story=user_story, usuario=request.user, estado=user_story.estado)
+            incremento = Incremento.objects.create(user_story=user_story, usuario=request.user,
+                                                   estado=user_story.estado)
 
         user_story.save()
 
-        return HttpResponseRedirect(reverse('sgp:kanban', kwargs={'proyecto_id': proyecto.id}))
+        # actualiza el avance diario del sprint
+        if user_story.sprint:
+            user_story.sprint.registrar_avance(incremento.horas, incremento.fecha)
 
-    # calcula las horas trabajadas y disponibles.
-    participasprint = sprint.participasprint_set.filter(usuario=request.user).first()
-    horas = {}
-    if participasprint:
-        horas['trabajadas'] = 0
-        horas['disponibles'] = participasprint.horas_diarias
-        for incremento in Incremento.objects.filter(user_story__in=participasprint.user_stories.all(),
-                                                    usuario=request.user, fecha=timezone.localdate()):
-            horas['trabajadas'] += incremento.horas
-        horas['porcentaje'] = horas['trabajadas'] / horas['disponibles']
-
-    # obtiene matriz de user stories
-    tablero = dict()
-    for estado in UserStory.Estado.values:
-        tablero[estado] = []
-
-    # si el usuario tiene permisos de gestion, muestra todas las user stories
-    if request.user.has_perm('gestionar_proyecto', proyecto):
-        for user_story in sprint.sprint_backlog.all():
-            if participasprint and user_story in participasprint.user_stories.all():
-                user_story.asignado = True
-            tablero[str(user_story.estado)].append(user_story)
-
-    # si no, muestra los user stories que tiene asignado
-    else:
-        for user_story in sprint.participasprint_set.get(usuario=request.user).user_stories.all():
-            tablero[str(user_story.estado)].append(user_story)
+        return HttpResponseRedirect(reverse('sgp:kanban', kwargs={'proyecto_id': proyecto.id}))
 
-    # agrega ordena las user stories en filas
-    count = len(tablero[max(tablero, key=lambda e: len(tablero[e]))])
-    for estado, lista in tablero.items():
-        lista.extend([None for i in range(count-len(lista))])
-    tablero = [*zip(*tablero.values())]
+    # obtiene las user stories y las horas del usuario
+    tablero, horas = cargar_tablero(sprint, request.user, 'gestionar_proyecto' in request.proyecto_perms)
 
     context = {'proyecto': proyecto, 'sprint': sprint, 'horas': horas,
                'estados': UserStory.Estado.labels, 'tablero': tablero}
@@ -922,42 +948,25 @@ def burndown(request, proyecto_id, sprint_id):
     """
     proyecto = Proyecto.objects.get(id=proyecto_id)
     sprint = Sprint.objects.get(id=sprint_id)
+    context = {'proyecto': proyecto, 'sprint': sprint, 'chart': calcular_burndown(sprint)}
+    return render(request, 'sgp/sprint-burndown.html', context=context)
 
-    chart = {'fechas': [], 'ideal': [], 'incremento': [0], 'restante': [sprint.costo_backlog]}
-
-    # agrega las fechas planeadas del sprint
-    duracion = ((sprint.fecha_fin_original if sprint.fecha_fin_original else sprint.fecha_fin)
-                - sprint.fecha_inicio).days + 1
-    for dias in range(duracion + 1):
-        fecha = sprint.fecha_inicio + datetime.timedelta(days=dias-1)
-        chart['fechas'].append(str(fecha))
-        chart['ideal'].append(sprint.costo_backlog * (1 - dias / duracion))
-
-    # agrega las fechas luego del final planeado del sprint
-    if sprint.estado != Sprint.Estado.PENDIENTE:
-        fecha_fin = timezone.localdate() if sprint.estado == Sprint.Estado.INICIADO else sprint.fecha_fin
-        for dias in range((fecha_fin - sprint.fecha_fin).days):
-            fecha = sprint.fecha_fin + datetime.timedelta(days=dias + 1)
-            chart['fechas'].append(str(fecha))
-
-    # calcula las horas trabajadas en cada día
-    anterior = sprint.costo_backlog
-    for dias in range(len(chart['fechas'])):
-        fecha = sprint.fecha_inicio + datetime.timedelta(days=dias)
-        incremento = Incremento.objects.filter(user_story__sprint=sprint,
-                                               fecha=fecha).aggregate(Sum('horas'))['horas__sum']
-        incremento = (int(incremento) if incremento else 0)
-        chart['incremento'].append(incremento)
-        anterior = anterior - incremento
-        if fecha > timezone.localdate():
-            break
-        if anterior <= 0:
-            chart['restante'].append(0)
-        else:
-            chart['restante'].append(anterior)
 
-    context = {'proyecto': proyecto, 'sprint': sprint, 'chart': chart}
-    return render(request, 'sgp/sprint-burndown.html', context=context)
+def burndown_json(request, proyecto_id, sprint_id):
+    """
+    Retorna los datos del burndown chart del sprint en formato JSON.
+
+    Contiene las mismas series que la vista burndown: fechas, horas ideales,
+    horas trabajadas y horas restantes.
+
+    **Fecha:** 18/10/26
+
+    **Artefacto:** módulo de desarrollo
+
+    |
+    """
+    sprint = Sprint.objects.get(id=sprint_id, proyecto_id=proyecto_id)
+    return JsonResponse(calcular_burndown(sprint))
 
 
 def reporte_proyecto(request, proyecto_id):
@@ -974,9 +983,7 @@ def reporte_proyecto(request, proyecto_id):
     |
     """
     proyecto = Proyecto.objects.get(id=proyecto_id)
-    context = {'proyecto': proyecto,
-               'filename': 'Reporte - Product Backlog'}
-    return render_to_pdf(request, 'sgp/reporte-product-backlog.html', context=context)
+    return obtener_reporte(request, Reporte.Tipo.PRODUCT_BACKLOG, proyecto)
 
 
 def reporte_sprint(request, proyecto_id, sprint_id):
@@ -985,7 +992,8 @@ def reporte_sprint(request, proyecto_id, sprint_id):
 
     Muestra todos los user stories del sprint backlog agrupados en secciones
     según su estado e incluye las horas trabajadas, las horas planificadas, y
-    el usuario asginado a cada uno.
+    el usuario asginado a cada uno. Si el sprint tiene avances registrados,
+    incluye un resumen del último de ellos.
 
     **Fecha:** 02/12/21
 
@@ -995,15 +1003,7 @@ def reporte_sprint(request, proyecto_id, sprint_id):
     """
     proyecto = Proyecto.objects.get(id=proyecto_id)
     sprint = Sprint.objects.get(id=sprint_id)
-
-    backlog = {'terminados': sprint.sprint_backlog.filter(estado=UserStory.Estado.FINALIZADO),
-               'pendientes': sprint.sprint_backlog.filter(estado=UserStory.Estado.PENDIENTE),
-               'cancelados': sprint.sprint_backlog.filter(estado=UserStory.Estado.CANCELADO),
-               'por terminar': sprint.sprint_backlog.filter(
-                   estado__in=[UserStory.Estado.INICIADO, UserStory.Estado.FASE_DE_QA])}
-    context = {'proyecto': proyecto, 'sprint': sprint, 'backlog': backlog,
-               'filename': 'Reporte - Sprint Backlog'}
-    return render_to_pdf(request, 'sgp/reporte-sprint-backlog.html', context=context)
+    return obtener_reporte(request, Reporte.Tipo.SPRINT_BACKLOG, proyecto, sprint)
 
 
 def reporte_us_prioridad(request, proyecto_id):
@@ -1021,13 +1021,7 @@ def reporte_us_prioridad(request, proyecto_id):
     |
     """
     proyecto = Proyecto.objects.get(id=proyecto_id)
-    backlog = proyecto.sprint_activo.sprint_backlog.all().order_by('prioridad')
-    for user_story in backlog:
-        user_story.desarrollador = proyecto.sprint_activo.equipo.filter(
-            participasprint__user_stories__in=[user_story]).first().nombre_completo
-    context = {'proyecto': proyecto, 'backlog': backlog,
-               'filename': 'Reporte - US - Prioridad'}
-    return render_to_pdf(request, 'sgp/reporte-us-prioridad.html', context=context)
+    return obtener_reporte(request, Reporte.Tipo.US_PRIORIDAD, proyecto, proyecto.sprint_activo)
 
 
 def historial_modificaciones(request, proyecto_id):
@@ -1041,6 +1035,96 @@ def historial_modificaciones(request, proyecto_id):
     |
     """
     proyecto = Proyecto.objects.get(id=proyecto_id)
-    historial = Modificacion.objects.filter(proyecto=proyecto).order_by('fecha')
-    context = {'proyecto': proyecto, 'historial': historial}
+    form = FiltroHistorialForm(request.GET, proyecto=proyecto)
+    historial = form.filtrar(Modificacion.objects.filter(proyecto=proyecto).select_related('usuario'))
+    historial, anterior, siguiente = paginar_por_cursor(historial, despues=request.GET.get('despues'),
+                                                        antes=request.GET.get('antes'))
+    filtros = request.GET.copy()
+    filtros.pop('despues', None)
+    filtros.pop('antes', None)
+    context = {'proyecto': proyecto, 'historial': historial, 'form': form, 'filtros': filtros.urlencode(),
+               'anterior': anterior, 'siguiente': siguiente}
     return render(request, 'sgp/proyecto-historial.html', context)
+
+
+def exportar_historial(request, proyecto_id):
+    """
+    Permite exportar el historial de modificaciones del proyecto hacia un
+    archivo CSV, aplicando los mismos filtros que la página del historial. El
+    archivo se genera a medida que se recorre la consulta, por lo que su
+    tamaño no afecta la memoria del servidor.
+
+    **Fecha:** 18/10/26
+
+    **Artefacto:** módulo de proyecto
+
+    |
+    """
+    proyecto = Proyecto.objects.get(id=proyecto_id)
+    form = FiltroHistorialForm(request.GET, proyecto=proyecto)
+    historial = form.filtrar(Modificacion.objects.filter(proyecto=proyecto)).order_by('fecha', 'id') \
+        .values_list('fecha', 'usuario__nombre', 'usuario__apellido', 'usuario__email', 'accion')
+    filas = ((timezone.localtime(fecha).strftime('%d/%m/%Y %H:%M'),
+              ' '.join(filter(None, [nombre, apellido])), email or '', accion)
+             for fecha, nombre, apellido, email, accion in historial.iterator(chunk_size=2000))
+    return respuesta_csv('historial-proyecto-%d.csv' % proyecto.id, ['Fecha', 'Usuario', 'Correo', 'Acción'], filas)
+
+
+def exportar_product_backlog(request, proyecto_id, formato):
+    """
+    Permite exportar el product backlog del proyecto hacia un archivo CSV o
+    JSON delimitado por líneas, el cual se transmite a medida que se genera.
+
+    **Fecha:** 18/10/26
+
+    **Artefacto:** módulo de desarrollo
+
+    |
+    """
+    backlog = UserStory.objects.filter(proyecto_id=proyecto_id).order_by('numero')
+    if not request.proyecto_perms & {'gestionar_proyecto', 'pila_producto'}:
+        backlog = backlog.exclude(estado=UserStory.Estado.CANCELADO)
+    return exportar_consulta(backlog, COLUMNAS_USER_STORY + [('sprint__nombre', 'sprint')],
+                             'product-backlog-proyecto-%d' % proyecto_id, formato)
+
+
+def exportar_sprint_backlog(request, proyecto_id, sprint_id, formato):
+    """
+    Permite exportar el sprint backlog hacia un archivo CSV o JSON delimitado
+    por líneas, incluyendo el desarrollador asignado a cada user story.
+
+    **Fecha:** 18/10/26
+
+    **Artefacto:** módulo de desarrollo
+
+    |
+    """
+    desarrollador = ParticipaSprint.objects.filter(sprint_id=sprint_id, user_stories=OuterRef('pk')) \
+        .values('usuario__email')[:1]
+    backlog = UserStory.objects.filter(proyecto_id=proyecto_id, sprint_id=sprint_id) \
+        .annotate(desarrollador=Subquery(desarrollador)).order_by('numero')
+    return exportar_consulta(backlog, COLUMNAS_USER_STORY + [('desarrollador', 'desarrollador')],
+                             'sprint-backlog-sprint-%d' % sprint_id, formato)
+
+
+def exportar_registro(request, proyecto_id, sprint_id, formato):
+    """
+    Permite exportar el registro de incrementos de un sprint hacia un archivo
+    CSV o JSON delimitado por líneas.
+
+    **Fecha:** 18/10/26
+
+    **Artefacto:** módulo de desarrollo
+
+    |
+    """
+    registro = Incremento.objects.filter(user_story__proyecto_id=proyecto_id, user_story__sprint_id=sprint_id) \
+        .order_by('fecha', 'id')
+    return exportar_consulta(registro, [
+        ('fecha', 'fecha'),
+        ('usuario__email', 'usuario'),
+        ('user_story__numero', 'user_story'),
+        ('user_story__nombre', 'nombre'),
+        ('horas', 'horas'),
+        ('estado', 'estado', UserStory.Estado.choices),
+    ], 'registro-sprint-%d' % sprint_id, formato)